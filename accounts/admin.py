@@ -1,6 +1,13 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import CustomUser
+from .models import CustomUser, UserAdminAuditLog
 
 admin.site.register(CustomUser)
+
+
+@admin.register(UserAdminAuditLog)
+class UserAdminAuditLogAdmin(admin.ModelAdmin):
+    list_display = ("action", "actor", "affected_count", "created_at")
+    list_filter = ("action",)
+    readonly_fields = ("actor", "action", "affected_count", "details", "created_at")
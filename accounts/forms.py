@@ -38,13 +38,23 @@ class AdminShowForm(forms.ModelForm):
             "thumbnail",
             "include_balcony",
             "poster",
+            "on_sale_at",
+            "waiting_room_minutes",
         ]
         widgets = {
             "time": forms.TimeInput(attrs={"type": "time"}),
             "date": forms.DateInput(attrs={"type": "date"}),
+            "on_sale_at": forms.DateTimeInput(
+                attrs={"type": "datetime-local"}, format="%Y-%m-%dT%H:%M"
+            ),
         }
 
 
+class SeasonImportForm(forms.Form):
+    schedule = forms.FileField(help_text="CSV (with a header row) or JSON")
+    dry_run = forms.BooleanField(required=False, initial=True)
+
+
 class MediaUploadForm(forms.ModelForm):
     class Meta:
         model = MediaFile
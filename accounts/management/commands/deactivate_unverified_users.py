@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.user_admin import deactivate_unverified
+
+
+class Command(BaseCommand):
+    help = "Deactivate accounts that never verified their email after N days."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many accounts would be deactivated.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            ids = deactivate_unverified(
+                None, options["days"], dry_run=options["dry_run"]
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        verb = "Would deactivate" if options["dry_run"] else "Deactivated"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {verb} {len(ids)} unverified account(s) older than "
+                f"{options['days']} days."
+            )
+        )
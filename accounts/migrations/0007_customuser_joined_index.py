@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0006_alter_customuser_managers_alter_customuser_email"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(fields=["-date_joined", "-id"], name="user_joined_idx"),
+        ),
+    ]
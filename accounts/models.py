@@ -41,6 +41,11 @@ class CustomUser(AbstractUser):
     email_otp = models.CharField(max_length=6, blank=True, null=True)
     last_otp_sent = models.DateTimeField(blank=True, null=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["-date_joined", "-id"], name="user_joined_idx"),
+        ]
+
     def generate_otp(self):
         self.email_otp = str(random.randint(100000, 999999))
         self.last_otp_sent = timezone.now()
@@ -48,3 +53,20 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class UserAdminAuditLog(models.Model):
+    ACTION_CHOICES = (
+        ("role_update", "Role update"),
+        ("deactivate_unverified", "Deactivate unverified"),
+    )
+    actor = models.ForeignKey(
+        "CustomUser", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    action = models.CharField(max_length=30, choices=ACTION_CHOICES)
+    affected_count = models.PositiveIntegerField(default=0)
+    details = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.action} by {self.actor} ({self.affected_count} users)"
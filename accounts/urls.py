@@ -11,6 +11,11 @@ urlpatterns = [
     path("admin/", views.admin_dashboard_main, name="admin_dashboard_main"),
     path("admin/dashboard/", views.admin_dashboard, name="admin_dashboard"),
     path("admin/users/", views.admin_view_users, name="admin_view_users"),
+    path(
+        "admin/create-booking/",
+        views.admin_create_booking,
+        name="admin_create_booking",
+    ),
     path(
         "admin/show/<int:show_id>/media/",
         views.admin_show_media_dashboard,
@@ -33,9 +38,16 @@ urlpatterns = [
         "admin/upload-media/", views.admin_upload_media_panel, name="admin_upload_media"
     ),
     path("admin/view-bookings/", views.admin_view_bookings, name="admin_view_bookings"),
+    path(
+        "admin/export/<str:dataset>/",
+        views.admin_export_data,
+        name="admin_export_data",
+    ),
     path("admin/all-shows/", views.admin_all_shows, name="admin_all_shows"),
+    path("admin/profiling/", views.admin_profiling, name="admin_profiling"),
     path("qr/scan/<int:show_id>/", views.qr_scan_log, name="qr_scan_log"),
     path("admin/create-show/", views.handle_create_show, name="admin_create_show"),
+    path("admin/import-season/", views.admin_import_season, name="admin_import_season"),
     path(
         "admin/show/<int:show_id>/scan/",
         views.admin_scan_tickets,
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CustomUser, UserAdminAuditLog
+
+BATCH_SIZE = 500
+ROLES = {role for role, _ in CustomUser.USER_TYPE_CHOICES}
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def apply_role_changes(actor, submitted_roles, batch_size=BATCH_SIZE):
+    """
+    Apply ``{user_id: role}`` changes, touching only users whose role really
+    changes and writing just the ``user_type`` column in batches.
+
+    The acting admin can't change their own role. Returns the changed count.
+    """
+    wanted = {
+        int(user_id): role
+        for user_id, role in submitted_roles.items()
+        if role in ROLES and str(user_id).isdigit()
+    }
+    wanted.pop(actor.id, None)
+    if not wanted:
+        return 0
+
+    current = {}
+    for ids in _batches(list(wanted), batch_size):
+        current.update(
+            CustomUser.objects.filter(id__in=ids).values_list("id", "user_type")
+        )
+
+    changed = [
+        CustomUser(id=user_id, user_type=wanted[user_id])
+        for user_id, role in current.items()
+        if role != wanted[user_id]
+    ]
+    if not changed:
+        return 0
+
+    with transaction.atomic():
+        CustomUser.objects.bulk_update(changed, ["user_type"], batch_size=batch_size)
+        UserAdminAuditLog.objects.create(
+            actor=actor,
+            action="role_update",
+            affected_count=len(changed),
+            details={
+                "changes": {str(u.id): [current[u.id], u.user_type] for u in changed}
+            },
+        )
+    return len(changed)
+
+
+def stale_unverified_users(days, exclude=None):
+    cutoff = timezone.now() - timedelta(days=days)
+    users = CustomUser.objects.filter(
+        is_active=True, is_email_verified=False, date_joined__lt=cutoff
+    ).exclude(user_type="Admin")
+    if exclude is not None:
+        users = users.exclude(id=exclude.id)
+    return users
+
+
+def deactivate_unverified(actor, days, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Deactivate non-admin accounts that never verified their email and are
+    older than ``days`` (at least 1). Returns the list of affected user IDs.
+    """
+    if days < 1:
+        raise ValueError("days must be at least 1")
+    ids = list(
+        stale_unverified_users(days, exclude=actor)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    if dry_run or not ids:
+        return ids
+
+    with transaction.atomic():
+        for batch in _batches(ids, batch_size):
+            CustomUser.objects.filter(id__in=batch).update(is_active=False)
+        UserAdminAuditLog.objects.create(
+            actor=actor,
+            action="deactivate_unverified",
+            affected_count=len(ids),
+            details={"older_than_days": days, "user_ids": ids},
+        )
+    return ids
@@ -1,5 +1,4 @@
 import re
-from collections import defaultdict
 from datetime import timedelta
 
 import requests
@@ -10,21 +9,32 @@ from django.contrib.auth import get_user_model, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.hashers import make_password
-from django.core.mail import send_mail
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Count, Sum
-from django.http import HttpResponseForbidden, JsonResponse
+from django.db.models import Count, Q, Sum
+from django.http import (Http404, HttpResponseBadRequest, HttpResponseForbidden,
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 import json
 from django.core.serializers.json import DjangoJSONEncoder
 
-from accounts.forms import AdminShowForm, MediaUploadForm, SignUpForm
+from accounts.forms import (AdminShowForm, MediaUploadForm, SeasonImportForm,
+                            SignUpForm)
 from accounts.models import CustomUser
-from user.models import (Booking, MediaFile, QRMarketingScan, QRScanLog, Seat,
-                         Show, Ticket)
+from user.models import (Booking, MediaFile, QRMarketingScan, QRScanLog, Show,
+                         Ticket)
+from user.export_utils import EXPORTS, export_stream
+from user.mail_outbox import queue_email
+from user.metrics import booking_committed, booking_conflicted, ticket_scanned
+from user.pagination import filter_users, keyset_page_for_request
+from user.profiling import (PROFILING_ENABLED, slowest_endpoints,
+                            slowest_requests, span)
 from user.qr_utils import *
+from user.booking import parse_seat_numbers
+from user.season_import import import_season, load_schedule
+from user.seat_layout import layout
+from user.seat_map import bump_seat_version, claim_seats, taken_seats
 
 # ------------------ AUTH ------------------ #
 
@@ -42,15 +52,10 @@ def signup_view(request):
             user.generate_otp()
             user.save()
 
-            from django.conf import settings
-            from django.core.mail import send_mail
-
-            send_mail(
+            queue_email(
                 "🎭 Raven Entertainment - Verify Your Email",
                 f"Your OTP is: {user.email_otp}",
-                settings.DEFAULT_FROM_EMAIL,
                 [user.email],
-                fail_silently=False,
             )
 
             messages.success(
@@ -100,37 +105,42 @@ def admin_dashboard(request):
     if not request.user.is_authenticated or request.user.user_type != "Admin":
         return HttpResponseForbidden("⛔ Unauthorized")
 
-    shows = Show.objects.all()
-    bookings = Booking.objects.all().order_by("-created_at")
+    today = timezone.now().date()
 
-    total_revenue = sum(b.total_price for b in bookings if b.payment_status == "Paid")
-    revenue_today = sum(
-        b.total_price for b in bookings if b.created_at.date() == timezone.now().date()
+    # Revenue and counts are aggregated in the database instead of iterating
+    # every booking ever made in Python.
+    totals = Booking.objects.aggregate(
+        total_revenue=Sum("total_price", filter=Q(payment_status="Paid")),
+        revenue_today=Sum("total_price", filter=Q(created_at__date=today)),
+        revenue_month=Sum(
+            "total_price",
+            filter=Q(created_at__year=today.year, created_at__month=today.month),
+        ),
+        total_bookings=Count("id"),
     )
-    revenue_month = sum(
-        b.total_price for b in bookings if b.created_at.month == timezone.now().month
+
+    # Latest bookings, one bounded page at a time (?cursor=&page_size=)
+    bookings = keyset_page_for_request(
+        request, Booking.objects.select_related("user", "show")
     )
 
     # Build paginated shows with seat data
-    enriched_shows = []
-    for show in shows:
-        total = show.seat_set.count()
-        booked = show.seat_set.filter(is_booked=True).count()
-        remaining = total - booked
-
-        enriched_shows.append(
-            {
-                "show": show,
-                "total": total,
-                "booked": booked,
-                "remaining": remaining,
-            }
-        )
+    shows = Show.objects.annotate(
+        booked=Count("seat"),
+    ).order_by("-date", "-id")
 
-    paginator = Paginator(enriched_shows, 5)
+    paginator = Paginator(shows, 5)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
-    today = timezone.now().date()
+    page_obj.object_list = [
+        {
+            "show": show,
+            "total": show.seat_capacity,
+            "booked": show.booked,
+            "remaining": show.seat_capacity - show.booked,
+        }
+        for show in page_obj.object_list
+    ]
 
     return render(
         request,
@@ -138,10 +148,10 @@ def admin_dashboard(request):
         {
             "page_obj": page_obj,  # This now contains enriched show data
             "bookings": bookings,
-            "total_revenue": total_revenue,
-            "revenue_today": revenue_today,
-            "revenue_month": revenue_month,
-            "total_bookings": bookings.count(),
+            "total_revenue": totals["total_revenue"] or 0,
+            "revenue_today": totals["revenue_today"] or 0,
+            "revenue_month": totals["revenue_month"] or 0,
+            "total_bookings": totals["total_bookings"],
             "today": today,
         },
     )
@@ -152,7 +162,7 @@ def user_dashboard(request):
     if request.user.user_type != "User":
         return HttpResponseForbidden("You are not authorized.")
 
-    bookings = Booking.objects.filter(user=request.user).order_by("-booking_date")
+    bookings = Booking.objects.filter(user=request.user).select_related("show")
 
     filter_start_date = request.GET.get("start_date")
     filter_end_date = request.GET.get("end_date")
@@ -165,6 +175,8 @@ def user_dashboard(request):
     if filter_status:
         bookings = bookings.filter(payment_status=filter_status)
 
+    bookings = keyset_page_for_request(request, bookings)
+
     # ✅ Only show shows that are still upcoming — i.e., future datetime
     shows = Show.objects.filter(date__gt=timezone.now()).order_by("date")
 
@@ -223,6 +235,32 @@ def handle_create_show(request):
     return render(request, "accounts/partials/create_show.html", {"form": form})
 
 
+@user_passes_test(is_admin)
+def admin_import_season(request):
+    """Many shows at once from a schedule file; see user.season_import."""
+    if request.method != "POST":
+        return render(
+            request,
+            "accounts/partials/import_season.html",
+            {"form": SeasonImportForm()},
+        )
+
+    form = SeasonImportForm(request.POST, request.FILES)
+    report = None
+    if form.is_valid():
+        upload = form.cleaned_data["schedule"]
+        fmt = "json" if upload.name.lower().endswith(".json") else "csv"
+        try:
+            rows = load_schedule(upload.read(), fmt)
+        except ValueError as e:
+            form.add_error("schedule", f"Could not read the schedule: {e}")
+        else:
+            report = import_season(rows, dry_run=form.cleaned_data["dry_run"])
+    return render(
+        request, "accounts/import_season.html", {"form": form, "report": report}
+    )
+
+
 @login_required
 def admin_show_media_dashboard(request, show_id):
     if request.user.user_type != "Admin":
@@ -237,7 +275,9 @@ def admin_show_media_dashboard(request, show_id):
         media.save()
         return redirect("admin_show_media", show_id=show.id)
 
-    bookings = Booking.objects.filter(event_name=show.name, event_date=show.date)
+    bookings = show.bookings.select_related("user").only(
+        "show", "number_of_tickets", "total_price", "payment_status", "user__username"
+    )
     media_files = show.media_files.all()
 
     return render(
@@ -327,7 +367,11 @@ def admin_dashboard_main(request):
 
 @user_passes_test(is_admin)
 def admin_create_booking(request):
-    users = CustomUser.objects.filter(user_type="User")
+    users = keyset_page_for_request(
+        request,
+        filter_users(request, CustomUser.objects.filter(user_type="User")),
+        keys=("date_joined", "id"),
+    )
     shows = Show.objects.all().order_by("-date")
 
     return render(
@@ -336,14 +380,28 @@ def admin_create_booking(request):
         {
             "users": users,
             "shows": shows,
+            "q": request.GET.get("q", ""),
         },
     )
 
 
 @user_passes_test(is_admin)
 def admin_view_users(request):
-    users = CustomUser.objects.all()  # includes both user_type='User' and 'Admin'
-    return render(request, "accounts/partials/view_users.html", {"users": users})
+    # includes both user_type='User' and 'Admin'
+    users = keyset_page_for_request(
+        request,
+        filter_users(request, CustomUser.objects.all()),
+        keys=("date_joined", "id"),
+    )
+    return render(
+        request,
+        "accounts/partials/view_users.html",
+        {
+            "users": users,
+            "q": request.GET.get("q", ""),
+            "user_type": request.GET.get("user_type", ""),
+        },
+    )
 
 
 @user_passes_test(is_admin)
@@ -364,26 +422,21 @@ def admin_view_bookings(request):
 
 @user_passes_test(is_admin)
 def admin_all_shows(request):
-    all_shows = Show.objects.prefetch_related("media_files").order_by("-date")
-    enriched_shows = []
-    timezone.now().date()
-
-    for show in all_shows:
-        # ✅ Explicit filtering for reliable seat counts
-        total = Seat.objects.filter(show=show).count()
-        booked = Seat.objects.filter(show=show, is_booked=True).count()
-        remaining = total - booked
-        media = show.media_files.all()
-
-        enriched_shows.append(
-            {
-                "show": show,
-                "total": total,
-                "booked": booked,
-                "remaining": remaining,
-                "media": media,
-            }
-        )
+    # ✅ Seat counts for every show in one grouped query
+    all_shows = (
+        Show.objects.only("name", "date", "time", "include_balcony")
+        .annotate(booked=Count("seat"))
+        .order_by("-date")
+    )
+    enriched_shows = [
+        {
+            "show": show,
+            "total": show.seat_capacity,
+            "booked": show.booked,
+            "remaining": show.seat_capacity - show.booked,
+        }
+        for show in all_shows
+    ]
 
     return render(
         request, "accounts/partials/all_shows.html", {"shows": enriched_shows}
@@ -395,7 +448,8 @@ def qr_scan_log(request, show_id):
     district = "Unknown"
 
     try:
-        geo = requests.get(f"http://ip-api.com/json/{ip}").json()
+        with span("geo"):
+            geo = requests.get(f"http://ip-api.com/json/{ip}").json()
         district = geo.get("city") or geo.get("regionName") or "Unknown"
     except:
         pass
@@ -421,7 +475,11 @@ def admin_scan_tickets(request, show_id):
 
         try:
             ticket = Ticket.objects.get(id=ticket_id, show=show)
-            if ticket.is_scanned:
+            if ticket.payment_status != "confirmed":
+                ticket_scanned("invalid")
+                message = "❌ Ticket not valid: the booking is unpaid or expired."
+            elif ticket.is_scanned:
+                ticket_scanned("duplicate")
                 message = "⚠️ Ticket already scanned!"
             else:
                 ticket.is_scanned = True
@@ -438,8 +496,10 @@ def admin_scan_tickets(request, show_id):
                     postal_code="000000",
                     scanned_at=timezone.now(),
                 )
+                ticket_scanned("valid")
                 message = "✅ Ticket scanned successfully!"
-        except Ticket.DoesNotExist:
+        except (Ticket.DoesNotExist, ValueError):
+            ticket_scanned("invalid")
             message = "❌ Invalid ticket!"
 
     return render(
@@ -464,12 +524,10 @@ def resend_email_otp(request, user_id):
     user.last_otp_sent = timezone.now()
     user.save()
 
-    send_mail(
+    queue_email(
         "🔁 Raven OTP Resend",
         f"Your new OTP is: {user.email_otp}",
-        settings.DEFAULT_FROM_EMAIL,
         [user.email],
-        fail_silently=False,
     )
 
     messages.success(request, "🔁 New OTP sent to your email.")
@@ -512,15 +570,10 @@ def forgot_password_request(request):
         user = CustomUser.objects.filter(email=email).first()
         if user:
             user.generate_otp()
-            from django.conf import settings
-            from django.core.mail import send_mail
-
-            send_mail(
+            queue_email(
                 "🔐 Raven Entertainment Password Reset OTP",
                 f"Your password reset OTP is: {user.email_otp}",
-                settings.DEFAULT_FROM_EMAIL,
                 [user.email],
-                fail_silently=False,
             )
             messages.success(request, "✅ OTP sent to your email.")
             return redirect("reset_password_otp", user_id=user.id)
@@ -552,37 +605,31 @@ def reset_password_otp(request, user_id):
 def admin_manual_booking(request, show_id):
     show = get_object_or_404(Show, id=show_id)
 
-    available_seats = Seat.objects.filter(show=show, is_booked=False)
-    ground_rows = defaultdict(list)
-    balcony_rows = defaultdict(list)
-
-    for seat in available_seats:
-        row_label = "".join(filter(str.isalpha, seat.seat_number))
-        if len(row_label) >= 2 and row_label.startswith("B"):
-            balcony_rows[row_label].append(seat)
-        else:
-            ground_rows[row_label].append(seat)
-
-    for row_dict in [ground_rows, balcony_rows]:
-        for row, seats in row_dict.items():
-            row_dict[row] = sorted(
-                seats, key=lambda s: int("".join(filter(str.isdigit, s.seat_number)))
-            )
+    # ✅ Free seats = the fixed layout minus the seats that have a row
+    taken = taken_seats(show.id)
+    ground_rows = {}
+    balcony_rows = {}
+    for section, row, numbers in layout(show.include_balcony):
+        rows = balcony_rows if section == "BALCONY" else ground_rows
+        free = [f"{row}{n}" for n in numbers if f"{row}{n}" not in taken]
+        if free:
+            rows[row] = free
 
     if request.method == "POST":
         buyer_name = request.POST.get("offline_name")
         email_id = request.POST.get("offline_email")
-        selected_ids = request.POST.getlist("selected_seats")
+        selected_numbers, invalid = parse_seat_numbers(
+            request.POST.getlist("selected_seats"), show
+        )
 
-        if not buyer_name or not email_id or not selected_ids:
+        if not buyer_name or not email_id or not selected_numbers:
             messages.error(request, "❌ All fields are required.")
             return redirect("admin_manual_booking", show_id=show.id)
 
         try:
-            selected_seats = Seat.objects.select_for_update().filter(
-                id__in=selected_ids, show=show
-            )
-            if selected_seats.count() != len(selected_ids):
+            selected_seats = None if invalid else claim_seats(show, selected_numbers)
+            if selected_seats is None:
+                booking_conflicted()
                 messages.error(
                     request,
                     "⚠️ One or more selected seats are already booked or invalid.",
@@ -590,18 +637,18 @@ def admin_manual_booking(request, show_id):
                 return redirect("admin_manual_booking", show_id=show.id)
 
             tickets = []
-            for seat in selected_seats:
-                seat.is_booked = True
-                seat.save()
-
+            for seat in selected_seats.values():
                 ticket = Ticket.objects.create(
                     show=show,
+                    seat=seat,
                     seat_number=seat.seat_number,
                     payment_status="confirmed",
                     user=request.user,  # 👈 fallback admin user (required for FK)
                 )
                 generate_ticket_qr(ticket, request)
                 tickets.append(ticket)
+            bump_seat_version(show.id)
+            booking_committed(show.id, len(tickets))
 
             def send_manual_ticket_email():
                 pdf_buffer = generate_ticket_pdf(
@@ -639,7 +686,8 @@ def qr_marketing_scan(request):
 
     city = region = district = postal = None
     try:
-        response = requests.get(f"https://ipapi.co/{ip}/json/").json()
+        with span("geo"):
+            response = requests.get(f"https://ipapi.co/{ip}/json/").json()
         city = response.get("city")
         region = response.get("region")
         district = response.get("district")
@@ -682,3 +730,44 @@ def get_qr_marketing_data(request):
 
     counts = scans.values("identifier").annotate(count=Count("id"))
     return JsonResponse(list(counts), safe=False)
+
+
+# ------------------ EXPORTS ------------------ #
+
+
+@user_passes_test(is_admin)
+def admin_export_data(request, dataset):
+    if dataset not in EXPORTS:
+        raise Http404("Unknown export.")
+
+    try:
+        chunks, content_type, filename = export_stream(
+            dataset,
+            fmt=request.GET.get("format", "csv"),
+            gzip=request.GET.get("gzip") == "1",
+            start_date=request.GET.get("start_date") or None,
+            end_date=request.GET.get("end_date") or None,
+            show_id=request.GET.get("show") or None,
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ------------------ PROFILING ------------------ #
+
+
+@user_passes_test(lambda u: u.is_authenticated and u.user_type == "Admin")
+def admin_profiling(request):
+    return render(
+        request,
+        "accounts/partials/profiling.html",
+        {
+            "enabled": PROFILING_ENABLED,
+            "endpoints": slowest_endpoints(),
+            "slow_requests": slowest_requests(),
+        },
+    )
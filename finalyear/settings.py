@@ -53,10 +53,13 @@ AUTH_USER_MODEL = "accounts.CustomUser"
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "user.static_assets.StaticFilesMiddleware",
+    "user.metrics.MetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "user.profiling.ProfilingMiddleware",  # no-op unless PROFILING_ENABLED
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -89,10 +92,29 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Transactions take the write lock at BEGIN and wait up to `timeout`
+        # seconds for it, instead of failing with "database is locked" when a
+        # read transaction has to be upgraded mid-way
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
     }
 }
 
 
+# Cache
+# Page/fragment caches and geo lookups. LocMemCache is per process; point this
+# at Redis/Memcached when running several workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "raven-default",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+}
+
+PAGE_CACHE_SECONDS = 600
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -127,28 +149,53 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
-STATIC_URL = "static/"
-
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-STATICFILES_DIRS = [
-    BASE_DIR / "static",
-]
-
-STATICFILES_DIRS = [
-    os.path.join(BASE_DIR, "static"),
-]
-
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Media is served by user.media_serving (Range/206, ETag). Behind nginx set
+# MEDIA_ACCEL_MODE = "x-accel-redirect" and map MEDIA_ACCEL_PREFIX to
+# MEDIA_ROOT in an `internal` location; "x-sendfile" suits Apache/lighttpd.
+MEDIA_ACCEL_MODE = None
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+MEDIA_MAX_AGE = 60 * 60
+# Only these MEDIA_ROOT directories are served; tickets and payment
+# screenshots stay private
+PUBLIC_MEDIA_PREFIXES = (
+    "show_posters/",
+    "thumbnails/",
+    "variants/",
+    "show_media/",
+    "qrcodes/",
+)
+# Outbox attachments (ticket PDFs) wait here until their email is sent;
+# outside MEDIA_ROOT, so nothing serves them
+PRIVATE_MEDIA_ROOT = BASE_DIR / "private_media"
+# Resumable chunked uploads of show media (api/v1/shows/<id>/uploads/)
+MEDIA_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MEDIA_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+MEDIA_UPLOAD_STALE_HOURS = 24  # `manage.py gc_media` discards older partials
 
 STATIC_URL = "/static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# Uploads are stored once per distinct content (hard links into media/blobs/;
+# `manage.py dedupe_media` converts existing files). collectstatic writes
+# content-hashed names plus .gz/.br copies, which
+# user.static_assets.StaticFilesMiddleware serves with immutable caching
+STORAGES = {
+    "default": {"BACKEND": "user.storage.DedupFileSystemStorage"},
+    "private": {"BACKEND": "user.storage.PrivateFileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "user.static_assets.CompressedManifestStaticFilesStorage"
+    },
+}
+STATIC_MAX_AGE = 60  # seconds, for files without a content hash
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 465
@@ -158,6 +205,53 @@ EMAIL_HOST_USER = ""
 EMAIL_HOST_PASSWORD = ""
 DEFAULT_FROM_EMAIL = ""
 
+# Email outbox: messages are persisted first, then drained over one connection
+EMAIL_OUTBOX_AUTO_DRAIN = True  # drain in a background thread after each queue
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_PER_SECOND = 5  # Gmail rate cap; 0 disables throttling
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+
+
+# Request profiling: Server-Timing headers, admin "Performance" page and
+# cProfile dumps. Admins can also append ?_profile=1 to any URL when enabled.
+PROFILING_ENABLED = False
+PROFILING_BUFFER_SIZE = 500  # recent requests kept in memory per process
+PROFILING_CPROFILE_SAMPLE_RATE = 0.0  # e.g. 0.01 dumps 1% of requests
+PROFILING_DUMP_DIR = BASE_DIR / "profiles"
+
+
+# /metrics (Prometheus text format). With several worker processes point
+# METRICS_MULTIPROC_DIR at a shared, writable directory (cleared on deploy).
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+METRICS_MULTIPROC_DIR = None
+METRICS_FLUSH_SECONDS = 5
+
+
+# Waiting room for on-sales (Show.on_sale_at / waiting_room_minutes). Queue
+# positions are counted in the database, so every worker shares one queue.
+WAITING_ROOM_BURST = 50  # admitted the moment the sale opens
+WAITING_ROOM_ADMIT_PER_MINUTE = 60
+WAITING_ROOM_ADMISSION_SECONDS = 600  # time to book once admitted
+WAITING_ROOM_POLL_SECONDS = 5
+
+
+# Unpaid bookings are expired and their seats released by
+# `manage.py expire_bookings --loop` (or the same command from cron)
+BOOKING_PAYMENT_WINDOW_MINUTES = 30
+BOOKING_EXPIRY_BATCH_SIZE = 500
+
+# Waitlist: released seats are held for the next in line this long
+WAITLIST_OFFER_MINUTES = 15
+WAITLIST_MAX_PARTY_SIZE = 10
+# Absolute links built outside a request (waitlist offer emails, show QR codes)
+PUBLIC_BASE_URL = "https://www.ravenentertainment.in"
+
+
+# Season import (`manage.py import_season`, admin "Import Season"): QR codes
+# are rendered across this many processes; None uses every CPU
+SEASON_IMPORT_QR_WORKERS = None
+
 
 # Channels
 ASGI_APPLICATION = "finalyear.asgi.application"
@@ -16,9 +16,10 @@ Including another URLconf
 """
 
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from user.media_serving import serve_media
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -27,4 +28,7 @@ urlpatterns = [
     path("accounts/", include("user.urls")),  # or accounts.urls
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Range requests, revalidation and proxy offload (see user.media_serving)
+urlpatterns += [
+    re_path(rf"^{settings.MEDIA_URL.strip('/')}/(?P<path>.*)$", serve_media),
+]
@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib import admin
 
-from .models import Show, UserProfile
+from .models import MediaUpload, OutboundEmail, Show, UserProfile, WaitlistEntry
 
 # Register UserProfile model
 admin.site.register(UserProfile)
@@ -21,6 +21,8 @@ class AdminShowForm(forms.ModelForm):
             "total_seats",
             "thumbnail",
             "include_balcony",  # ✅ Now visible in admin form
+            "on_sale_at",
+            "waiting_room_minutes",
         ]
 
 
@@ -37,3 +39,26 @@ class ShowAdmin(admin.ModelAdmin):
         "include_balcony",  # ✅ Show in the admin list
     )
     prepopulated_fields = {"slug": ("name",)}
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "to", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("to", "subject")
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ("show", "user", "party_size", "section", "status", "created_at")
+    list_filter = ("status", "section")
+    list_select_related = ("show", "user")
+    readonly_fields = ("offered_seats", "offer_expires_at", "booking")
+
+
+@admin.register(MediaUpload)
+class MediaUploadAdmin(admin.ModelAdmin):
+    list_display = ("filename", "show", "user", "received", "size", "status")
+    list_filter = ("status",)
+    list_select_related = ("show", "user")
+    readonly_fields = ("received", "sha256", "media", "created_at", "updated_at")
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the booking flow. Run them through management commands
+(``bench_booking``) so they get an isolated test database of their own.
+"""
@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, time as dt_time, timedelta
+
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from user.models import Show, Ticket
+from user.seat_map import free_seat_numbers
+
+
+# ------------------ Environment ------------------ #
+@contextmanager
+def isolated_database():
+    """
+    Run the benchmark against a throwaway test database (file-backed for
+    SQLite so worker threads share it) and a temporary MEDIA_ROOT, with the
+    email outbox left undrained. Nothing touches the real data.
+    """
+    media_root = tempfile.mkdtemp(prefix="bench-media-")
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    old_test_name = test_settings.get("NAME")
+    if connection.vendor == "sqlite" and not old_test_name:
+        test_settings["NAME"] = os.path.join(media_root, "bench.sqlite3")
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(
+            MEDIA_ROOT=media_root,
+            PRIVATE_MEDIA_ROOT=media_root,
+            EMAIL_OUTBOX_AUTO_DRAIN=False,
+            ALLOWED_HOSTS=["*"],
+        ):
+            yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings["NAME"] = old_test_name
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def seed(shows, users):
+    """Create ``shows`` upcoming shows and ``users`` customer accounts."""
+    show_ids = [
+        Show.objects.create(
+            name=f"Bench Show {i}",
+            date=date.today() + timedelta(days=7 + i),
+            time=dt_time(19, 0),
+            seat_price=250,
+        ).id
+        for i in range(shows)
+    ]
+    CustomUser.objects.bulk_create(
+        CustomUser(
+            username=f"bench{i}",
+            email=f"bench{i}@example.com",
+            is_email_verified=True,
+        )
+        for i in range(users)
+    )
+    user_ids = list(
+        CustomUser.objects.filter(username__startswith="bench").values_list(
+            "id", flat=True
+        )
+    )
+    return show_ids, user_ids
+
+
+# ------------------ Load ------------------ #
+def _hot_seats(show_ids, hot_seats):
+    """The first ``hot_seats`` free seats of each show: everyone wants these."""
+    return {
+        show.id: free_seat_numbers(show)[:hot_seats]
+        for show in Show.objects.filter(id__in=show_ids).only("include_balcony")
+    }
+
+
+def _outcome(response):
+    if response.status_code == 201:
+        return "booked"  # JSON API
+    if response.status_code == 409:
+        return "conflict"
+    if response.status_code >= 500:
+        return "error"
+    location = response.get("Location", "")
+    if response.status_code == 302 and "/payments/" in location:
+        return "booked"
+    if response.status_code == 302:
+        return "conflict"  # bounced back to the seat map
+    return "error"
+
+
+def run_on_sale(show_ids, user_ids, requests, concurrency, seats_per_booking,
+                hot_seats, rng_seed=None, api=False):  # fmt: skip
+    """
+    Fire ``requests`` concurrent ``create_booking`` POSTs (or JSON booking
+    API calls with ``api=True``), each for ``seats_per_booking`` seats drawn
+    from a small pool of hot seats so that requests overlap. Returns one
+    ``(outcome, seconds)`` tuple per request and the wall-clock duration.
+    """
+    concurrency = max(1, min(concurrency, requests))
+    rng = random.Random(rng_seed)
+    pools = _hot_seats(show_ids, hot_seats)
+    plan = []
+    for _ in range(requests):
+        show_id = rng.choice(show_ids)
+        seats = rng.sample(pools[show_id], min(seats_per_booking, len(pools[show_id])))
+        plan.append((rng.choice(user_ids), show_id, seats))
+
+    users = CustomUser.objects.in_bulk(user_ids)
+    local = threading.local()
+    start_gate = threading.Barrier(concurrency)
+
+    def client_for(user_id):
+        clients = getattr(local, "clients", None)
+        if clients is None:
+            clients = local.clients = {}
+            start_gate.wait()  # all workers begin together
+        if user_id not in clients:
+            client = Client(raise_request_exception=False)
+            client.force_login(users[user_id])
+            clients[user_id] = client
+        return clients[user_id]
+
+    def post(client, show_id, seats, index):
+        if api:
+            return client.post(
+                reverse("api_create_booking", args=[show_id]),
+                json.dumps({"seats": seats}),
+                content_type="application/json",
+                headers={"Idempotency-Key": f"bench-{index}"},
+            )
+        return client.post(
+            reverse("book_ticket", args=[show_id]),
+            {"selected_seats": ",".join(seats)},
+        )
+
+    def book(indexed_step):
+        index, (user_id, show_id, seats) = indexed_step
+        client = client_for(user_id)
+        started = time.perf_counter()
+        try:
+            response = post(client, show_id, seats, index)
+            outcome = _outcome(response)
+        except Exception:
+            outcome = "error"
+        return outcome, time.perf_counter() - started
+
+    def worker(steps):
+        try:
+            return [book(step) for step in steps]
+        finally:
+            connection.close()
+
+    # Round-robin the plan so every worker gets a similar share
+    plan = list(enumerate(plan))
+    shares = [plan[i::concurrency] for i in range(concurrency)]
+    # 500s are counted as errors; don't print a traceback for each one
+    request_logger = logging.getLogger("django.request")
+    was_disabled, request_logger.disabled = request_logger.disabled, True
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = [r for share in pool.map(worker, shares) for r in share]
+    finally:
+        request_logger.disabled = was_disabled
+    return results, time.perf_counter() - started
+
+
+def double_bookings(show_ids):
+    """Seats that ended up with more than one ticket (a double sale)."""
+    return list(
+        Ticket.objects.filter(show_id__in=show_ids)
+        .values("show_id", "seat_number")
+        .annotate(tickets=Count("id"))
+        .filter(tickets__gt=1)
+        .order_by("show_id", "seat_number")
+    )
+
+
+# ------------------ Report ------------------ #
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(
+        len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def summarize(results, elapsed, show_ids):
+    latencies = sorted(round(seconds * 1000, 2) for _, seconds in results)
+    counts = {"booked": 0, "conflict": 0, "error": 0}
+    for outcome, _ in results:
+        counts[outcome] += 1
+    violations = double_bookings(show_ids)
+    total = len(results)
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "outcomes": counts,
+        "conflict_rate": round(counts["conflict"] / total, 4) if total else 0,
+        "error_rate": round(counts["error"] / total, 4) if total else 0,
+        "double_bookings": len(violations),
+        "double_booked_seats": violations,
+    }
@@ -0,0 +1,365 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .mail_outbox import queue_email
+from .metrics import booking_committed, booking_conflicted, bookings_expired
+from .models import Booking, Seat, Show, Ticket, WaitlistEntry
+from .qr_utils import generate_ticket_pdf, generate_ticket_qr
+from .seat_layout import is_valid_seat
+from .seat_map import (
+    broadcast_seats,
+    bump_seat_version,
+    claim_seats,
+    nearest_free_seats,
+    taken_seats,
+)
+from .waitlist import OfferClosed, offer_released_seats
+
+# How many times to re-read and re-claim after losing a race for a seat
+# that looked free (partial mode only; strict mode fails straight away)
+CLAIM_ATTEMPTS = 3
+
+
+class PaymentClosed(Exception):
+    """The booking can no longer be paid for (expired or cancelled)."""
+
+
+class SeatConflict(Exception):
+    """
+    Some requested seats are taken. ``conflicts`` and ``alternatives`` are
+    ``[{"seat_number": ...}]`` lists ready for a JSON response.
+    """
+
+    def __init__(self, conflicts, alternatives):
+        super().__init__("One or more selected seats are already booked.")
+        self.conflicts = conflicts
+        self.alternatives = alternatives
+
+
+def _as_dicts(seat_numbers):
+    return [{"seat_number": seat_number} for seat_number in seat_numbers]
+
+
+def parse_seat_numbers(values, show):
+    """
+    Normalise requested seat labels: ``(valid, invalid)``, order kept and
+    repeats dropped. ``values`` is a list or a comma-separated string.
+    """
+    if isinstance(values, str):
+        values = values.split(",")
+    valid, invalid = [], []
+    for value in values:
+        label = str(value).strip().upper()
+        if not label or label in valid or label in invalid:
+            continue
+        if is_valid_seat(label, show.include_balcony):
+            valid.append(label)
+        else:
+            invalid.append(label)
+    return valid, invalid
+
+
+def _conflict(show, seat_numbers):
+    """Build the SeatConflict for the seats in ``seat_numbers`` that are gone."""
+    taken = taken_seats(show.id)
+    conflicts = [n for n in seat_numbers if n in taken]
+    anchors = [n for n in seat_numbers if n not in taken] or conflicts
+    alternatives = nearest_free_seats(show, anchors, len(conflicts), set(seat_numbers))
+    return SeatConflict(_as_dicts(conflicts), _as_dicts(alternatives))
+
+
+def _deliver_tickets(user, ticket_list, request):
+    for ticket in ticket_list:
+        generate_ticket_qr(ticket, request)
+    pdf_buffer = generate_ticket_pdf(ticket_list, request)
+    queue_email(
+        "🎫 Raven Entertainment Ticket Confirmation",
+        "Attached is your ticket PDF. Thank You for Booking 🎭",
+        [user.email],
+        attachment=("tickets.pdf", pdf_buffer.getvalue(), "application/pdf"),
+    )
+
+
+def place_booking(show, user, seat_numbers, request, partial=False):
+    """
+    Book ``seat_numbers`` (labels such as "F12") for ``user`` in one
+    transaction.
+
+    All-or-nothing by default: if any seat is taken nothing is booked and
+    ``SeatConflict`` reports exactly which seats clashed, with the nearest
+    free replacements. With ``partial=True`` the free seats are booked
+    together with those replacements instead, still atomically.
+
+    The booking is "Confirmed" (seats taken, awaiting payment) with
+    "pending" tickets; ``confirm_payment`` makes them valid and sends them.
+    Unpaid bookings are released by ``expire_unpaid_bookings``.
+
+    Returns ``(booking, seat_numbers, substitutes)`` where ``substitutes``
+    lists the replacement seats that were booked.
+    """
+    with transaction.atomic():
+        # Write first: the claim's INSERT takes the database write lock
+        # before anything is read, so SQLite never has to upgrade a read
+        # transaction (which fails with "database is locked" under load)
+        seats = claim_seats(show, seat_numbers)
+        substitutes = []
+        for _ in range(CLAIM_ATTEMPTS if partial and seats is None else 0):
+            taken = taken_seats(show.id)
+            free = [n for n in seat_numbers if n not in taken]
+            anchors = free or list(seat_numbers)
+            substitutes = nearest_free_seats(
+                show, anchors, len(seat_numbers) - len(free), set(seat_numbers)
+            )
+            wanted = free + substitutes
+            if wanted:
+                seats = claim_seats(show, wanted)
+                if seats is not None:
+                    break
+        if seats is None:
+            booking_conflicted()
+            raise _conflict(show, seat_numbers)
+
+        bump_seat_version(show.id)
+        booking_committed(show.id, len(seats))
+        booking = Booking.objects.create(
+            user=user,
+            show=show,
+            event_name=show.name,
+            event_date=show.date,
+            number_of_tickets=len(seats),
+            total_price=len(seats) * show.seat_price,
+            payment_status="Confirmed",
+        )
+
+        ticket_list = [
+            Ticket.objects.create(
+                user=user,
+                show=show,
+                booking=booking,
+                seat=seat,
+                seat_number=seat_number,
+                payment_status="pending",
+            )
+            for seat_number, seat in seats.items()
+        ]
+
+        # ✅ Link first ticket to the booking for download visibility
+        booking.ticket = ticket_list[0]
+        booking.save()
+
+    return booking, list(seats), _as_dicts(substitutes)
+
+
+def confirm_payment(booking, request, transaction_id=""):
+    """
+    Record the payment for an unpaid booking: it becomes "Paid", its
+    tickets "confirmed", and the QR codes, PDF and email go out once that
+    has committed. Paying twice is a no-op. Raises ``PaymentClosed`` if the
+    booking expired or was cancelled first.
+    """
+    with transaction.atomic():
+        booking = Booking.objects.select_related("user").get(id=booking.id)
+        if booking.payment_status == "Paid":
+            return booking
+        if booking.payment_status not in UNPAID_STATUSES:
+            raise PaymentClosed(f"Booking is {booking.payment_status}.")
+        # Conditional like the expiry sweep's: whichever commits first wins
+        paid = Booking.objects.filter(
+            id=booking.id, payment_status=booking.payment_status
+        ).update(
+            payment_status="Paid",
+            transaction_id=transaction_id or booking.transaction_id,
+        )
+        if not paid:
+            raise PaymentClosed("Booking changed while it was being paid.")
+        booking.payment_status = "Paid"
+        tickets = booking.tickets.filter(payment_status="pending")
+        ticket_list = list(tickets.order_by("id"))
+        tickets.update(payment_status="confirmed")
+        for ticket in ticket_list:
+            ticket.payment_status = "confirmed"
+
+        # ✅ QR codes, PDF and email only once the payment is recorded, and
+        # without holding the write lock while they render
+        if ticket_list:
+            user = booking.user
+            transaction.on_commit(
+                lambda: _deliver_tickets(user, ticket_list, request), robust=True
+            )
+    return booking
+
+
+# ------------------ After the sale ------------------ #
+def booking_pdf_name(user_id, booking_id):
+    return f"tickets/{user_id}_{booking_id}_all.pdf"
+
+
+def booking_pdf_path(booking):
+    return os.path.join(
+        settings.MEDIA_ROOT, booking_pdf_name(booking.user_id, booking.id)
+    )
+
+
+def _discard_pdf(booking):
+    path = booking_pdf_path(booking)
+
+    def remove():
+        if os.path.exists(path):
+            os.remove(path)
+
+    transaction.on_commit(remove)
+
+
+def cancel_tickets(booking, ticket_ids):
+    """
+    Cancel some of a booking's tickets: their seats go back on sale and the
+    booking is re-priced. Returns how many tickets were cancelled.
+    """
+    with transaction.atomic():
+        booking = Booking.objects.select_for_update().get(id=booking.id)
+        tickets = booking.tickets.filter(id__in=ticket_ids)
+        released = list(
+            tickets.exclude(seat=None).values_list("seat_id", "seat__seat_number")
+        )
+        cancelled = tickets.count()
+        if not cancelled:
+            return 0
+
+        tickets.delete()
+        # Free seats have no row
+        Seat.objects.filter(id__in=[seat_id for seat_id, _ in released]).delete()
+        bump_seat_version(booking.show_id)
+        offer_released_seats(booking.show, [number for _, number in released])
+
+        remaining = booking.tickets.order_by("id")
+        booking.number_of_tickets = remaining.count()
+        booking.total_price = booking.number_of_tickets * booking.show.seat_price
+        booking.ticket = remaining.first()
+        if not booking.number_of_tickets:
+            booking.payment_status = "Cancelled"
+        booking.save()
+        _discard_pdf(booking)  # rebuilt from the remaining tickets on download
+    return cancelled
+
+
+# ------------------ Expiry ------------------ #
+# Unpaid bookings hold their seats this long before they go back on sale
+PAYMENT_WINDOW_MINUTES = getattr(settings, "BOOKING_PAYMENT_WINDOW_MINUTES", 30)
+EXPIRY_BATCH_SIZE = getattr(settings, "BOOKING_EXPIRY_BATCH_SIZE", 500)
+# Seats taken but not paid for: place_booking makes "Confirmed" bookings and
+# the payment page moves them to "Initiated"; confirm_payment makes them "Paid"
+UNPAID_STATUSES = ("Pending", "Confirmed", "Initiated")
+
+
+def expire_batch(cutoff, batch_size=EXPIRY_BATCH_SIZE, after_id=0):
+    """
+    Expire up to ``batch_size`` unpaid bookings made before ``cutoff``, in
+    id order after ``after_id``: the bookings become "Expired", their
+    tickets "void" and their seats are released, all with set-based
+    statements in one short transaction.
+
+    Returns ``(last_id, bookings, seats)``; ``last_id`` is None once no
+    overdue booking is left.
+    """
+    # A booking whose tickets were already sent is never taken back (older
+    # bookings got them straight away, before payment)
+    overdue = Booking.objects.filter(
+        id__gt=after_id, payment_status__in=UNPAID_STATUSES, created_at__lt=cutoff
+    ).exclude(tickets__payment_status="confirmed")
+    with transaction.atomic():
+        ids = list(
+            overdue.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return None, 0, 0
+
+        # Still conditional on the status: a booking paid since it was read
+        # is not matched, and only rows this UPDATE flipped are released
+        overdue.filter(id__in=ids).update(payment_status="Expired")
+        expired = list(
+            Booking.objects.filter(id__in=ids, payment_status="Expired").only(
+                "id", "user_id"
+            )
+        )
+        released = list(
+            Seat.objects.filter(tickets__booking__in=expired).values_list(
+                "id", "show_id", "seat_number"
+            )
+        )
+        Ticket.objects.filter(booking__in=expired).update(
+            payment_status="void", seat=None
+        )
+        Seat.objects.filter(id__in=[seat_id for seat_id, _, _ in released]).delete()
+
+        by_show = {}
+        for _, show_id, seat_number in released:
+            by_show.setdefault(show_id, []).append(seat_number)
+        if by_show:
+            bump_seat_version(*by_show)
+        shows = Show.objects.only("name", "include_balcony").in_bulk(list(by_show))
+        for show_id, seat_numbers in by_show.items():
+            broadcast_seats(show_id, seat_numbers, "unbook")
+            offer_released_seats(shows[show_id], seat_numbers)
+        for booking in expired:
+            _discard_pdf(booking)
+        bookings_expired(len(expired))
+    return ids[-1], len(expired), len(released)
+
+
+def expire_unpaid_bookings(
+    window_minutes=PAYMENT_WINDOW_MINUTES,
+    batch_size=EXPIRY_BATCH_SIZE,
+    max_batches=None,
+    now=None,
+):
+    """
+    Sweep every unpaid booking older than ``window_minutes``, a batch at a
+    time so no transaction holds locks for long; ``max_batches`` bounds one
+    run on a large backlog (the next run carries on). Live bookings are
+    unaffected: they only insert seats, and the sweep only deletes the
+    seats of the bookings it expired.
+    """
+    cutoff = (now or timezone.now()) - timedelta(minutes=window_minutes)
+    stats = {"batches": 0, "bookings": 0, "seats": 0}
+    after_id = 0
+    while max_batches is None or stats["batches"] < max_batches:
+        after_id, bookings, seats = expire_batch(cutoff, batch_size, after_id)
+        if after_id is None:
+            break
+        stats["batches"] += 1
+        stats["bookings"] += bookings
+        stats["seats"] += seats
+    return stats
+
+
+# ------------------ Waitlist offers ------------------ #
+def accept_offer(entry, request):
+    """
+    Book the seats held for a waitlist offer, as a normal booking awaiting
+    payment (tickets are sent by ``confirm_payment``). Raises
+    ``OfferClosed`` if the offer is no longer open.
+    """
+    with transaction.atomic():
+        entry = (
+            WaitlistEntry.objects.select_for_update()
+            .select_related("show", "user")
+            .get(id=entry.id)
+        )
+        if entry.status != "offered" or entry.offer_expires_at < timezone.now():
+            raise OfferClosed
+        Seat.objects.filter(
+            show=entry.show, seat_number__in=entry.offered_seats, kind="held"
+        ).delete()
+        booking, _, _ = place_booking(
+            entry.show, entry.user, entry.offered_seats, request
+        )
+        entry.status = "booked"
+        entry.booking = booking
+        entry.save(update_fields=["status", "booking"])
+    return booking
@@ -0,0 +1,169 @@
+import base64
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MediaFile, MediaUpload
+from .storage import CHUNK_SIZE, file_digest
+
+# Largest chunk accepted per request and largest file overall
+MAX_CHUNK_SIZE = getattr(settings, "MEDIA_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+MAX_UPLOAD_SIZE = getattr(settings, "MEDIA_UPLOAD_MAX_SIZE", 2 * 1024 * 1024 * 1024)
+# Unfinished uploads are discarded after this long without a chunk
+STALE_HOURS = getattr(settings, "MEDIA_UPLOAD_STALE_HOURS", 24)
+# Partial files live under MEDIA_ROOT (a rename away from their final place)
+# in a dot directory, which serve_media and gc_media never touch
+UPLOAD_DIR = ".uploads"
+
+
+class UploadRejected(Exception):
+    """The upload or chunk is invalid (size, checksum or state)."""
+
+
+class OffsetMismatch(Exception):
+    """The chunk does not start where the upload left off."""
+
+    def __init__(self, offset):
+        super().__init__(f"Expected a chunk at offset {offset}.")
+        self.offset = offset
+
+
+class _PartFile(File):
+    # Lets FileSystemStorage move the finished part into place instead of copying
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, UPLOAD_DIR, f"{upload.id}.part")
+
+
+def start_upload(show, user, filename, size, sha256="", description=""):
+    filename = os.path.basename(filename or "").strip()
+    if not filename:
+        raise UploadRejected("A file name is required.")
+    if not 0 < size <= MAX_UPLOAD_SIZE:
+        raise UploadRejected(f"Size must be between 1 and {MAX_UPLOAD_SIZE} bytes.")
+    upload = MediaUpload.objects.create(
+        show=show,
+        user=user,
+        filename=filename,
+        size=size,
+        sha256=sha256.lower(),
+        description=description,
+    )
+    os.makedirs(os.path.dirname(part_path(upload)), exist_ok=True)
+    open(part_path(upload), "wb").close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length, checksum=None):
+    """
+    Append ``length`` bytes read from ``stream`` (the request body) at
+    ``offset``, which must equal the bytes already received: a client that
+    lost its connection asks for the offset and carries on from there.
+    The chunk is copied in small blocks, so memory stays bounded whatever
+    its size. ``checksum`` is the base64 SHA-256 of the chunk, if sent.
+
+    Returns the upload with its new offset.
+    """
+    if not 0 < length <= MAX_CHUNK_SIZE:
+        raise UploadRejected(f"Chunks must be 1 to {MAX_CHUNK_SIZE} bytes.")
+    with transaction.atomic():
+        upload = MediaUpload.objects.select_for_update().get(id=upload.id)
+        if upload.status != "uploading":
+            raise UploadRejected(f"Upload is {upload.status}.")
+        if offset != upload.received:
+            raise OffsetMismatch(upload.received)
+        if offset + length > upload.size:
+            raise UploadRejected("Chunk runs past the declared size.")
+
+        digest = hashlib.sha256()
+        written = 0
+        with open(part_path(upload), "r+b") as part:
+            part.seek(offset)
+            while written < length:
+                block = stream.read(min(CHUNK_SIZE, length - written))
+                if not block:
+                    break
+                part.write(block)
+                digest.update(block)
+                written += len(block)
+            # Whatever a failed chunk wrote past the offset is dropped
+            if written != length or (
+                checksum and base64.b64encode(digest.digest()).decode() != checksum
+            ):
+                part.truncate(offset)
+                raise UploadRejected("Chunk was incomplete or failed its checksum.")
+            part.truncate(offset + length)
+
+        upload.received = offset + length
+        upload.save(update_fields=["received", "updated_at"])
+    return upload
+
+
+def finish_upload(upload):
+    """
+    Verify the whole file against the SHA-256 given at the start (if any)
+    and attach it to the show as a MediaFile. The part file is moved, not
+    copied, into media storage.
+    """
+    with transaction.atomic():
+        upload = MediaUpload.objects.select_for_update().get(id=upload.id)
+        if upload.status == "complete":
+            return upload.media
+        if upload.status != "uploading" or upload.received != upload.size:
+            raise UploadRejected(
+                f"Upload is {upload.status} with {upload.received} of "
+                f"{upload.size} bytes."
+            )
+        path = part_path(upload)
+        corrupt = upload.sha256 and file_digest(path) != upload.sha256
+        if corrupt:
+            upload.status = "failed"
+            upload.save(update_fields=["status", "updated_at"])
+            os.remove(path)
+        else:
+            media = MediaFile(show=upload.show, description=upload.description)
+            with open(path, "rb") as f:
+                media.file.save(upload.filename, _PartFile(f), save=False)
+            media.save()
+            upload.media = media
+            upload.status = "complete"
+            upload.save(update_fields=["media", "status", "updated_at"])
+    if corrupt:
+        raise UploadRejected("File checksum does not match; upload it again.")
+    return media
+
+
+def upload_progress(upload):
+    return {
+        "id": str(upload.id),
+        "filename": upload.filename,
+        "offset": upload.received,
+        "size": upload.size,
+        "percent": round(100 * upload.received / upload.size, 1),
+        "status": upload.status,
+        "media_id": upload.media_id,
+        "chunk_size": MAX_CHUNK_SIZE,
+    }
+
+
+def discard_stale_uploads(now=None):
+    """Delete unfinished uploads idle for ``STALE_HOURS``; returns how many."""
+    cutoff = (now or timezone.now()) - timedelta(hours=STALE_HOURS)
+    stale = MediaUpload.objects.filter(status="uploading", updated_at__lt=cutoff)
+    discarded = 0
+    for upload in stale.iterator():
+        try:
+            os.remove(part_path(upload))
+        except FileNotFoundError:
+            pass
+        upload.delete()
+        discarded += 1
+    return discarded
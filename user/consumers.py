@@ -1,6 +1,9 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .metrics import dec, inc
+
+
 class SeatBookingConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.show_id = self.scope['url_route']['kwargs']['show_id']
@@ -12,8 +15,12 @@ class SeatBookingConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         await self.accept()
+        inc('raven_websocket_connections', group=self.room_group_name)
+        self.counted = True
 
     async def disconnect(self, close_code):
+        if getattr(self, 'counted', False):
+            dec('raven_websocket_connections', group=self.room_group_name)
         # Leave group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -29,7 +36,7 @@ class SeatBookingConsumer(AsyncWebsocketConsumer):
             {
                 'type': 'seat_update',
                 'seat_id': data['seat_id'],
-                'status': data['status']
+                'action': data.get('action')
             }
         )
 
@@ -37,5 +44,5 @@ class SeatBookingConsumer(AsyncWebsocketConsumer):
     async def seat_update(self, event):
         await self.send(text_data=json.dumps({
             'seat_id': event['seat_id'],
-            'status': event['status']
+            'action': event['action']
         }))
@@ -0,0 +1,217 @@
+import csv
+import tempfile
+import zlib
+from datetime import date, datetime
+
+from django.utils.dateparse import parse_date
+
+from .models import Booking, QRMarketingScan, QRScanLog, Ticket, VisitorLog
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX export is optional
+    Workbook = None
+
+CHUNK_SIZE = 2000
+
+# dataset -> (model, date field, show field or None, [(header, value path)])
+EXPORTS = {
+    "bookings": (
+        Booking,
+        "created_at",
+        "show_id",
+        [
+            ("Booking ID", "id"),
+            ("Created At", "created_at"),
+            ("Username", "user__username"),
+            ("Email", "user__email"),
+            ("Show", "show__name"),
+            ("Event Date", "event_date"),
+            ("Tickets", "number_of_tickets"),
+            ("Total Price", "total_price"),
+            ("Payment Status", "payment_status"),
+            ("Transaction ID", "transaction_id"),
+            ("UPI ID", "upi_id"),
+        ],
+    ),
+    "tickets": (
+        Ticket,
+        "booking_date",
+        "show_id",
+        [
+            ("Ticket ID", "id"),
+            ("Booked At", "booking_date"),
+            ("Username", "user__username"),
+            ("Show", "show__name"),
+            ("Seat", "seat_number"),
+            ("Payment Status", "payment_status"),
+            ("Scanned", "is_scanned"),
+        ],
+    ),
+    "scans": (
+        QRScanLog,
+        "timestamp",
+        "show_id",
+        [
+            ("Scan ID", "id"),
+            ("Timestamp", "timestamp"),
+            ("Show", "show__name"),
+            ("Ticket ID", "ticket_id"),
+            ("IP Address", "ip_address"),
+            ("City", "city"),
+            ("Region", "region"),
+            ("District", "district"),
+            ("Postal Code", "postal_code"),
+        ],
+    ),
+    "visitors": (
+        VisitorLog,
+        "timestamp",
+        None,
+        [
+            ("Visit ID", "id"),
+            ("Timestamp", "timestamp"),
+            ("IP Address", "ip_address"),
+            ("City", "city"),
+            ("Region", "region"),
+            ("District", "district"),
+            ("Postal Code", "postal_code"),
+        ],
+    ),
+    "marketing": (
+        QRMarketingScan,
+        "timestamp",
+        None,
+        [
+            ("Scan ID", "id"),
+            ("Timestamp", "timestamp"),
+            ("Identifier", "identifier"),
+            ("IP Address", "ip_address"),
+            ("City", "city"),
+            ("Region", "region"),
+            ("District", "district"),
+            ("Postal Code", "postal_code"),
+        ],
+    ),
+}
+
+
+def export_rows(dataset, start_date=None, end_date=None, show_id=None):
+    """
+    Yield the header row and then every matching row as a tuple, reading the
+    table in ``CHUNK_SIZE`` batches so memory stays flat regardless of size.
+    """
+    model, date_field, show_field, columns = EXPORTS[dataset]
+
+    qs = model.objects.all()
+    if start_date:
+        qs = qs.filter(**{f"{date_field}__date__gte": start_date})
+    if end_date:
+        qs = qs.filter(**{f"{date_field}__date__lte": end_date})
+    if show_id and show_field:
+        qs = qs.filter(**{show_field: show_id})
+
+    yield [header for header, _ in columns]
+    yield from (
+        qs.order_by("id")
+        .values_list(*[path for _, path in columns])
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row).encode("utf-8")
+
+
+def stream_xlsx(rows, title="Export"):
+    """
+    Build the workbook in openpyxl's write-only mode (rows go straight to a
+    temp file) and stream that file back in chunks.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    for row in rows:
+        # Excel has no timezone support; timestamps are exported as UTC
+        sheet.append(
+            [
+                value.replace(tzinfo=None) if isinstance(value, datetime) else value
+                for value in row
+            ]
+        )
+
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(64 * 1024):
+            yield chunk
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def parse_filters(start_date=None, end_date=None, show_id=None):
+    """
+    Validate the filters before anything is streamed: a bad value raises
+    ``ValueError`` here, not half-way through the download.
+    """
+    filters = {"start_date": None, "end_date": None, "show_id": None}
+    for key, value in (("start_date", start_date), ("end_date", end_date)):
+        if value in (None, "") or isinstance(value, date):
+            filters[key] = value or None
+            continue
+        try:
+            filters[key] = parse_date(str(value).strip())
+        except ValueError:  # well formed but not a real date
+            filters[key] = None
+        if filters[key] is None:
+            raise ValueError(f"Invalid {key}: {value!r} (expected YYYY-MM-DD).")
+    if show_id not in (None, ""):
+        try:
+            filters["show_id"] = int(show_id)
+        except (TypeError, ValueError):
+            filters["show_id"] = 0
+        if filters["show_id"] < 1:
+            raise ValueError(f"Invalid show: {show_id!r}.")
+    return filters
+
+
+def export_stream(dataset, fmt="csv", gzip=False, **filters):
+    """Return ``(byte chunk iterator, content_type, filename)`` for an export."""
+    if dataset not in EXPORTS:
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    if fmt not in ("csv", "xlsx"):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt == "xlsx" and Workbook is None:
+        raise ValueError("XLSX export requires openpyxl to be installed.")
+
+    rows = export_rows(dataset, **parse_filters(**filters))
+    if fmt == "xlsx":
+        chunks = stream_xlsx(rows, title=dataset)
+        content_type = (
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    else:
+        chunks = stream_csv(rows)
+        content_type = "text/csv"
+
+    filename = f"{dataset}.{fmt}"
+    if gzip:
+        chunks = gzip_stream(chunks)
+        content_type = "application/gzip"
+        filename += ".gz"
+    return chunks, content_type, filename
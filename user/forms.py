@@ -3,6 +3,7 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
 from .models import *
+from .seat_map import free_seat_numbers
 
 User = get_user_model()
 
@@ -18,14 +19,16 @@ class SignUpForm(UserCreationForm):
 class BookingForm(forms.Form):
     name = forms.CharField(max_length=100, required=True)
     email = forms.EmailField(required=True)
-    selected_seats = forms.ModelMultipleChoiceField(
-        queryset=Seat.objects.none(), widget=forms.CheckboxSelectMultiple
+    selected_seats = forms.MultipleChoiceField(
+        choices=(), widget=forms.CheckboxSelectMultiple
     )
 
     def _init_(self, *args, **kwargs):
         show = kwargs.pop("show")
         super()._init_(*args, **kwargs)
-        self.fields["selected_seats"].queryset = show.seat_set.filter(is_booked=False)
+        self.fields["selected_seats"].choices = [
+            (seat_number, seat_number) for seat_number in free_seat_numbers(show)
+        ]
 
     def clean_selected_seats(self):
         selected_seats = self.cleaned_data["selected_seats"]
@@ -0,0 +1,208 @@
+import io
+import logging
+import os
+import posixpath
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Resized copies live next to nothing else:
+# variants/<original dir>/<stem>_<original ext>_<w>.<ext>, so film.png and
+# film.jpg in one directory get separate variants
+VARIANT_ROOT = "variants"
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+VARIANT_QUALITY = 80
+PDF_POSTER_WIDTH = 400
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp"}
+EXISTS_CACHE_SECONDS = 60 * 60
+
+# Off in tests/scripts that want to call generate_variants() themselves
+GENERATE_ON_UPLOAD = getattr(settings, "IMAGE_VARIANTS_ON_UPLOAD", True)
+
+_pending_lock = threading.Lock()
+_pending = set()
+
+
+def is_image(name):
+    return os.path.splitext(name or "")[1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_name(name, width, ext):
+    directory, filename = posixpath.split(name)
+    stem, source_ext = os.path.splitext(filename)
+    source_ext = source_ext.lstrip(".").lower()
+    return posixpath.join(VARIANT_ROOT, directory, f"{stem}_{source_ext}_{width}.{ext}")
+
+
+def pdf_poster_name(name):
+    return variant_name(name, f"pdf{PDF_POSTER_WIDTH}", "jpg")
+
+
+def _variant_exists(name):
+    key = f"variant-exists:{name}"
+    exists = cache.get(key)
+    if exists is None:
+        exists = default_storage.exists(name)
+        # Misses expire quickly so a backfill run elsewhere shows up soon
+        cache.set(key, exists, EXISTS_CACHE_SECONDS if exists else 60)
+    return exists
+
+
+def _save(name, image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(
+            buffer, fmt, quality=VARIANT_QUALITY, optimize=True, progressive=True
+        )
+    else:
+        image.save(buffer, fmt, quality=VARIANT_QUALITY, method=4)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+    cache.set(f"variant-exists:{name}", True, EXISTS_CACHE_SECONDS)
+
+
+def _open_rgb(name):
+    with default_storage.open(name, "rb") as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ("RGB", "L"):
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        image = image.convert("RGBA")
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    return image.convert("RGB")
+
+
+def _resized(image, width):
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def generate_variants(name, force=False):
+    """
+    Write WebP and JPEG copies of the image ``name`` at each width in
+    ``VARIANT_WIDTHS`` (never upscaled) plus the small PDF poster. Returns
+    the names written; existing variants are kept unless ``force`` is set.
+    """
+    if not name or not is_image(name) or not default_storage.exists(name):
+        return []
+
+    # (target, width, format) still to write; the original is only decoded
+    # when there is one, so re-saving a show with its variants in place is cheap
+    missing = [
+        (variant_name(name, width, ext), width, fmt)
+        for width in VARIANT_WIDTHS
+        for ext, fmt in VARIANT_FORMATS.items()
+    ] + [(pdf_poster_name(name), PDF_POSTER_WIDTH, "JPEG")]
+    if not force:
+        missing = [t for t in missing if not default_storage.exists(t[0])]
+    if not missing:
+        return []
+
+    image = _open_rgb(name)
+    resized = None
+    for target, width, fmt in missing:
+        width = min(width, image.width)
+        if resized is None or resized.width != width:
+            resized = _resized(image, width)
+        _save(target, resized, fmt)
+    return [target for target, _, _ in missing]
+
+
+def variant_names(name):
+    """Every name ``generate_variants(name)`` may write."""
+    return [
+        variant_name(name, width, ext)
+        for width in VARIANT_WIDTHS
+        for ext in VARIANT_FORMATS
+    ] + [pdf_poster_name(name)]
+
+
+def delete_variants(name):
+    for target in variant_names(name):
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        cache.delete(f"variant-exists:{target}")
+
+
+def variant_url(field_file, width=640, ext="webp"):
+    """
+    URL of the smallest variant at least ``width`` wide, falling back to
+    the original file when it has not been generated (yet).
+    """
+    if not field_file:
+        return ""
+    candidates = [w for w in VARIANT_WIDTHS if w >= width] or [VARIANT_WIDTHS[-1]]
+    name = variant_name(field_file.name, candidates[0], ext)
+    if is_image(field_file.name) and _variant_exists(name):
+        return default_storage.url(name)
+    return field_file.url
+
+
+def variant_srcset(field_file, ext="webp"):
+    if not field_file or not is_image(field_file.name):
+        return ""
+    entries = []
+    for width in VARIANT_WIDTHS:
+        name = variant_name(field_file.name, width, ext)
+        if _variant_exists(name):
+            entries.append(f"{default_storage.url(name)} {width}w")
+    return ", ".join(entries)
+
+
+def pdf_poster_path(field_file):
+    """
+    Local path of the small PDF-ready poster, generating it on first use.
+    Falls back to the original file if the image can't be processed.
+    """
+    if not field_file:
+        return None
+    name = pdf_poster_name(field_file.name)
+    if not default_storage.exists(name):
+        try:
+            generate_variants(field_file.name)
+        except (OSError, ValueError):
+            pass
+    if default_storage.exists(name):
+        return default_storage.path(name)
+    if default_storage.exists(field_file.name):
+        return default_storage.path(field_file.name)
+    return None
+
+
+def _generate_in_background(names):
+    for name in names:
+        try:
+            generate_variants(name)
+        except Exception:
+            logger.exception("Could not build image variants for %s", name)
+        finally:
+            with _pending_lock:
+                _pending.discard(name)
+
+
+def generate_variants_async(*names):
+    """
+    Build variants off the request thread. Names already queued in this
+    process are skipped, so the double post_save from ``Show.save`` is free.
+    """
+    with _pending_lock:
+        names = [n for n in names if n and is_image(n) and n not in _pending]
+        _pending.update(names)
+    if not names:
+        return None
+    thread = threading.Thread(
+        target=_generate_in_background, args=(names,), daemon=True
+    )
+    thread.start()
+    return thread
@@ -1,20 +1,56 @@
+import ipaddress
+
 import requests
+from django.core.cache import cache
+
+from .metrics import inc
+from .profiling import span
+
+GEO_CACHE_SECONDS = 24 * 60 * 60
+GEO_TIMEOUT_SECONDS = 2
+
+UNKNOWN_LOCATION = {
+    "city": None,
+    "region": None,
+    "district": None,
+    "postal": None,
+}
+
+
+def _is_public(ip_address):
+    try:
+        return ipaddress.ip_address(ip_address).is_global
+    except ValueError:
+        return False
 
 
 def get_location_from_ip(ip_address):
+    # Loopback/LAN addresses can't be geolocated; don't pay for the HTTP call
+    if not _is_public(ip_address):
+        inc("raven_geo_lookups_total", result="skipped")
+        return dict(UNKNOWN_LOCATION)
+
+    cache_key = f"geo:{ip_address}"
+    location = cache.get(cache_key)
+    if location is not None:
+        inc("raven_geo_lookups_total", result="hit")
+        return dict(location)
+    inc("raven_geo_lookups_total", result="miss")
+
     try:
-        response = requests.get(f"http://ip-api.com/json/{ip_address}")
-        data = response.json()
-        return {
+        with span("geo"):
+            response = requests.get(
+                f"http://ip-api.com/json/{ip_address}", timeout=GEO_TIMEOUT_SECONDS
+            )
+            data = response.json()
+        location = {
             "city": data.get("city"),
             "region": data.get("regionName"),
             "district": data.get("district") or data.get("city"),
             "postal": data.get("zip"),
         }
     except Exception as e:
-        return {
-            "city": None,
-            "region": None,
-            "district": None,
-            "postal": None,
-        }
+        return dict(UNKNOWN_LOCATION)
+
+    cache.set(cache_key, location, GEO_CACHE_SECONDS)
+    return dict(location)
@@ -0,0 +1,217 @@
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .profiling import span, timed
+
+# Outbox tuning (override in settings.py)
+BATCH_SIZE = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50)
+MAX_PER_SECOND = getattr(settings, "EMAIL_OUTBOX_MAX_PER_SECOND", 5)
+MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+RETRY_BASE_SECONDS = getattr(settings, "EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30)
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# Process-wide delivery counters: queued, sent, retried, failed
+delivery_stats = Counter()
+_stats_lock = threading.Lock()
+_drain_lock = threading.Lock()
+
+
+def _record(**counts):
+    with _stats_lock:
+        delivery_stats.update(counts)
+
+
+# ------------------ Enqueue ------------------ #
+
+
+@timed("email")
+def queue_email(subject, body, to, attachment=None, from_email=None, drain=True):
+    """
+    Persist an email in the outbox and (optionally) kick a background drain.
+
+    ``attachment`` is a ``(filename, content_bytes, mimetype)`` tuple.
+    """
+    if isinstance(to, str):
+        to = [to]
+
+    outbound = OutboundEmail(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=",".join(to),
+    )
+    if attachment:
+        filename, content, mimetype = attachment
+        outbound.attachment_name = filename
+        outbound.attachment_mimetype = mimetype
+        outbound.attachment.save(filename, ContentFile(content), save=False)
+    outbound.save()
+    _record(queued=1)
+
+    if drain and getattr(settings, "EMAIL_OUTBOX_AUTO_DRAIN", True):
+        # Wait for the surrounding transaction so the sender can see the row
+        transaction.on_commit(drain_outbox_async)
+    return outbound
+
+
+# ------------------ Drain ------------------ #
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = Q(status="pending", next_attempt_at__lte=now) | Q(
+        status="sending", claimed_at__lt=now - CLAIM_TIMEOUT
+    )
+    ids = list(
+        OutboundEmail.objects.filter(due)
+        .order_by("next_attempt_at", "id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+
+    # Only rows still due at UPDATE time are ours; a concurrent drainer that
+    # got there first leaves nothing for this token.
+    OutboundEmail.objects.filter(due, id__in=ids).update(
+        status="sending", claim_token=token, claimed_at=now
+    )
+    return list(OutboundEmail.objects.filter(claim_token=token, status="sending"))
+
+
+def _build_message(outbound, connection):
+    message = EmailMessage(
+        subject=outbound.subject,
+        body=outbound.body,
+        from_email=outbound.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[addr for addr in outbound.to.split(",") if addr],
+        connection=connection,
+    )
+    if outbound.attachment:
+        with outbound.attachment.open("rb") as f:
+            message.attach(
+                outbound.attachment_name or "attachment",
+                f.read(),
+                outbound.attachment_mimetype or None,
+            )
+    return message
+
+
+def _drop_attachment(outbound):
+    # Ticket PDFs are only needed while the email can still go out
+    if outbound.attachment:
+        outbound.attachment.delete(save=False)
+
+
+def _mark_sent(outbound):
+    _drop_attachment(outbound)
+    OutboundEmail.objects.filter(id=outbound.id).update(
+        status="sent",
+        attempts=outbound.attempts + 1,
+        sent_at=timezone.now(),
+        attachment="",
+        last_error="",
+    )
+
+
+def _mark_failed(outbound, error):
+    attempts = outbound.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        _drop_attachment(outbound)
+        OutboundEmail.objects.filter(id=outbound.id).update(
+            status="failed", attempts=attempts, attachment="", last_error=str(error)
+        )
+        _record(failed=1)
+    else:
+        backoff = RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        OutboundEmail.objects.filter(id=outbound.id).update(
+            status="pending",
+            attempts=attempts,
+            last_error=str(error),
+            next_attempt_at=timezone.now() + timedelta(seconds=backoff),
+        )
+        _record(retried=1)
+
+
+def drain_outbox(batch_size=BATCH_SIZE, max_per_second=MAX_PER_SECOND, limit=None):
+    """
+    Send due outbox messages over a single reused SMTP connection.
+
+    Returns a dict with the counts for this run and the elapsed time.
+    """
+    stats = Counter()
+    started = time.monotonic()
+    interval = 1.0 / max_per_second if max_per_second else 0
+    connection = None
+    last_send = 0.0
+
+    try:
+        while limit is None or stats["claimed"] < limit:
+            size = batch_size
+            if limit is not None:
+                size = min(batch_size, limit - stats["claimed"])
+            batch = _claim_batch(size)
+            if not batch:
+                break
+            stats["claimed"] += len(batch)
+
+            for outbound in batch:
+                wait = interval - (time.monotonic() - last_send)
+                if wait > 0:
+                    time.sleep(wait)
+                last_send = time.monotonic()
+
+                try:
+                    if connection is None:
+                        connection = get_connection()
+                        connection.open()
+                    with span("smtp"):
+                        _build_message(outbound, connection).send()
+                except Exception as e:
+                    _mark_failed(outbound, e)
+                    stats["errors"] += 1
+                    # The connection may be in an unknown state after an error
+                    if connection is not None:
+                        connection.close()
+                    connection = None
+                else:
+                    _mark_sent(outbound)
+                    stats["sent"] += 1
+                    _record(sent=1)
+    finally:
+        if connection is not None:
+            connection.close()
+
+    stats["elapsed"] = round(time.monotonic() - started, 3)
+    return dict(stats)
+
+
+def _drain_in_background():
+    if not _drain_lock.acquire(blocking=False):
+        return  # another thread in this process is already draining
+    try:
+        drain_outbox()
+    finally:
+        _drain_lock.release()
+        close_old_connections()
+
+
+def drain_outbox_async():
+    thread = threading.Thread(target=_drain_in_background, daemon=True)
+    thread.start()
+    return thread
+
+
+def outbox_depth():
+    return OutboundEmail.objects.filter(status__in=["pending", "sending"]).count()
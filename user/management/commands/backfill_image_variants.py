@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user.image_variants import generate_variants, is_image
+from user.models import MediaFile, Show
+
+
+class Command(BaseCommand):
+    help = (
+        "Build resized WebP/JPEG variants for existing posters, thumbnails and media."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild variants that already exist.",
+        )
+        parser.add_argument("--show", type=int, help="Only process this show ID.")
+
+    def _names(self, show_id):
+        shows = Show.objects.all()
+        media = MediaFile.objects.all()
+        if show_id:
+            shows = shows.filter(pk=show_id)
+            media = media.filter(show_id=show_id)
+        for poster, thumbnail in shows.values_list("poster", "thumbnail").iterator():
+            yield from (name for name in (poster, thumbnail) if name)
+        for name in media.values_list("file", flat=True).iterator():
+            if name:
+                yield name
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        processed = written = failed = 0
+        for name in dict.fromkeys(self._names(options["show"])):
+            if not is_image(name):
+                continue
+            processed += 1
+            try:
+                created = generate_variants(name, force=options["force"])
+            except (OSError, ValueError) as e:
+                failed += 1
+                self.stderr.write(f"❌ {name}: {e}")
+                continue
+            written += len(created)
+            if created:
+                self.stdout.write(f"🖼️ {name}: {len(created)} variant(s)")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {processed} image(s) checked, {written} variant(s) written, "
+                f"{failed} failed in {elapsed:.1f}s"
+            )
+        )
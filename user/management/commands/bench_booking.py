@@ -0,0 +1,98 @@
+import json
+import platform
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from user.benchmarks.booking import isolated_database, run_on_sale, seed, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "On-sale load test: concurrent create_booking POSTs (or booking API "
+        "calls) for overlapping seats against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shows", type=int, default=1)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--seats-per-booking", type=int, default=2)
+        parser.add_argument(
+            "--hot-seats",
+            type=int,
+            default=40,
+            help="Size of the seat pool each show's requests draw from.",
+        )
+        parser.add_argument(
+            "--api",
+            action="store_true",
+            help="Book through the JSON booking API instead of the seat page form.",
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            self.stdout.write("🌱 Seeding shows and users...")
+            show_ids, user_ids = seed(options["shows"], options["users"])
+
+            self.stdout.write(
+                f"🎟️ {options['requests']} bookings, {options['concurrency']} workers..."
+            )
+            results, elapsed = run_on_sale(
+                show_ids,
+                user_ids,
+                requests=options["requests"],
+                concurrency=options["concurrency"],
+                seats_per_booking=options["seats_per_booking"],
+                hot_seats=options["hot_seats"],
+                rng_seed=options["seed"],
+                api=options["api"],
+            )
+            report = summarize(results, elapsed, show_ids)
+
+        report["run"] = {
+            "at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            **{
+                key: options[key]
+                for key in (
+                    "shows",
+                    "users",
+                    "requests",
+                    "concurrency",
+                    "seats_per_booking",
+                    "hot_seats",
+                    "seed",
+                    "api",
+                )
+            },
+        }
+
+        latency = report["latency_ms"]
+        outcomes = report["outcomes"]
+        self.stdout.write(
+            f"⏱️ p50 {latency['p50']} ms | p95 {latency['p95']} ms | "
+            f"p99 {latency['p99']} ms | {report['throughput_rps']} req/s"
+        )
+        self.stdout.write(
+            f"📊 booked {outcomes['booked']} | conflicts {outcomes['conflict']} "
+            f"({report['conflict_rate']:.1%}) | errors {outcomes['error']}"
+        )
+        if report["double_bookings"]:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"❌ {report['double_bookings']} seat(s) sold more than once"
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ No double bookings"))
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2, default=str)
+            self.stdout.write(f"💾 Report written to {options['output']}")
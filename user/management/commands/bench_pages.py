@@ -0,0 +1,54 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+
+from user.models import Show
+from user.page_cache import SHOWS_SCOPE, bump_version, show_scope
+
+
+class Command(BaseCommand):
+    help = "Compare requests/second for the home and show pages, cached vs uncached."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+
+    def _run(self, client, path, count, invalidate=None):
+        started = time.perf_counter()
+        for _ in range(count):
+            if invalidate:
+                invalidate()
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+        return count / (time.perf_counter() - started)
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        client = Client(SERVER_NAME="localhost")
+
+        pages = [("/", lambda: bump_version(SHOWS_SCOPE))]
+        show = Show.objects.order_by("-date").first()
+        if show:
+            pages.append(
+                (
+                    f"/show/{show.slug}/",
+                    lambda: bump_version(show_scope(show.id)),
+                )
+            )
+
+        # Visitor logging writes rows; keep the benchmark from leaving any behind
+        with transaction.atomic():
+            for path, invalidate in pages:
+                cache.clear()
+                uncached = self._run(client, path, count, invalidate)
+                cache.clear()
+                client.get(path)  # warm up
+                cached = self._run(client, path, count)
+                self.stdout.write(
+                    f"{path:<40} uncached {uncached:8.1f} req/s   "
+                    f"cached {cached:8.1f} req/s   x{cached / uncached:.1f}"
+                )
+            transaction.set_rollback(True)
+        cache.clear()
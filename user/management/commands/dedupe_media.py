@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from user.storage import BLOB_ROOT, DedupFileSystemStorage, file_digest
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing media into the content-addressed blob store: identical "
+        "files become hard links to one copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the duplicates and the space they use.",
+        )
+
+    def _files(self, root):
+        for directory, dirs, files in os.walk(root):
+            if directory == root and BLOB_ROOT in dirs:
+                dirs.remove(BLOB_ROOT)
+            for filename in files:
+                path = os.path.join(directory, filename)
+                if not os.path.islink(path):
+                    yield os.path.relpath(path, root).replace(os.sep, "/")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        storage = default_storage
+        if not isinstance(storage, DedupFileSystemStorage):
+            storage = DedupFileSystemStorage()
+        root = str(settings.MEDIA_ROOT)
+
+        seen = {}  # digest -> (first name, inode)
+        files = duplicates = freed = 0
+        for name in self._files(root):
+            path = storage.path(name)
+            digest = file_digest(path)
+            stat = os.stat(path)
+            files += 1
+            first, inode = seen.setdefault(digest, (name, stat.st_ino))
+            if inode != stat.st_ino:
+                # Same content, separate copy on disk
+                duplicates += 1
+                self.stdout.write(f"♻️ {name} = {first}")
+                if options["dry_run"]:
+                    freed += stat.st_size
+            if not options["dry_run"]:
+                freed += storage.link_to_blob(name, digest)
+
+        elapsed = time.perf_counter() - started
+        verb = "would free" if options["dry_run"] else "freed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {files} file(s), {len(seen)} distinct, {duplicates} duplicate(s); "
+                f"{verb} {freed / 1024 / 1024:.1f} MB in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user.booking import (EXPIRY_BATCH_SIZE, PAYMENT_WINDOW_MINUTES,
+                          expire_unpaid_bookings)
+from user.waitlist import expire_offers
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire unpaid bookings past the payment window and lapsed waitlist "
+        "offers, releasing their seats (to the waitlist first)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window",
+            type=int,
+            default=PAYMENT_WINDOW_MINUTES,
+            help="Minutes a booking may stay unpaid.",
+        )
+        parser.add_argument("--batch-size", type=int, default=EXPIRY_BATCH_SIZE)
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="Stop after this many batches per sweep (the next sweep resumes).",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep sweeping instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60.0,
+            help="Seconds to sleep between sweeps in --loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            stats = expire_unpaid_bookings(
+                window_minutes=options["window"],
+                batch_size=options["batch_size"],
+                max_batches=options["max_batches"],
+            )
+            offers = expire_offers()
+            if stats["bookings"] or offers or not options["loop"]:
+                self.stdout.write(
+                    f"⌛ expired={stats['bookings']} seats_released={stats['seats']} "
+                    f"batches={stats['batches']} offers_expired={offers} "
+                    f"elapsed={time.perf_counter() - started:.2f}s"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
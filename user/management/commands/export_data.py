@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user.export_utils import EXPORTS, export_stream
+
+
+class Command(BaseCommand):
+    help = "Stream bookings, tickets or scan logs to CSV/XLSX with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+        parser.add_argument("--start-date", help="YYYY-MM-DD (inclusive)")
+        parser.add_argument("--end-date", help="YYYY-MM-DD (inclusive)")
+        parser.add_argument("--show", type=int, help="Only rows for this show ID")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument(
+            "-o", "--output", help="Output file (defaults to the dataset name)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            chunks, _, filename = export_stream(
+                options["dataset"],
+                fmt=options["format"],
+                gzip=options["gzip"],
+                start_date=options["start_date"],
+                end_date=options["end_date"],
+                show_id=options["show"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = options["output"] or filename
+        written = 0
+        out = sys.stdout.buffer if output == "-" else open(output, "wb")
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+
+        if output != "-":
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ Wrote {written} bytes to {output}")
+            )
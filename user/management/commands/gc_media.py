@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+
+from user.chunked_upload import discard_stale_uploads
+from user.media_gc import GC_BATCH_SIZE, MIN_AGE_MINUTES, collect_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete media files no database row refers to any more (posters, "
+        "show and ticket QR codes, ticket PDFs, uploads of deleted shows)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List what would be removed without touching anything.",
+        )
+        parser.add_argument(
+            "--quarantine",
+            action="store_true",
+            help=(
+                "Move orphans under MEDIA_ROOT/.quarantine/ instead of deleting "
+                "(no space is freed until that directory is purged)."
+            ),
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=MIN_AGE_MINUTES,
+            help="Skip files changed within this many minutes.",
+        )
+        parser.add_argument("--batch-size", type=int, default=GC_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        verbose = options["dry_run"] or options["verbosity"] > 1
+        if not options["dry_run"]:
+            discarded = discard_stale_uploads()
+            if discarded:
+                self.stdout.write(f"🧹 {discarded} abandoned chunked upload(s) removed")
+        report = collect_garbage(
+            dry_run=options["dry_run"],
+            quarantine=options["quarantine"],
+            min_age_minutes=options["min_age"],
+            batch_size=options["batch_size"],
+            log=(lambda name: self.stdout.write(f"🗑️ {name}")) if verbose else None,
+        )
+
+        for directory, size in report["by_dir"].most_common():
+            self.stdout.write(f"   {directory}/: {size / 1024:.0f} KB")
+        if options["quarantine"]:
+            verb = "would quarantine" if report["dry_run"] else "quarantined"
+            size = report["quarantined"]
+        else:
+            verb = "would free" if report["dry_run"] else "freed"
+            size = report["bytes"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {report['scanned']} file(s) scanned against "
+                f"{report['referenced']} reference(s): {report['orphans']} orphan(s), "
+                f"{verb} {size / 1024 / 1024:.1f} MB "
+                f"in {report['seconds']:.1f}s"
+            )
+        )
+        if options["quarantine"] and report["orphans"]:
+            self.stdout.write(
+                "ℹ️ Nothing is freed until MEDIA_ROOT/.quarantine/ is purged; "
+                "run gc_media again afterwards to drop blobs only those files used."
+            )
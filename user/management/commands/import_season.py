@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user.season_import import QR_WORKERS, import_season, load_schedule
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a season of shows (house seats and QR codes) from a CSV/JSON schedule."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("schedule", help="CSV with a header row, or JSON")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "json"],
+            help="Defaults to the file extension.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Do all the work, report timings, then roll back.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=QR_WORKERS,
+            help="Processes for QR rendering (default: all CPUs).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["schedule"]
+        fmt = options["format"] or ("json" if path.lower().endswith(".json") else "csv")
+        try:
+            with open(path, "rb") as f:
+                rows = load_schedule(f.read(), fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        report = import_season(
+            rows, dry_run=options["dry_run"], workers=options["workers"]
+        )
+
+        for row, message in report["errors"]:
+            self.stderr.write(f"❌ row {row}: {message}")
+        if report["errors"]:
+            raise CommandError(
+                f"{len(report['errors'])} error(s) in {report['rows']} rows; "
+                "nothing was imported."
+            )
+
+        for show_id, slug, show_date in report["shows"]:
+            self.stdout.write(f"  {show_date}  {slug}")
+        self.stdout.write(
+            "⏱ "
+            + " ".join(f"{phase}={secs}s" for phase, secs in report["timings"].items())
+        )
+        verb = "Would create" if report["dry_run"] else "Created"
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {verb} {len(report['shows'])} show(s).")
+        )
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user.mail_outbox import (BATCH_SIZE, MAX_PER_SECOND, delivery_stats,
+                              drain_outbox, outbox_depth)
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails over a pooled SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=MAX_PER_SECOND,
+            help="Maximum messages per second (0 = unlimited).",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting once it is empty.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between polls in --loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = drain_outbox(
+                batch_size=options["batch_size"], max_per_second=options["rate"]
+            )
+            if stats.get("claimed"):
+                self.stdout.write(
+                    f"📧 sent={stats.get('sent', 0)} errors={stats.get('errors', 0)} "
+                    f"elapsed={stats['elapsed']}s depth={outbox_depth()}"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "✅ Outbox drained. Totals this process: "
+                + ", ".join(f"{k}={v}" for k, v in sorted(delivery_stats.items()))
+            )
+        )
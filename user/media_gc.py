@@ -0,0 +1,170 @@
+import hashlib
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import FileField
+from django.utils import timezone
+
+from .booking import booking_pdf_name
+from .image_variants import is_image, variant_names
+from .models import Booking
+from .storage import BLOB_ROOT
+
+# Unreferenced files are moved here instead of deleted with --quarantine.
+# Moving frees nothing: the space comes back once the directory is purged
+# (and, for names sharing a dedup blob, once the next run removes the blob).
+QUARANTINE_ROOT = ".quarantine"
+GC_BATCH_SIZE = 500
+# Files younger than this are left alone: their row may not be committed yet
+MIN_AGE_MINUTES = 60
+
+
+def _key(name):
+    # 8 bytes per reference instead of the full path string
+    return hashlib.blake2b(name.encode(), digest_size=8).digest()
+
+
+# ------------------ Mark ------------------ #
+def referenced_names():
+    """
+    Stream every media name the database still needs: each FileField of
+    every model stored in the default storage, the resized variants of
+    referenced images and the cached ticket PDF of every booking.
+    """
+    for model in apps.get_models():
+        fields = [
+            field.attname
+            for field in model._meta.concrete_fields
+            # Files in other storages (outbox attachments) are not in MEDIA_ROOT
+            if isinstance(field, FileField) and field.storage is default_storage
+        ]
+        if not fields:
+            continue
+        rows = model._default_manager.values_list(*fields).iterator(chunk_size=2000)
+        for row in rows:
+            for name in row:
+                if not name:
+                    continue
+                yield name
+                if is_image(name):
+                    yield from variant_names(name)
+    bookings = Booking.objects.values_list("user_id", "id").iterator(chunk_size=2000)
+    for user_id, booking_id in bookings:
+        yield booking_pdf_name(user_id, booking_id)
+
+
+def mark():
+    return {_key(name) for name in referenced_names()}
+
+
+# ------------------ Sweep ------------------ #
+def _scan(root, relative="", skip=()):
+    """
+    ``(name, stat)`` for every file under ``root``/``relative``, via
+    os.scandir; top-level directories in ``skip`` or starting with a dot
+    are not entered.
+    """
+    with os.scandir(os.path.join(root, relative)) as entries:
+        for entry in entries:
+            name = f"{relative}/{entry.name}" if relative else entry.name
+            if not relative and (entry.name in skip or entry.name.startswith(".")):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan(root, name)
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry.stat(follow_symlinks=False)
+
+
+def _remove(root, names, quarantine):
+    for name in names:
+        path = os.path.join(root, name)
+        try:
+            if quarantine:
+                target = os.path.join(root, quarantine, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def collect_garbage(
+    dry_run=False,
+    quarantine=False,
+    min_age_minutes=MIN_AGE_MINUTES,
+    batch_size=GC_BATCH_SIZE,
+    log=None,
+):
+    """
+    Mark-and-sweep ``MEDIA_ROOT``: delete (or move to ``.quarantine/``)
+    every file no row refers to, in batches of ``batch_size``. Blobs of
+    the deduplicating storage go once no name links to them any more.
+
+    Returns a report; with ``dry_run`` nothing is touched. ``bytes`` is
+    the space freed, which is nothing when quarantining: ``quarantined``
+    is then the size of the files moved aside.
+    """
+    root = str(settings.MEDIA_ROOT)
+    started = time.perf_counter()
+    report = {"dry_run": dry_run, "scanned": 0, "orphans": 0, "bytes": 0}
+    report["quarantined"] = 0
+    report["by_dir"] = by_dir = Counter()
+
+    referenced = mark()
+    report["referenced"] = len(referenced)
+    report["mark_seconds"] = round(time.perf_counter() - started, 2)
+    if not os.path.isdir(root):
+        return report
+
+    target = None
+    if quarantine:
+        stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+        target = os.path.join(QUARANTINE_ROOT, stamp)
+    cutoff = time.time() - min_age_minutes * 60
+    # Blob links held by orphans a dry run leaves in place
+    pending_links = Counter()
+    batch = []
+
+    def flush():
+        if not dry_run:
+            _remove(root, batch, target)
+        batch.clear()
+
+    def sweep(name, stat, orphan, frees):
+        report["scanned"] += 1
+        # ctime moves when the storage re-links a fresh upload to an old blob
+        if not orphan or max(stat.st_mtime, stat.st_ctime) > cutoff:
+            return
+        report["orphans"] += 1
+        by_dir[name.split("/", 1)[0]] += stat.st_size
+        if quarantine:
+            report["quarantined"] += stat.st_size
+        elif frees:
+            report["bytes"] += stat.st_size
+        if log:
+            log(name)
+        if dry_run and not quarantine:
+            pending_links[stat.st_ino] += 1
+        batch.append(name)
+        if len(batch) >= batch_size:
+            flush()
+
+    for name, stat in _scan(root, skip={BLOB_ROOT}):
+        # A name sharing a blob frees nothing itself; the blob does
+        sweep(name, stat, _key(name) not in referenced, stat.st_nlink == 1)
+    flush()
+
+    if os.path.isdir(os.path.join(root, BLOB_ROOT)):
+        for name, stat in _scan(root, BLOB_ROOT):
+            # A blob is referenced by its other hard links
+            links = stat.st_nlink - pending_links[stat.st_ino]
+            sweep(name, stat, links <= 1, True)
+        flush()
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
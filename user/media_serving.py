@@ -0,0 +1,192 @@
+import io
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+MEDIA_MAX_AGE = getattr(settings, "MEDIA_MAX_AGE", 60 * 60)
+# Hand the transfer to the front proxy: None, "x-accel-redirect" (nginx) or
+# "x-sendfile" (Apache/lighttpd). nginx maps MEDIA_ACCEL_PREFIX to MEDIA_ROOT
+# with an `internal` location and handles Range itself.
+MEDIA_ACCEL_MODE = getattr(settings, "MEDIA_ACCEL_MODE", None)
+MEDIA_ACCEL_PREFIX = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+BLOCK_SIZE = 256 * 1024
+# Only these top-level directories are public. Ticket PDFs and QR codes,
+# payment screenshots and the dedup blobs are not served; they are reached
+# through views that check the user.
+PUBLIC_MEDIA_PREFIXES = getattr(
+    settings,
+    "PUBLIC_MEDIA_PREFIXES",
+    ("show_posters/", "thumbnails/", "variants/", "show_media/", "qrcodes/"),
+)
+# As FileResponse does: a compressed file is served as what it is, never
+# with a Content-Encoding the browser would undo
+COMPRESSED_TYPES = {
+    "bzip2": "application/x-bzip",
+    "gzip": "application/gzip",
+    "xz": "application/x-xz",
+}
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFile(io.RawIOBase):
+    """
+    ``length`` bytes of ``f`` from ``start``, seen as a whole file: reads
+    stop at the end of the range and ``tell``/``seek`` are relative to it,
+    so FileResponse sets the right Content-Length. ``fileno()`` is the real
+    descriptor, positioned at ``start``, which lets a WSGI server's
+    ``wsgi.file_wrapper`` (gunicorn) send the range with os.sendfile.
+    """
+
+    def __init__(self, f, start, length):
+        self.f = f
+        self.start = start
+        self.length = length
+        self.name = f.name
+        f.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def fileno(self):
+        return self.f.fileno()
+
+    def tell(self):
+        return self.f.tell() - self.start
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.tell(), io.SEEK_END: self.length}
+        position = min(max(base[whence] + offset, 0), self.length)
+        self.f.seek(self.start + position)
+        return position
+
+    def read(self, size=-1):
+        remaining = self.length - self.tell()
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.f.read(size) if size > 0 else b""
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+
+def parse_range(header, size):
+    """
+    ``(start, length)`` for a single ``bytes=`` range, ``None`` when the
+    header should be ignored (absent, malformed or several ranges: the
+    whole file is sent), ``False`` when it cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = min(int(last), size)  # suffix: the last N bytes
+        return (size - length, length) if length else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end - start + 1
+
+
+def _validators(stat):
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"', int(stat.st_mtime)
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in tags or "*" in tags
+    since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    return since is not None and mtime <= since
+
+
+def _range_applies(request, etag, mtime):
+    # If-Range: only resume when the client's copy is still current
+    if_range = request.META.get("HTTP_IF_RANGE", "").strip()
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == mtime
+
+
+def serve_media(request, path):
+    """
+    Serve a public file from ``MEDIA_ROOT`` (see ``PUBLIC_MEDIA_PREFIXES``)
+    with single byte-range requests (206/416, so video seeking resumes
+    instead of restarting), ETag and Last-Modified revalidation, and
+    optional hand-off to the front proxy via ``MEDIA_ACCEL_MODE``.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponse(status=405, headers={"Allow": "GET, HEAD"})
+    name = posixpath.normpath(path).lstrip("/")
+    if not name.startswith(PUBLIC_MEDIA_PREFIXES) or "/." in name:
+        raise Http404("Not found")
+    try:
+        full_path = safe_join(str(settings.MEDIA_ROOT), name)
+        stat = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+
+    etag, mtime = _validators(stat)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = COMPRESSED_TYPES.get(encoding, content_type)
+    content_type = content_type or "application/octet-stream"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(mtime),
+        "Cache-Control": f"public, max-age={MEDIA_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, mtime):
+        return HttpResponseNotModified(headers=headers)
+
+    if MEDIA_ACCEL_MODE == "x-accel-redirect":
+        headers["X-Accel-Redirect"] = MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + name
+        return HttpResponse(content_type=content_type, headers=headers)
+    if MEDIA_ACCEL_MODE == "x-sendfile":
+        headers["X-Sendfile"] = full_path
+        return HttpResponse(content_type=content_type, headers=headers)
+
+    byte_range = None
+    if _range_applies(request, etag, mtime):
+        byte_range = parse_range(request.META.get("HTTP_RANGE", ""), stat.st_size)
+    if byte_range is False:
+        headers["Content-Range"] = f"bytes */{stat.st_size}"
+        return HttpResponse(status=416, headers=headers)
+
+    start, length = byte_range or (0, stat.st_size)
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type, headers=headers)
+    else:
+        f = RangeFile(open(full_path, "rb"), start, length)
+        response = FileResponse(f, content_type=content_type, headers=headers)
+        response.block_size = BLOCK_SIZE
+    response["Content-Length"] = length
+    if byte_range:
+        response.status_code = 206
+        response["Content-Range"] = f"bytes {start}-{start + length - 1}/{stat.st_size}"
+    return response
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+# Directory shared by every worker process (gunicorn/uvicorn/daphne). Each
+# process flushes its totals to <dir>/<pid>.json and /metrics sums them.
+# Leave unset for a single process.
+MULTIPROC_DIR = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+FLUSH_INTERVAL = getattr(settings, "METRICS_FLUSH_SECONDS", 5)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name -> (type, help)
+METRICS = {
+    "raven_bookings_total": ("counter", "Booking attempts by outcome."),
+    "raven_seats_sold_total": ("counter", "Seats sold, per show."),
+    "raven_ticket_scans_total": ("counter", "Check-in scans by result."),
+    "raven_geo_lookups_total": ("counter", "IP geolocation lookups by cache result."),
+    "raven_websocket_connections": ("gauge", "Open seat-map WebSockets per show group."),
+    "raven_email_outbox_depth": ("gauge", "Emails waiting in the outbox."),
+    "raven_request_duration_seconds": ("histogram", "Request latency by view."),
+}  # fmt: skip
+
+# Gauges describe live processes only; counters from exited workers still count
+_LIVE_ONLY = {"raven_websocket_connections"}
+
+
+# ------------------ Per-process aggregation ------------------ #
+# Every thread writes to its own dict, so recording a sample never takes a
+# lock. A scrape merges the shards; copying a dict is atomic under the GIL.
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()  # only taken once per new thread
+_last_flush = [0.0]
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = defaultdict(float)
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name, amount=1, **labels):
+    _shard()[_key(name, labels)] += amount
+    _maybe_flush()
+
+
+def dec(name, amount=1, **labels):
+    inc(name, -amount, **labels)
+
+
+def observe(name, value, **labels):
+    """Record ``value`` in histogram ``name`` (cumulative buckets)."""
+    shard = _shard()
+    for bound in LATENCY_BUCKETS:
+        if value <= bound:
+            shard[_key(f"{name}_bucket", {**labels, "le": str(bound)})] += 1
+    shard[_key(f"{name}_bucket", {**labels, "le": "+Inf"})] += 1
+    shard[_key(f"{name}_sum", labels)] += value
+    shard[_key(f"{name}_count", labels)] += 1
+    _maybe_flush()
+
+
+def snapshot():
+    """This process's totals, merged across threads."""
+    totals = defaultdict(float)
+    for shard in list(_shards):
+        for key, value in dict(shard).items():
+            totals[key] += value
+    return totals
+
+
+# ------------------ Multiprocess ------------------ #
+def _maybe_flush():
+    if MULTIPROC_DIR and time.monotonic() - _last_flush[0] >= FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Write this process's totals for other workers' scrapes to merge."""
+    _last_flush[0] = time.monotonic()
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    path = os.path.join(MULTIPROC_DIR, f"{os.getpid()}.json")
+    data = [[name, list(labels), value] for (name, labels), value in snapshot().items()]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _base_name(name):
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def collect():
+    """Totals across every worker process (or just this one)."""
+    if not MULTIPROC_DIR:
+        return snapshot()
+
+    flush()
+    totals = defaultdict(float)
+    for entry in os.scandir(MULTIPROC_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        pid = int(entry.name.split(".")[0])
+        alive = _pid_alive(pid)
+        try:
+            with open(entry.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced right now; next scrape gets it
+        for name, labels, value in data:
+            if not alive and _base_name(name) in _LIVE_ONLY:
+                continue
+            totals[(name, tuple(tuple(pair) for pair in labels))] += value
+    return totals
+
+
+# ------------------ Exposition ------------------ #
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + inner + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render(extra=None):
+    """
+    Prometheus text exposition (version 0.0.4). ``extra`` maps a gauge
+    name to a value read at scrape time (e.g. the outbox depth).
+    """
+    totals = collect()
+    for name, value in (extra or {}).items():
+        totals[(name, ())] = value
+
+    by_metric = defaultdict(list)
+    for (name, labels), value in totals.items():
+        by_metric[_base_name(name) if _base_name(name) in METRICS else name].append(
+            (name, labels, value)
+        )
+
+    lines = []
+    for metric in sorted(by_metric):
+        kind, help_text = METRICS.get(metric, ("untyped", ""))
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, labels, value in sorted(by_metric[metric], key=_series_order):
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _series_order(series):
+    name, labels, _ = series
+    le = dict(labels).get("le")
+    bound = float("inf") if le == "+Inf" else float(le) if le else 0
+    return (name, [pair for pair in labels if pair[0] != "le"], bound)
+
+
+# ------------------ Domain events ------------------ #
+def booking_committed(show_id, seats):
+    """Count a booking once its transaction has actually committed."""
+
+    def record():
+        inc("raven_bookings_total", outcome="committed")
+        inc("raven_seats_sold_total", seats, show=str(show_id))
+
+    transaction.on_commit(record)
+
+
+def booking_conflicted():
+    inc("raven_bookings_total", outcome="conflict")
+
+
+def bookings_expired(count):
+    transaction.on_commit(lambda: inc("raven_bookings_total", count, outcome="expired"))
+
+
+def ticket_scanned(result):
+    """``result`` is "valid", "duplicate" or "invalid"."""
+    inc("raven_ticket_scans_total", result=result)
+
+
+# ------------------ Request latency ------------------ #
+class MetricsMiddleware:
+    """Latency histogram per resolved view name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        observe(
+            "raven_request_duration_seconds",
+            time.perf_counter() - started,
+            view=match.view_name if match else "unresolved",
+        )
+        return response
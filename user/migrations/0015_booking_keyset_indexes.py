@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0014_outboundemail"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="booking_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="booking_user_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0016_bookingrequest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="booking",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="tickets",
+                to="user.booking",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ticket",
+            name="seat",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="tickets",
+                to="user.seat",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="booking",
+            name="ticket",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="first_ticket_of",
+                to="user.ticket",
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations
+
+# Tickets are created a moment after their booking; anything further apart
+# is a different purchase (or an offline sale with no booking at all)
+MATCH_WINDOW = timedelta(minutes=5)
+
+
+def link_tickets(apps, schema_editor):
+    Booking = apps.get_model("user", "Booking")
+    Seat = apps.get_model("user", "Seat")
+    Ticket = apps.get_model("user", "Ticket")
+
+    seat_ids = {
+        (show_id, seat_number): seat_id
+        for seat_id, show_id, seat_number in Seat.objects.values_list(
+            "id", "show_id", "seat_number"
+        ).iterator()
+    }
+
+    bookings = defaultdict(list)  # (user, show) -> [(booking_date, id)]
+    first_ticket_of = {}
+    rows = Booking.objects.values_list(
+        "id", "user_id", "show_id", "booking_date", "ticket_id"
+    )
+    for booking_id, user_id, show_id, booked_at, ticket_id in rows.iterator():
+        bookings[(user_id, show_id)].append((booked_at, booking_id))
+        if ticket_id:
+            first_ticket_of[ticket_id] = booking_id
+
+    def closest_booking(ticket):
+        candidates = [
+            (abs(ticket.booking_date - booked_at), booking_id)
+            for booked_at, booking_id in bookings.get(
+                (ticket.user_id, ticket.show_id), ()
+            )
+        ]
+        if not candidates:
+            return None
+        gap, booking_id = min(candidates)
+        return booking_id if gap <= MATCH_WINDOW else None
+
+    batch = []
+    for ticket in Ticket.objects.only(
+        "id", "user_id", "show_id", "seat_number", "booking_date"
+    ).iterator():
+        ticket.seat_id = seat_ids.get((ticket.show_id, ticket.seat_number))
+        ticket.booking_id = first_ticket_of.get(ticket.id) or closest_booking(ticket)
+        batch.append(ticket)
+        if len(batch) >= 500:
+            Ticket.objects.bulk_update(batch, ["seat", "booking"])
+            batch = []
+    if batch:
+        Ticket.objects.bulk_update(batch, ["seat", "booking"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0017_ticket_booking_seat"),
+    ]
+
+    operations = [
+        migrations.RunPython(link_tickets, migrations.RunPython.noop),
+    ]
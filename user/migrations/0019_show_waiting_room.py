@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0018_backfill_ticket_links"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="show",
+            name="on_sale_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="show",
+            name="waiting_room_minutes",
+            field=models.PositiveIntegerField(
+                default=0, help_text="0 turns the waiting room off."
+            ),
+        ),
+    ]
@@ -0,0 +1,94 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+# Frozen copy of the layout at the time of this migration
+HOUSE_ROWS = ("A", "B")
+
+
+def _row(seat_number):
+    return "".join(filter(str.isalpha, seat_number))
+
+
+def _layout(include_balcony):
+    rows = [(chr(i), 26) for i in range(ord("A"), ord("T") + 1)]
+    if include_balcony:
+        rows += [(f"B{chr(i)}", 22) for i in range(ord("A"), ord("O") + 1)]
+    return [f"{row}{n}" for row, length in rows for n in range(1, length + 1)]
+
+
+def collapse_free_seats(apps, schema_editor):
+    """Keep only seats that are not free; there is no row for a free seat."""
+    Seat = apps.get_model("user", "Seat")
+    Ticket = apps.get_model("user", "Ticket")
+
+    ticketed = Ticket.objects.exclude(seat=None).values("seat_id")
+    Seat.objects.filter(is_booked=False).exclude(id__in=ticketed).delete()
+
+    # Booked rows nobody holds a ticket for were the house rows
+    unticketed = Seat.objects.exclude(id__in=ticketed)
+    for row in HOUSE_ROWS:
+        unticketed.filter(seat_number__regex=rf"^{row}[0-9]+$").update(kind="house")
+
+    # One row per seat before the unique constraint goes on
+    duplicates = (
+        Seat.objects.values("show_id", "seat_number")
+        .annotate(rows=Count("id"), keep=Min("id"))
+        .filter(rows__gt=1)
+    )
+    for dup in duplicates:
+        extra = Seat.objects.filter(
+            show_id=dup["show_id"], seat_number=dup["seat_number"]
+        ).exclude(id=dup["keep"])
+        Ticket.objects.filter(seat__in=extra).update(seat_id=dup["keep"])
+        extra.delete()
+
+
+def expand_free_seats(apps, schema_editor):
+    Seat = apps.get_model("user", "Seat")
+    Show = apps.get_model("user", "Show")
+
+    Seat.objects.update(is_booked=True)
+    for show in Show.objects.only("id", "include_balcony"):
+        taken = set(
+            Seat.objects.filter(show=show).values_list("seat_number", flat=True)
+        )
+        Seat.objects.bulk_create(
+            Seat(show=show, seat_number=seat_number, is_booked=False)
+            for seat_number in _layout(show.include_balcony)
+            if seat_number not in taken
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0019_show_waiting_room"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="seat",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="seat",
+            name="kind",
+            field=models.CharField(
+                choices=[("sold", "Sold"), ("held", "Held"), ("house", "House seat")],
+                default="sold",
+                max_length=5,
+            ),
+        ),
+        migrations.RunPython(collapse_free_seats, expand_free_seats),
+        migrations.RemoveField(
+            model_name="seat",
+            name="is_booked",
+        ),
+        migrations.AddConstraint(
+            model_name="seat",
+            constraint=models.UniqueConstraint(
+                fields=("show", "seat_number"), name="seat_show_number_uniq"
+            ),
+        ),
+    ]
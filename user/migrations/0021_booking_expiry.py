@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0020_sparse_seats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="booking",
+            name="payment_status",
+            field=models.CharField(
+                choices=[
+                    ("Pending", "Pending"),
+                    ("Confirmed", "Confirmed"),
+                    ("Initiated", "Initiated"),
+                    ("Paid", "Paid"),
+                    ("Cancelled", "Cancelled"),
+                    ("Expired", "Expired"),
+                ],
+                default="Pending",
+                max_length=50,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ticket",
+            name="payment_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("confirmed", "Confirmed"),
+                    ("void", "Void"),
+                ],
+                default="confirmed",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["payment_status", "created_at"],
+                name="booking_status_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0023_media_upload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheVersion",
+            fields=[
+                (
+                    "scope",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("version", models.FloatField(default=0)),
+            ],
+        ),
+    ]
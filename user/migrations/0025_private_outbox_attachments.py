@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:28
+
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import migrations, models
+
+import user.models
+
+
+def move_attachments(apps, schema_editor):
+    """
+    Attachments of emails still to be sent move out of MEDIA_ROOT into the
+    private storage (same names); those of sent or dead emails are deleted.
+    """
+    OutboundEmail = apps.get_model("user", "OutboundEmail")
+    private = storages["private"]
+    rows = OutboundEmail.objects.exclude(attachment="").exclude(attachment=None)
+    for outbound in rows.iterator():
+        name = outbound.attachment.name
+        public_path = os.path.join(settings.MEDIA_ROOT, *name.split("/"))
+        if outbound.status in ("sent", "failed"):
+            if os.path.exists(public_path):
+                os.remove(public_path)
+            OutboundEmail.objects.filter(id=outbound.id).update(attachment="")
+        elif os.path.exists(public_path):
+            os.makedirs(os.path.dirname(private.path(name)), exist_ok=True)
+            shutil.move(public_path, private.path(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0024_cache_version"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="outboundemail",
+            name="attachment",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                storage=user.models.private_storage,
+                upload_to="outbox/",
+            ),
+        ),
+        migrations.RunPython(move_attachments, migrations.RunPython.noop),
+    ]
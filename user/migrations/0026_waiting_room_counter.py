@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0025_private_outbox_attachments"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WaitingRoomCounter",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("issued", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
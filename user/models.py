@@ -1,14 +1,17 @@
+import uuid
 from datetime import date
-from io import BytesIO
 
-import qrcode
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
-from django.core.files.base import ContentFile
+from django.core.files.storage import storages
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .image_variants import is_image, variant_srcset, variant_url
+from .seat_layout import capacity, house_seats
+
 User = get_user_model()
 
 
@@ -46,7 +49,14 @@ class Show(models.Model):
     total_seats = models.IntegerField(default=0)
     seat_price = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
     include_balcony = models.BooleanField(default=True)  # ✅ New field
+    # Rendered on first use by user.show_qr, not on save
     qr_code = models.ImageField(upload_to="qrcodes/", blank=True, null=True)
+    # Waiting room: /book/ queues buyers until on_sale_at plus the minutes
+    # below, letting them in at a fixed rate from on_sale_at
+    on_sale_at = models.DateTimeField(blank=True, null=True)
+    waiting_room_minutes = models.PositiveIntegerField(
+        default=0, help_text="0 turns the waiting room off."
+    )
 
     def save(self, *args, **kwargs):
         from .models import Seat  # Make sure Seat is defined below this class
@@ -62,47 +72,55 @@ class Show(models.Model):
             self.slug = slug
 
         # ✅ 2. Save to generate Show ID
+        creating = self._state.adding
         super().save(*args, **kwargs)
 
-        # ✅ 3. Generate QR code
-        qr = qrcode.make(f"http://127.0.0.1:8000/qr/scan/{self.id}/")
-        buffer = BytesIO()
-        qr.save(buffer)
-        self.qr_code.save(
-            f"{self.slug}_qr.png", ContentFile(buffer.getvalue()), save=False
-        )
-        super().save(update_fields=["qr_code"])
-
-        # ✅ 4. Auto-generate Bharat Natya Mandir seat layout (only once)
-        if not Seat.objects.filter(show=self).exists():
-            # Ground Floor: A to T, 26 seats per row
-            ground_rows = [chr(i) for i in range(ord("A"), ord("T") + 1)]
-            for row in ground_rows:
-                for num in range(1, 27):
-                    seat_number = f"{row}{num}"
-                    is_booked = row in ["A", "B"]  # ✅ A and B rows booked by default
-                    Seat.objects.create(
-                        show=self, seat_number=seat_number, is_booked=is_booked
-                    )
-
-            # Balcony: BA to BO, 22 seats per row (conditionally included)
-            if self.include_balcony:
-                balcony_rows = [f"B{chr(i)}" for i in range(ord("A"), ord("O") + 1)]
-                for row in balcony_rows:
-                    for num in range(1, 23):
-                        seat_number = f"{row}{num}"
-                        Seat.objects.create(
-                            show=self, seat_number=seat_number, is_booked=False
-                        )
+        # ✅ 3. Hold back the house rows (only once; free seats aren't stored)
+        if creating:
+            Seat.objects.bulk_create(
+                Seat(show=self, seat_number=seat_number, kind="house")
+                for seat_number in house_seats(self.include_balcony)
+            )
+
+    @property
+    def seat_capacity(self):
+        return capacity(self.include_balcony)
+
+    # ✅ Resized copies of poster/thumbnail (falls back to the original)
+    def image_url(self, field="thumbnail", width=640, ext="webp"):
+        return variant_url(getattr(self, field), width, ext)
+
+    def image_srcset(self, field="thumbnail", ext="webp"):
+        return variant_srcset(getattr(self, field), ext)
 
     def __str__(self):
         return self.name
 
 
 class Seat(models.Model):
+    """
+    A seat that is not free. Free seats have no row: the map is the static
+    layout in ``seat_layout`` minus these, and the unique constraint is
+    what stops a seat being sold twice.
+    """
+
+    KIND_CHOICES = [
+        ("sold", "Sold"),
+        ("held", "Held"),
+        ("house", "House seat"),
+    ]
+
     show = models.ForeignKey(Show, on_delete=models.CASCADE)
     seat_number = models.CharField(max_length=10)
-    is_booked = models.BooleanField(default=False)
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES, default="sold")
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["show", "seat_number"], name="seat_show_number_uniq"
+            )
+        ]
 
     def __str__(self):
         return f"Seat {self.seat_number} for {self.show.name}"
@@ -118,7 +136,14 @@ class Booking(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     payment_status = models.CharField(
         max_length=50,
-        choices=[("Pending", "Pending"), ("Paid", "Paid")],
+        choices=[
+            ("Pending", "Pending"),
+            ("Confirmed", "Confirmed"),  # seats taken, awaiting payment
+            ("Initiated", "Initiated"),  # sent to the UPI app
+            ("Paid", "Paid"),
+            ("Cancelled", "Cancelled"),
+            ("Expired", "Expired"),  # unpaid too long; seats released
+        ],
         default="Pending",
     )
     transaction_id = models.CharField(max_length=255, blank=True, null=True)
@@ -127,10 +152,29 @@ class Booking(models.Model):
     )
     upi_id = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # First ticket, for old templates; ``booking.tickets`` holds all of them
     ticket = models.ForeignKey(
-        "Ticket", on_delete=models.SET_NULL, null=True, blank=True
+        "Ticket",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="first_ticket_of",
     )
 
+    class Meta:
+        indexes = [
+            # Keyset pagination: newest-first admin and user booking lists
+            models.Index(fields=["-created_at", "-id"], name="booking_created_idx"),
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="booking_user_created_idx"
+            ),
+            # Expiry sweep: unpaid bookings by age
+            models.Index(
+                fields=["payment_status", "created_at"],
+                name="booking_status_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.event_name} - {self.payment_status}"
 
@@ -142,6 +186,16 @@ class MediaFile(models.Model):
     file = models.FileField(upload_to="show_media/")
     description = models.CharField(max_length=100, blank=True)
 
+    @property
+    def is_image(self):
+        return is_image(self.file.name)
+
+    def image_url(self, width=640, ext="webp"):
+        return variant_url(self.file, width, ext)
+
+    def image_srcset(self, ext="webp"):
+        return variant_srcset(self.file, ext)
+
     def __str__(self):
         return f"{self.show.name} - {self.description or self.file.name}"
 
@@ -149,13 +203,28 @@ class MediaFile(models.Model):
 class Ticket(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     show = models.ForeignKey("Show", on_delete=models.CASCADE)
-    seat_number = models.CharField(max_length=10)
+    # Null for offline (admin manual) sales, which have no Booking row
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="tickets",
+    )
+    seat = models.ForeignKey(
+        Seat, on_delete=models.SET_NULL, null=True, blank=True, related_name="tickets"
+    )
+    seat_number = models.CharField(max_length=10)  # kept for printing and exports
     booking_date = models.DateTimeField(auto_now_add=True)
     is_scanned = models.BooleanField(default=False)
     qr_code = models.ImageField(upload_to="tickets/qrcodes/", blank=True, null=True)
     payment_status = models.CharField(
         max_length=20,
-        choices=[("pending", "Pending"), ("confirmed", "Confirmed")],
+        choices=[
+            ("pending", "Pending"),  # booking not paid yet; not sent or valid
+            ("confirmed", "Confirmed"),
+            ("void", "Void"),  # booking expired unpaid; not valid for entry
+        ],
         default="confirmed",
     )
 
@@ -201,3 +270,168 @@ class QRMarketingScan(models.Model):
 
     def __str__(self):
         return f"{self.identifier} - {self.district} @ {self.timestamp}"
+
+
+def private_storage():
+    return storages["private"]
+
+
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.TextField()  # comma-separated recipients
+    # Only kept until the email is sent or given up on
+    attachment = models.FileField(
+        upload_to="outbox/", storage=private_storage, blank=True, null=True
+    )
+    attachment_name = models.CharField(max_length=255, blank=True)
+    attachment_mimetype = models.CharField(max_length=100, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default="pending", db_index=True
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.subject} → {self.to} ({self.status})"
+
+
+class BookingRequest(models.Model):
+    """An idempotency key: replaying the same key returns the same booking."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="booking_requests"
+    )
+    key = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=64)  # sha256 of the request body
+    booking = models.ForeignKey(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    response = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="booking_request_user_key_uniq"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} · {self.key}"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A request for seats once a show is full. Released seats are offered in
+    FIFO order; an offer holds its seats (``Seat.kind="held"``) until it is
+    accepted or ``offer_expires_at`` passes.
+    """
+
+    SECTION_CHOICES = [
+        ("", "Any"),
+        ("STALL", "Stall"),
+        ("BALCONY", "Balcony"),
+    ]
+    STATUS_CHOICES = [
+        ("waiting", "Waiting"),
+        ("offered", "Offered"),
+        ("booked", "Booked"),
+        ("expired", "Offer expired"),
+        ("left", "Left the waitlist"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="waitlist")
+    show = models.ForeignKey(Show, on_delete=models.CASCADE, related_name="waitlist")
+    party_size = models.PositiveSmallIntegerField(default=1)
+    section = models.CharField(
+        max_length=7, choices=SECTION_CHOICES, blank=True, default=""
+    )
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default="waiting")
+    offered_seats = models.JSONField(default=list, blank=True)
+    offer_expires_at = models.DateTimeField(null=True, blank=True)
+    booking = models.ForeignKey(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # FIFO matching: a show's waiting entries, oldest first
+            models.Index(
+                fields=["show", "status", "created_at", "id"],
+                name="waitlist_fifo_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} · {self.show} · {self.party_size} ({self.status})"
+
+
+class MediaUpload(models.Model):
+    """A resumable chunked upload of show media, attached as a MediaFile once done."""
+
+    STATUS_CHOICES = [
+        ("uploading", "Uploading"),
+        ("complete", "Complete"),
+        ("failed", "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    show = models.ForeignKey(Show, on_delete=models.CASCADE, related_name="uploads")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    description = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)  # of the whole file
+    status = models.CharField(max_length=9, choices=STATUS_CHOICES, default="uploading")
+    media = models.ForeignKey(
+        MediaFile, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size}, {self.status})"
+
+
+class CacheVersion(models.Model):
+    """
+    Modification stamp of a page-cache scope ("shows", "show:<id>",
+    "seats:<id>"). Kept in the database so a bump made by one worker is seen
+    by every other one; the pages themselves stay in the local cache.
+    """
+
+    scope = models.CharField(max_length=64, primary_key=True)
+    version = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.scope} @ {self.version}"
+
+
+class WaitingRoomCounter(models.Model):
+    """
+    Queue positions handed out for one show's on-sale window
+    ("<show id>:<opening epoch>"). In the database, like CacheVersion, so
+    every worker numbers the same queue.
+    """
+
+    key = models.CharField(max_length=64, primary_key=True)
+    issued = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key}: {self.issued}"
@@ -0,0 +1,98 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import CacheVersion
+
+PAGE_CACHE_SECONDS = getattr(settings, "PAGE_CACHE_SECONDS", 10 * 60)
+
+# Version scopes: "shows" covers every listing of shows (home page),
+# "show:<id>" covers one show's detail page and its media. Versions live in
+# the database (CacheVersion); rendered pages are cached per process under
+# their version, so a stale local copy is simply never asked for again.
+SHOWS_SCOPE = "shows"
+
+
+def show_scope(show_id):
+    return f"show:{show_id}"
+
+
+def get_version(scope):
+    """
+    Return the scope's version, the time of its last bump (0 if it never
+    had one). It is read from the database on every call, one primary-key
+    lookup, so all workers agree on it.
+    """
+    version = (
+        CacheVersion.objects.filter(scope=scope)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_version(*scopes):
+    """
+    Move the scopes to a new version. The write is part of the surrounding
+    transaction, so the new version appears together with the data.
+    """
+    now = time.time()
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(scope=scope, version=now) for scope in scopes],
+        update_conflicts=True,
+        unique_fields=["scope"],
+        update_fields=["version"],
+    )
+
+
+def _etag(key, version):
+    digest = hashlib.md5(f"{key}:{version}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional_response(request, key, version):
+    """
+    Return a 304 response if the client's ETag / Last-Modified still match,
+    else ``None``. ``key`` must capture everything the page varies on.
+    """
+    return get_conditional_response(
+        request, etag=_etag(key, version), last_modified=int(version)
+    )
+
+
+def set_validators(response, key, version, private=False):
+    response["ETag"] = _etag(key, version)
+    response["Last-Modified"] = http_date(int(version))
+    # Browsers keep the page but revalidate, which turns repeat views into 304s
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def cached_page(request, key, version, render_page):
+    """
+    Serve a user-independent page from the cache, re-rendering with
+    ``render_page()`` only when ``version`` has moved on.
+    """
+    not_modified = conditional_response(request, key, version)
+    if not_modified is not None:
+        return not_modified
+
+    cache_key = f"page:{key}:{version}"
+    content = cache.get(cache_key)
+    if content is None:
+        response = render_page()
+        if response.status_code != 200:
+            return response
+        content = response.content
+        cache.set(cache_key, content, PAGE_CACHE_SECONDS)
+
+    response = HttpResponse(content)
+    return set_validators(response, key, version)
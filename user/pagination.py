@@ -0,0 +1,124 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = getattr(settings, "LIST_PAGE_SIZE", 25)
+MAX_PAGE_SIZE = getattr(settings, "LIST_MAX_PAGE_SIZE", 200)
+
+
+class KeysetPage:
+    """One page of a seek-paginated queryset, newest first."""
+
+    def __init__(self, object_list, next_cursor, page_size, next_query=""):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+        self.next_query = next_query
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def encode_cursor(obj, keys):
+    values = [str(getattr(obj, key)) for key in keys]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, model, keys):
+    """
+    Turn a cursor token back into typed key values. Raises ``ValueError``
+    (which also covers bad base64/JSON) for anything malformed.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(raw, list) or len(raw) != len(keys):
+            raise ValueError("cursor does not match the page keys")
+        return [
+            model._meta.get_field(key).to_python(value) for key, value in zip(keys, raw)
+        ]
+    except (TypeError, ValidationError) as e:
+        raise ValueError(f"invalid cursor: {e}")
+
+
+def _seek_filter(keys, values):
+    # (k1 < v1) OR (k1 = v1 AND k2 < v2) OR ...  for a descending walk
+    condition = Q()
+    for i, key in enumerate(keys):
+        step = Q(**{f"{key}__lt": values[i]})
+        for prev_key, prev_value in zip(keys[:i], values[:i]):
+            step &= Q(**{prev_key: prev_value})
+        condition |= step
+    return condition
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(request.GET.get("page_size", default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, keys=None):
+    """
+    Return a ``KeysetPage`` of ``queryset`` ordered by ``keys`` descending.
+
+    Each page is a single ``WHERE (keys) < cursor ORDER BY keys LIMIT n+1``
+    query, so the cost stays flat however deep the admin pages.
+    """
+    keys = tuple(keys or ("created_at", "id"))
+    qs = queryset.order_by(*[f"-{key}" for key in keys])
+
+    if cursor:
+        try:
+            values = decode_cursor(cursor, queryset.model, keys)
+        except ValueError:
+            values = None  # a stale or mangled cursor just restarts the list
+        if values is not None:
+            qs = qs.filter(_seek_filter(keys, values))
+
+    items = list(qs[: page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1], keys)
+    return KeysetPage(items, next_cursor, page_size)
+
+
+def keyset_page_for_request(request, queryset, keys=None, default_size=None):
+    """``keyset_page`` driven by ``?cursor=`` and ``?page_size=`` parameters."""
+    page = keyset_page(
+        queryset,
+        cursor=request.GET.get("cursor"),
+        page_size=get_page_size(request, default_size or DEFAULT_PAGE_SIZE),
+        keys=keys,
+    )
+    if page.has_next:
+        params = request.GET.copy()
+        params["cursor"] = page.next_cursor
+        page.next_query = params.urlencode()
+    return page
+
+
+def filter_users(request, users):
+    """Narrow a user queryset by ``?q=`` (username/email) and ``?user_type=``."""
+    query = request.GET.get("q", "").strip()
+    user_type = request.GET.get("user_type")
+    if query:
+        users = users.filter(Q(username__icontains=query) | Q(email__icontains=query))
+    if user_type in ("User", "Admin"):
+        users = users.filter(user_type=user_type)
+    return users
@@ -0,0 +1,213 @@
+import contextvars
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.utils import timezone
+
+# Opt-in: nothing here costs more than a context-variable lookup when off
+PROFILING_ENABLED = getattr(settings, "PROFILING_ENABLED", False)
+BUFFER_SIZE = getattr(settings, "PROFILING_BUFFER_SIZE", 500)
+# Fraction of requests run under cProfile and dumped to PROFILING_DUMP_DIR
+CPROFILE_SAMPLE_RATE = getattr(settings, "PROFILING_CPROFILE_SAMPLE_RATE", 0.0)
+DUMP_DIR = getattr(
+    settings, "PROFILING_DUMP_DIR", os.path.join(settings.BASE_DIR, "profiles")
+)
+# Admins can add ?_profile=1 to any URL to get a cProfile report instead
+ON_DEMAND_PARAM = "_profile"
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+# Finished requests, newest last; deque appends are atomic under the GIL
+recent_requests = deque(maxlen=BUFFER_SIZE)
+
+
+class RequestProfile:
+    __slots__ = ("started", "totals", "counts")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = defaultdict(float)  # span name -> ms
+        self.counts = defaultdict(int)
+
+    def add(self, name, ms):
+        self.totals[name] += ms
+        self.counts[name] += 1
+
+
+# ------------------ Timing API ------------------ #
+@contextmanager
+def span(name):
+    """
+    Time a block under ``name`` for the current request::
+
+        with span("geo"):
+            requests.get(...)
+
+    Outside a profiled request this does nothing.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, (time.perf_counter() - started) * 1000)
+
+
+def timed(name):
+    """Decorator form of ``span``: ``@timed("pdf")``."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _db_span(execute, sql, params, many, context):
+    with span("db"):
+        return execute(sql, params, many, context)
+
+
+# ------------------ Reporting ------------------ #
+def server_timing(profile, total_ms):
+    parts = [
+        f'{name};dur={ms:.1f};desc="{profile.counts[name]}x"'
+        for name, ms in sorted(profile.totals.items())
+    ]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def slowest_endpoints(limit=20):
+    """Aggregate the ring buffer by view: count, avg/p95/max ms, span averages."""
+    by_view = defaultdict(list)
+    for entry in list(recent_requests):
+        by_view[entry["view"]].append(entry)
+
+    rows = []
+    for view, entries in by_view.items():
+        durations = [e["total_ms"] for e in entries]
+        spans = defaultdict(float)
+        for entry in entries:
+            for name, ms in entry["spans"].items():
+                spans[name] += ms
+        rows.append(
+            {
+                "view": view,
+                "count": len(entries),
+                "avg_ms": round(sum(durations) / len(durations), 1),
+                "p95_ms": round(_percentile(durations, 95), 1),
+                "max_ms": round(max(durations), 1),
+                "spans": {
+                    name: round(ms / len(entries), 1)
+                    for name, ms in sorted(spans.items(), key=lambda kv: -kv[1])
+                },
+            }
+        )
+    rows.sort(key=lambda row: -row["p95_ms"])
+    return rows[:limit]
+
+
+def slowest_requests(limit=20):
+    return sorted(recent_requests, key=lambda e: -e["total_ms"])[:limit]
+
+
+def _pstats_text(profiler, limit=60):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def _dump(profiler, request):
+    os.makedirs(DUMP_DIR, exist_ok=True)
+    slug = request.path.strip("/").replace("/", "_") or "root"
+    stamp = timezone.now().strftime("%Y%m%d-%H%M%S-%f")
+    profiler.dump_stats(os.path.join(DUMP_DIR, f"{stamp}-{slug}.prof"))
+
+
+# ------------------ Middleware ------------------ #
+class ProfilingMiddleware:
+    """
+    Per-request spans (DB, QR, PDF, email, geo lookups) exported as a
+    ``Server-Timing`` header and kept in ``recent_requests`` for the admin
+    profiling page. Enable with ``PROFILING_ENABLED = True``.
+    """
+
+    def __init__(self, get_response):
+        if not PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        user = getattr(request, "user", None)
+        on_demand = (
+            request.GET.get(ON_DEMAND_PARAM) == "1"
+            and user is not None
+            and user.is_authenticated
+            and user.user_type == "Admin"
+        )
+        sampled = CPROFILE_SAMPLE_RATE and random.random() < CPROFILE_SAMPLE_RATE
+        profiler = cProfile.Profile() if on_demand or sampled else None
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_db_span))
+                if profiler is not None:
+                    # cProfile allows one active profiler per process
+                    with self._lock:
+                        response = profiler.runcall(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        response["Server-Timing"] = server_timing(profile, total_ms)
+        match = getattr(request, "resolver_match", None)
+        recent_requests.append(
+            {
+                "at": timezone.now(),
+                "method": request.method,
+                "path": request.path,
+                "view": match.view_name if match else request.path,
+                "status": response.status_code,
+                "total_ms": round(total_ms, 1),
+                "spans": {name: round(ms, 1) for name, ms in profile.totals.items()},
+                "queries": profile.counts.get("db", 0),
+            }
+        )
+
+        if sampled:
+            _dump(profiler, request)
+        if on_demand:
+            return HttpResponse(_pstats_text(profiler), content_type="text/plain")
+        return response
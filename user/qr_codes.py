@@ -0,0 +1,30 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import qrcode
+
+# Plain QR rendering with no Django imports, so worker processes can run it
+# without setting Django up (spawn start method included).
+
+
+def qr_png(data):
+    """PNG bytes of a QR code for ``data``."""
+    buffer = BytesIO()
+    qrcode.make(data).save(buffer)
+    return buffer.getvalue()
+
+
+def qr_pngs(payloads, workers=None):
+    """
+    ``qr_png`` for every payload, spread over a process pool: encoding is
+    CPU-bound, so threads would just take turns on the GIL. ``workers=1``
+    (or a single payload) renders in this process.
+    """
+    payloads = list(payloads)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(payloads) < 2:
+        return [qr_png(payload) for payload in payloads]
+    chunksize = max(1, len(payloads) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=min(workers, len(payloads))) as pool:
+        return list(pool.map(qr_png, payloads, chunksize=chunksize))
@@ -5,7 +5,7 @@ import threading
 import qrcode
 from django.conf import settings
 from django.core.files import File
-from django.core.mail import EmailMessage
+from django.db.models import prefetch_related_objects
 from PIL import Image
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
@@ -14,12 +14,17 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
+from .image_variants import pdf_poster_path
+from .mail_outbox import queue_email
+from .profiling import timed
+
 # Register DejaVu font for ₹ and Unicode support
 font_path = os.path.join(settings.BASE_DIR, "static/assets/fonts/DejaVuSans.ttf")
 if os.path.exists(font_path):
     pdfmetrics.registerFont(TTFont("DejaVu", font_path))
 
 
+@timed("qr")
 def generate_ticket_qr(ticket, request):
     domain = request.get_host()
     scheme = "https" if not settings.DEBUG else "http"
@@ -43,9 +48,12 @@ def generate_ticket_qr(ticket, request):
     qr_io = io.BytesIO()
     qr_img.save(qr_io, format="PNG")
     qr_file = File(qr_io, name=f"ticket_{ticket.id}.png")
+    if ticket.qr_code:
+        ticket.qr_code.delete(save=False)  # don't leave ticket_<id>_xyz.png behind
     ticket.qr_code.save(f"ticket_{ticket.id}.png", qr_file)
 
 
+@timed("pdf")
 def generate_ticket_pdf(tickets, request, buyer_name=None):
     buffer = io.BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
@@ -56,6 +64,10 @@ def generate_ticket_pdf(tickets, request, buyer_name=None):
     vertical_spacing = 15 * mm
     y = height - y_margin
 
+    # One query each for shows and buyers instead of two per ticket
+    tickets = list(tickets)
+    prefetch_related_objects(tickets, "show", "user")
+
     for ticket in tickets:
         if y - ticket_height < y_margin:
             p.showPage()
@@ -77,8 +89,9 @@ def generate_ticket_pdf(tickets, request, buyer_name=None):
 
         # Poster
         if show.poster:
-            poster_path = os.path.join(settings.MEDIA_ROOT, str(show.poster))
-            if os.path.exists(poster_path):
+            # Small JPEG copy instead of embedding the multi-MB upload
+            poster_path = pdf_poster_path(show.poster)
+            if poster_path:
                 p.drawImage(
                     ImageReader(poster_path),
                     x_margin + 5,
@@ -112,7 +125,7 @@ def generate_ticket_pdf(tickets, request, buyer_name=None):
 
         # QR Code
         qr_path = os.path.join(settings.MEDIA_ROOT, str(ticket.qr_code))
-        if os.path.exists(qr_path):
+        if ticket.qr_code and os.path.exists(qr_path):
             p.drawImage(
                 qr_path,
                 x_margin + ticket_width - 50 * mm,
@@ -146,14 +159,12 @@ def background_task(func):
 
 
 def send_ticket_email(user_email, pdf_buffer):
-    email = EmailMessage(
-        subject="🎫 Your Raven Entertainment Tickets",
-        body="Attached is your ticket(s). See you at the show!",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[user_email],
+    queue_email(
+        "🎫 Your Raven Entertainment Tickets",
+        "Attached is your ticket(s). See you at the show!",
+        [user_email],
+        attachment=("tickets.pdf", pdf_buffer.getvalue(), "application/pdf"),
     )
-    email.attach("tickets.pdf", pdf_buffer.getvalue(), "application/pdf")
-    email.send()
 
 
 def send_manual_ticket_email(tickets, user_email, request, buyer_name):
@@ -162,11 +173,9 @@ def send_manual_ticket_email(tickets, user_email, request, buyer_name):
 
     pdf_buffer = generate_ticket_pdf(tickets, request, buyer_name)
 
-    email = EmailMessage(
-        subject="🎫 Your Raven Entertainment Tickets",
-        body=f"Dear {buyer_name},\n\nAttached is your ticket(s). Thank you for booking with Raven Entertainment!",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[user_email],
+    queue_email(
+        "🎫 Your Raven Entertainment Tickets",
+        f"Dear {buyer_name},\n\nAttached is your ticket(s). Thank you for booking with Raven Entertainment!",
+        [user_email],
+        attachment=("tickets.pdf", pdf_buffer.getvalue(), "application/pdf"),
     )
-    email.attach("tickets.pdf", pdf_buffer.getvalue(), "application/pdf")
-    email.send()
@@ -2,5 +2,6 @@ from django.urls import path
 from . import consumers  # You’ll create consumers.py next
 
 websocket_urlpatterns = [
-    path("ws/seats/<int:show_id>/", consumers.SeatConsumer.as_asgi()),
+    path("ws/show/<int:show_id>/", consumers.SeatBookingConsumer.as_asgi()),
+    path("ws/seats/<int:show_id>/", consumers.SeatBookingConsumer.as_asgi()),
 ]
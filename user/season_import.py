@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+import time
+from contextlib import contextmanager
+
+from django import forms
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Seat, Show
+from .page_cache import SHOWS_SCOPE, bump_version
+from .qr_codes import qr_pngs
+from .seat_layout import house_seats
+from .show_qr import show_qr_name, show_qr_url, write_qr_file
+
+# Schedule columns (CSV header or JSON keys); only name, date and time are
+# required. include_balcony defaults to yes.
+FIELDS = [
+    "name",
+    "date",
+    "time",
+    "seat_price",
+    "include_balcony",
+    "description",
+    "on_sale_at",
+    "waiting_room_minutes",
+]
+QR_WORKERS = getattr(settings, "SEASON_IMPORT_QR_WORKERS", None)  # None = all CPUs
+SEAT_BATCH_SIZE = 1000
+
+_TRUE = {"1", "true", "yes", "y"}
+_FALSE = {"0", "false", "no", "n"}
+
+
+class SeasonRowForm(forms.ModelForm):
+    class Meta:
+        model = Show
+        fields = FIELDS
+
+
+@contextmanager
+def _timed(timings, phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round(time.perf_counter() - started, 4)
+
+
+# ------------------ Parsing ------------------ #
+def load_schedule(raw, fmt="csv"):
+    """
+    Rows of a CSV (header line) or JSON (a list, or ``{"shows": [...]}``)
+    schedule as ``{column: text}`` dicts.
+    """
+    text = raw.decode("utf-8-sig") if isinstance(raw, bytes) else raw
+    if fmt == "json":
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get("shows", [])
+    else:
+        rows = csv.DictReader(io.StringIO(text))
+    return [
+        {
+            (key or "").strip().lower(): "" if value is None else str(value).strip()
+            for key, value in row.items()
+        }
+        for row in rows
+    ]
+
+
+def _form_data(row):
+    data = {field: row.get(field, "") for field in FIELDS}
+    balcony = data["include_balcony"].lower()
+    if balcony in _FALSE:
+        data["include_balcony"] = False
+    elif not balcony or balcony in _TRUE:
+        data["include_balcony"] = True
+    if not data["waiting_room_minutes"]:
+        data["waiting_room_minutes"] = 0
+    if not data["seat_price"]:
+        data["seat_price"] = 0
+    return data
+
+
+def validate_rows(rows):
+    """``(shows, errors)``: unsaved Show objects, or ``(row, message)`` pairs."""
+    shows, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        form = SeasonRowForm(_form_data(row))
+        if form.is_valid():
+            shows.append(form.save(commit=False))
+        else:
+            for field, messages in form.errors.items():
+                errors.append((number, f"{field}: {' '.join(messages)}"))
+    return shows, errors
+
+
+def resolve_slugs(shows):
+    """
+    Give every show a unique slug (``name``, ``name-1``, ...) as Show.save()
+    would, but with one query for the whole batch instead of one per
+    candidate.
+    """
+    bases = {slugify(show.name) or "show" for show in shows}
+    if not bases:
+        return
+    clashes = Q()
+    for base in bases:
+        clashes |= Q(slug=base) | Q(slug__startswith=f"{base}-")
+    taken = set(Show.objects.filter(clashes).values_list("slug", flat=True))
+    for show in shows:
+        base = slugify(show.name) or "show"
+        slug, counter = base, 1
+        while slug in taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        taken.add(slug)
+        show.slug = slug
+
+
+# ------------------ Import ------------------ #
+def import_season(rows, dry_run=False, workers=QR_WORKERS):
+    """
+    Create every show in ``rows`` in one pass: validate all rows first
+    (nothing is written if any row is bad), resolve slugs in one query,
+    bulk-insert the shows and their house seats, then render the QR codes
+    across a process pool. With ``dry_run`` the same work runs inside a
+    transaction that is rolled back, and no QR file is stored.
+
+    Returns a report with the created shows, row errors and per-phase
+    timings in seconds.
+    """
+    report = {"rows": len(rows), "shows": [], "errors": [], "dry_run": dry_run}
+    timings = report["timings"] = {}
+    started = time.perf_counter()
+
+    with _timed(timings, "validate"):
+        shows, report["errors"] = validate_rows(rows)
+    if report["errors"]:
+        timings["total"] = round(time.perf_counter() - started, 4)
+        return report
+
+    with transaction.atomic():
+        with _timed(timings, "slugs"):
+            resolve_slugs(shows)
+        with _timed(timings, "insert_shows"):
+            # bulk_create skips Show.save(): seats and QR codes follow in bulk
+            Show.objects.bulk_create(shows)
+        with _timed(timings, "insert_seats"):
+            Seat.objects.bulk_create(
+                (
+                    Seat(show=show, seat_number=seat_number, kind="house")
+                    for show in shows
+                    for seat_number in house_seats(show.include_balcony)
+                ),
+                batch_size=SEAT_BATCH_SIZE,
+            )
+        with _timed(timings, "render_qr"):
+            pngs = qr_pngs([show_qr_url(show.id) for show in shows], workers=workers)
+        with _timed(timings, "store_qr"):
+            if not dry_run:
+                # Pre-warmed under the names ensure_show_qr() looks for
+                for show, png in zip(shows, pngs):
+                    show.qr_code.name = show_qr_name(show.id)
+                    write_qr_file(show.qr_code.name, png)
+                Show.objects.bulk_update(shows, ["qr_code"])
+
+        report["shows"] = [(show.id, show.slug, show.date) for show in shows]
+        if dry_run:
+            transaction.set_rollback(True)
+        else:
+            # No post_save signals fired: refresh the cached listings here
+            transaction.on_commit(lambda: bump_version(SHOWS_SCOPE))
+
+    timings["total"] = round(time.perf_counter() - started, 4)
+    return report
@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+# Bharat Natya Mandir seating, the same for every show. Seats only get a
+# Seat row once they stop being free (sold, held or house seats); a show's
+# full map is this layout with those rows laid over it.
+STALL_ROWS = tuple(chr(i) for i in range(ord("A"), ord("T") + 1))
+STALL_ROW_LENGTH = 26
+BALCONY_ROWS = tuple(f"B{chr(i)}" for i in range(ord("A"), ord("O") + 1))
+BALCONY_ROW_LENGTH = 22
+# Kept back from sale on every new show
+HOUSE_ROWS = ("A", "B")
+
+
+def split_seat_number(seat_number):
+    row = "".join(filter(str.isalpha, seat_number))
+    number = int("".join(filter(str.isdigit, seat_number)) or 0)
+    return row, number
+
+
+def is_balcony_row(row):
+    return len(row) >= 2 and row.startswith("B")
+
+
+def section_of(seat_number):
+    return "BALCONY" if is_balcony_row(split_seat_number(seat_number)[0]) else "STALL"
+
+
+@lru_cache(maxsize=None)
+def layout(include_balcony=True):
+    """``((section, row, (numbers, ...)), ...)`` in display order."""
+    sections = [("STALL", STALL_ROWS, STALL_ROW_LENGTH)]
+    if include_balcony:
+        sections.append(("BALCONY", BALCONY_ROWS, BALCONY_ROW_LENGTH))
+    return tuple(
+        (section, row, tuple(range(1, length + 1)))
+        for section, rows, length in sections
+        for row in rows
+    )
+
+
+@lru_cache(maxsize=None)
+def seat_numbers(include_balcony=True):
+    """Every seat label ("A1", ..., "BO22") in display order."""
+    return tuple(
+        f"{row}{number}"
+        for _, row, numbers in layout(include_balcony)
+        for number in numbers
+    )
+
+
+@lru_cache(maxsize=None)
+def _seat_set(include_balcony):
+    return frozenset(seat_numbers(include_balcony))
+
+
+def is_valid_seat(seat_number, include_balcony=True):
+    return seat_number in _seat_set(include_balcony)
+
+
+def capacity(include_balcony=True):
+    return len(seat_numbers(include_balcony))
+
+
+def house_seats(include_balcony=True):
+    return [
+        seat_number
+        for seat_number in seat_numbers(include_balcony)
+        if split_seat_number(seat_number)[0] in HOUSE_ROWS
+    ]
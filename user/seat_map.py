@@ -0,0 +1,199 @@
+import json
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Seat
+from .page_cache import PAGE_CACHE_SECONDS, bump_version, get_version
+from .seat_layout import is_balcony_row, layout, seat_numbers, split_seat_number
+
+RECOMMEND_ROWS = [chr(i) for i in range(ord("C"), ord("T") + 1)]
+RECOMMEND_CENTER = 10
+RECOMMEND_COUNT = 5
+
+
+def seat_scope(show_id):
+    return f"seats:{show_id}"
+
+
+def get_seat_version(show_id):
+    return get_version(seat_scope(show_id))
+
+
+def bump_seat_version(*show_ids):
+    """
+    Call after any change to a show's seat states, inside the same
+    transaction: the new version commits (or rolls back) with the seats.
+    """
+    bump_version(*(seat_scope(show_id) for show_id in show_ids))
+
+
+def broadcast_seats(show_id, seat_numbers, action):
+    """
+    Push seat changes made on the server (``action`` "book" or "unbook") to
+    open seat maps, the same messages SeatBookingConsumer relays. Sent after
+    commit; reaching other processes needs a shared (Redis) channel layer.
+    """
+
+    def send():
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        group_send = async_to_sync(layer.group_send)
+        for seat_number in seat_numbers:
+            group_send(
+                f"show_{show_id}",
+                {"type": "seat_update", "seat_id": seat_number, "action": action},
+            )
+
+    transaction.on_commit(send)
+
+
+def taken_seats(show_id):
+    """Labels of the show's seats that are not free (one indexed query)."""
+    return set(
+        Seat.objects.filter(show_id=show_id).values_list("seat_number", flat=True)
+    )
+
+
+def claim_seats(show, seat_numbers, kind="sold"):
+    """
+    Take the seats if, and only if, every one of them is still free.
+    Returns the new Seat rows as ``{seat_number: seat}``, or ``None`` if any
+    of them was taken.
+
+    A seat that isn't free is a row, so claiming one is an INSERT and the
+    unique (show, seat_number) constraint settles every race inside the
+    database: the losing insert fails and its savepoint undoes the whole
+    claim. Nothing is locked up front and nothing is read-then-written.
+    """
+    try:
+        with transaction.atomic():  # savepoint: a failed claim undoes itself
+            seats = Seat.objects.bulk_create(
+                Seat(show=show, seat_number=seat_number, kind=kind)
+                for seat_number in seat_numbers
+            )
+    except IntegrityError:
+        return None
+    return {seat.seat_number: seat for seat in seats}
+
+
+def free_seat_numbers(show, taken=None):
+    """Free seat labels in display order: the layout minus the stored seats."""
+    taken = taken_seats(show.id) if taken is None else taken
+    return [n for n in seat_numbers(show.include_balcony) if n not in taken]
+
+
+def _row_order(row):
+    return (is_balcony_row(row), len(row), row)
+
+
+def nearest_free_seats(show, anchors, count, exclude=()):
+    """
+    The ``count`` free seats closest to ``anchors`` (seat labels such as
+    "F12"), nearest first. Distance is same section before other section,
+    then rows apart, then seats apart along the row; so a group that lost
+    a seat gets the next one along before one in the row behind.
+    """
+    if count <= 0 or not anchors:
+        return []
+    free = [n for n in free_seat_numbers(show) if n not in exclude]
+    rows = {row for _, row, _ in layout(show.include_balcony)}
+    targets = [split_seat_number(n) for n in anchors]
+    rows.update(row for row, _ in targets)
+    row_index = {row: i for i, row in enumerate(sorted(rows, key=_row_order))}
+
+    def distance(seat_number):
+        row, number = split_seat_number(seat_number)
+        return min(
+            (
+                is_balcony_row(row) != is_balcony_row(t_row),
+                abs(row_index[row] - row_index[t_row]),
+                abs(number - t_number),
+            )
+            for t_row, t_number in targets
+        )
+
+    return sorted(free, key=distance)[:count]
+
+
+def _status_runs(flags):
+    """Alternating run lengths of free/booked seats, starting with free."""
+    runs = [0]
+    current = False
+    for flag in flags:
+        if flag != current:
+            runs.append(0)
+            current = flag
+        runs[-1] += 1
+    return runs
+
+
+def _recommend(show, taken, layout_index):
+    picks = []
+    rows = {row for _, row, _ in layout(show.include_balcony)}
+    for row in RECOMMEND_ROWS:
+        if row not in rows:
+            continue
+        for offset in range(13):
+            for number in (RECOMMEND_CENTER - offset, RECOMMEND_CENTER + offset):
+                label = f"{row}{number}"
+                index = layout_index.get(label)
+                if index is not None and label not in taken and index not in picks:
+                    picks.append(index)
+            if len(picks) >= RECOMMEND_COUNT:
+                break
+        if len(picks) >= RECOMMEND_COUNT:
+            break
+    return picks
+
+
+def build_seat_map(show):
+    """
+    Encode a show's seats as::
+
+        {
+          "show": 1, "version": 1700000000.0, "price": "250.00",
+          "sections": [{"name": "STALL", "rows": [{"row": "A", "first": 1,
+                        "count": 26}, ...]}, {"name": "BALCONY", ...}],
+          "status": [free, taken, free, ...],     # alternating run lengths
+          "recommended": [layout_index, ...],
+        }
+
+    Layout order is section, then row, then seat number; a seat is named by
+    its label (row + number), so the client needs no seat IDs. Only taken
+    seats are read from the database.
+    """
+    taken = taken_seats(show.id)
+    sections = {}
+    for section, row, numbers in layout(show.include_balcony):
+        sections.setdefault(section, []).append(
+            {"row": row, "first": numbers[0], "count": len(numbers)}
+        )
+    labels = seat_numbers(show.include_balcony)
+    layout_index = {label: i for i, label in enumerate(labels)}
+    return {
+        "show": show.id,
+        "price": str(show.seat_price),
+        "sections": [
+            {"name": name, "rows": descriptors}
+            for name, descriptors in sections.items()
+        ],
+        "status": _status_runs(label in taken for label in labels),
+        "recommended": _recommend(show, taken, layout_index),
+    }
+
+
+def seat_map_json(show):
+    """Serialized seat map for the show's current version, cached."""
+    version = get_seat_version(show.id)
+    cache_key = f"seatmap:{show.id}:{version}"
+    payload = cache.get(cache_key)
+    if payload is None:
+        data = build_seat_map(show)
+        data["version"] = version
+        payload = json.dumps(data, separators=(",", ":"))
+        cache.set(cache_key, payload, PAGE_CACHE_SECONDS)
+    return payload, version
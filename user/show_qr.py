@@ -0,0 +1,77 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import Show
+from .qr_codes import qr_png
+
+logger = logging.getLogger(__name__)
+
+# Show QR codes are rendered on first use, not on every Show.save(). The
+# file name carries a digest of the encoded URL, so a new PUBLIC_BASE_URL
+# (or show id) makes the stored file stale and it is rendered once more.
+QR_ROOT = "qrcodes"
+NAME_CACHE_SECONDS = 24 * 60 * 60
+
+
+def show_qr_url(show_id):
+    base = getattr(settings, "PUBLIC_BASE_URL", "") or "http://127.0.0.1:8000"
+    return f"{base.rstrip('/')}/qr/scan/{show_id}/"
+
+
+def url_digest(url):
+    return hashlib.sha1(url.encode()).hexdigest()[:12]
+
+
+def show_qr_name(show_id):
+    return f"{QR_ROOT}/show_{show_id}_{url_digest(show_qr_url(show_id))}.png"
+
+
+def _cache_key(name):
+    return f"show-qr:{name}"
+
+
+def write_qr_file(name, png):
+    """Store ``png`` as ``name`` unless it is already there (same URL, same code)."""
+    if not default_storage.exists(name):
+        saved = default_storage.save(name, ContentFile(png))
+        if saved != name:
+            # Lost a race with another worker: theirs is identical
+            default_storage.delete(saved)
+    cache.set(_cache_key(name), True, NAME_CACHE_SECONDS)
+
+
+def store_show_qr(show, png):
+    """
+    Store an already rendered PNG under the show's current name and point
+    the row at it (a queryset update: no Show.save(), no signals). The
+    previous file, if any, is removed.
+    """
+    name = show_qr_name(show.id)
+    write_qr_file(name, png)
+    old = show.qr_code.name if show.qr_code else ""
+    Show.objects.filter(id=show.id).update(qr_code=name)
+    show.qr_code.name = name
+    if old and old != name and default_storage.exists(old):
+        default_storage.delete(old)
+    return name
+
+
+def ensure_show_qr(show):
+    """
+    Storage name of the show's QR code, rendering it only when it is
+    missing or encodes an out-of-date URL. Repeat calls are a cache hit.
+    """
+    name = show_qr_name(show.id)
+    current = show.qr_code.name if show.qr_code else ""
+    if current == name and cache.get(_cache_key(name)):
+        return name
+    if current == name and default_storage.exists(name):
+        cache.set(_cache_key(name), True, NAME_CACHE_SECONDS)
+        return name
+    logger.info("Rendering QR code for show %s", show.id)
+    return store_show_qr(show, qr_png(show_qr_url(show.id)))
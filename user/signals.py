@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .image_variants import GENERATE_ON_UPLOAD, delete_variants, generate_variants_async
+from .models import MediaFile, Show
+from .page_cache import SHOWS_SCOPE, bump_version, show_scope
+from .waiting_room import forget_window
+
+
+@receiver(post_save, sender=Show)
+@receiver(post_delete, sender=Show)
+def invalidate_show_pages(sender, instance, **kwargs):
+    bump_version(SHOWS_SCOPE, show_scope(instance.pk))
+    forget_window(instance.pk)
+
+
+@receiver(post_save, sender=MediaFile)
+@receiver(post_delete, sender=MediaFile)
+def invalidate_show_media_pages(sender, instance, **kwargs):
+    bump_version(SHOWS_SCOPE, show_scope(instance.show_id))
+
+
+# ------------------ Image variants ------------------ #
+def _image_names(instance):
+    if isinstance(instance, Show):
+        return [f.name for f in (instance.poster, instance.thumbnail) if f]
+    return [instance.file.name] if instance.file else []
+
+
+@receiver(post_save, sender=Show)
+@receiver(post_save, sender=MediaFile)
+def build_image_variants(sender, instance, **kwargs):
+    if not GENERATE_ON_UPLOAD:
+        return
+    names = _image_names(instance)
+    if names:
+        transaction.on_commit(lambda: generate_variants_async(*names))
+
+
+@receiver(post_delete, sender=Show)
+@receiver(post_delete, sender=MediaFile)
+def remove_image_variants(sender, instance, **kwargs):
+    names = _image_names(instance)
+
+    def delete_all():
+        for name in names:
+            delete_variants(name)
+
+    transaction.on_commit(delete_all)
@@ -0,0 +1,234 @@
+import gzip
+import json
+import mimetypes
+import os
+import posixpath
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip alone still covers every browser
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".xml", ".html",
+    ".ttf", ".otf", ".eot", ".ico", ".scss",
+}  # fmt: skip
+MIN_COMPRESS_SIZE = 512
+# Only keep a compressed copy if it saves at least 5%
+MIN_COMPRESS_RATIO = 0.95
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_MAX_AGE = getattr(settings, "STATIC_MAX_AGE", 60)
+
+# Checked in order of preference against Accept-Encoding
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+# ------------------ Build time ------------------ #
+def compress_file(path):
+    """
+    Write ``path.gz`` (and ``path.br`` when brotli is installed) next to
+    ``path``. Returns the suffixes written.
+    """
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data)
+
+    written = []
+    for suffix, compressed in variants.items():
+        if len(compressed) >= len(data) * MIN_COMPRESS_RATIO:
+            continue
+        with open(path + suffix, "wb") as f:
+            f.write(compressed)
+        written.append(suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ``collectstatic`` storage that content-hashes every file (so it can be
+    cached forever) and pre-compresses the results for
+    ``StaticFilesMiddleware``.
+    """
+
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if self.exists(name):
+                compress_file(self.path(name))
+
+    def url_converter(self, name, hashed_files, template=None):
+        convert = super().url_converter(name, hashed_files, template)
+
+        def tolerant_convert(matchobj):
+            try:
+                return convert(matchobj)
+            except ValueError:
+                # Vendor CSS points at files that don't exist; leave those
+                # URLs as written instead of aborting collectstatic
+                return matchobj.group(0)
+
+        return tolerant_convert
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet (tests, fresh checkout): use the plain name
+            # rather than failing the page render
+            return name
+
+
+# ------------------ Serving ------------------ #
+class StaticAsset:
+    __slots__ = ("path", "size", "mtime", "content_type", "etag", "variants")
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = int(stat.st_mtime)
+        content_type, _ = mimetypes.guess_type(path)
+        self.content_type = content_type or "application/octet-stream"
+        if self.content_type.startswith("text/") or self.content_type.endswith(
+            "javascript"
+        ):
+            self.content_type += "; charset=utf-8"
+        self.etag = f'"{self.mtime:x}-{self.size:x}"'
+        self.variants = {}
+        for encoding, suffix in ENCODINGS:
+            try:
+                variant_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            self.variants[encoding] = (path + suffix, variant_stat.st_size)
+
+    def pick(self, accept_encoding):
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and encoding in accept_encoding:
+                return encoding, *self.variants[encoding]
+        return None, self.path, self.size
+
+
+class StaticFilesMiddleware:
+    """
+    Serve ``STATIC_ROOT`` from inside Django, in the style of WhiteNoise:
+    pre-compressed variants are picked from ``Accept-Encoding`` and
+    manifest-hashed files are sent with a one-year ``immutable`` lifetime,
+    so repeat visits don't even revalidate. Unhashed files get a short
+    ``max-age`` plus ETag/Last-Modified.
+
+    Files found are cached per URL (misses are not); with ``DEBUG`` on the
+    disk is checked on every request so a fresh ``collectstatic`` is picked
+    up immediately.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = "/" + settings.STATIC_URL.strip("/") + "/"
+        self.root = str(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+        self.autorefresh = settings.DEBUG
+        self._assets = {}
+        self._immutable = None
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if self.root and request.path_info.startswith(self.prefix):
+            if request.method in ("GET", "HEAD"):
+                name = request.path_info[len(self.prefix) :]
+                name = posixpath.normpath(name).lstrip("/")
+                asset = self.find(name)
+                if asset is not None:
+                    return self.serve(request, name, asset)
+        return self.get_response(request)
+
+    # ---- lookup ----
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.root, "staticfiles.json")) as f:
+                return set(json.load(f).get("paths", {}).values())
+        except (OSError, ValueError):
+            return set()
+
+    def is_immutable(self, name):
+        if self._immutable is None or self.autorefresh:
+            self._immutable = self._load_manifest()
+        return name in self._immutable
+
+    def find(self, name):
+        if name.startswith("..") or name.endswith((".gz", ".br")):
+            return None
+        if not self.autorefresh and name in self._assets:
+            return self._assets[name]
+
+        path = os.path.join(self.root, *name.split("/"))
+        try:
+            stat = os.stat(path)
+            asset = StaticAsset(path, stat) if os.path.isfile(path) else None
+        except OSError:
+            return None
+        # Only hits are kept: they are bounded by the files in STATIC_ROOT,
+        # while misses are whatever URLs clients make up
+        if asset is not None:
+            with self._lock:
+                self._assets[name] = asset
+        return asset
+
+    # ---- response ----
+    def serve(self, request, name, asset):
+        if self.is_immutable(name):
+            cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            cache_control = f"public, max-age={STATIC_MAX_AGE}"
+
+        if self._not_modified(request, asset):
+            response = HttpResponseNotModified()
+        else:
+            accept = request.META.get("HTTP_ACCEPT_ENCODING", "")
+            encoding, path, size = asset.pick(accept)
+            if request.method == "HEAD":
+                response = HttpResponse(content_type=asset.content_type)
+            else:
+                response = FileResponse(
+                    open(path, "rb"), content_type=asset.content_type
+                )
+                # FileResponse would advertise the .gz name as an inline download
+                if "Content-Disposition" in response:
+                    del response["Content-Disposition"]
+            response["Content-Length"] = size
+            if encoding:
+                response["Content-Encoding"] = encoding
+
+        response["ETag"] = asset.etag
+        response["Last-Modified"] = http_date(asset.mtime)
+        response["Cache-Control"] = cache_control
+        if asset.variants:
+            patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    @staticmethod
+    def _not_modified(request, asset):
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return asset.etag in tags or "*" in tags
+        since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+        return since is not None and asset.mtime <= since
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+# One copy of each distinct file: blobs/<ab>/<cd>/<sha256><ext>
+BLOB_ROOT = "blobs"
+CHUNK_SIZE = 64 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_name(digest, ext=""):
+    return posixpath.join(BLOB_ROOT, digest[:2], digest[2:4], digest + ext.lower())
+
+
+def is_blob(name):
+    return name.replace(os.sep, "/").startswith(BLOB_ROOT + "/")
+
+
+@deconstructible(path="user.storage.DedupFileSystemStorage")
+class DedupFileSystemStorage(FileSystemStorage):
+    """
+    ``FileSystemStorage`` that keeps one copy of each distinct file.
+
+    Content lives once under ``blobs/`` keyed by its SHA-256 digest; every
+    stored name (``thumbnails/film.png``, ``show_media/film.png``, ...) is
+    a hard link to that blob, so ``FileField`` names, paths and URLs work
+    exactly as before. The blob's link count is its reference count: it
+    is removed when the last name pointing at it is deleted. Where hard
+    links are not supported the file is simply kept as a plain copy.
+    """
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        self.link_to_blob(name)
+        return name
+
+    def _blob_path(self, name, digest):
+        ext = os.path.splitext(name)[1]
+        return self.path(blob_name(digest, ext))
+
+    def link_to_blob(self, name, digest=None):
+        """
+        Make ``name`` share its content's blob, creating the blob from it
+        if this content is new. Returns the bytes freed (the size of
+        ``name`` when it was a separate copy of an existing blob).
+        """
+        path = self.path(name)
+        digest = digest or file_digest(path)
+        blob = self._blob_path(name, digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(path, blob)
+            return 0
+        except FileExistsError:
+            pass
+        except OSError:
+            return 0  # no hard links here: keep the plain copy
+        if os.path.samefile(path, blob):
+            return 0
+
+        freed = os.stat(path).st_nlink == 1 and os.path.getsize(path)
+        temp = f"{path}.{digest[:8]}.link"
+        try:
+            os.link(blob, temp)
+        except FileNotFoundError:
+            # The blob lost its last reference meanwhile: this copy takes over
+            return self.link_to_blob(name, digest)
+        os.replace(temp, path)
+        return freed or 0
+
+    def delete(self, name):
+        if not name or is_blob(name):
+            return super().delete(name)
+        path = self.path(name)
+        try:
+            shared = not os.path.isdir(path) and os.stat(path).st_nlink == 2
+        except FileNotFoundError:
+            return
+        blob = self._blob_path(name, file_digest(path)) if shared else None
+        super().delete(name)
+        if blob is None:
+            return
+        try:
+            if os.stat(blob).st_nlink == 1:
+                os.remove(blob)
+        except FileNotFoundError:
+            pass
+
+
+@deconstructible(path="user.storage.PrivateFileSystemStorage")
+class PrivateFileSystemStorage(FileSystemStorage):
+    """
+    Files kept under ``PRIVATE_MEDIA_ROOT``, outside ``MEDIA_ROOT``, so no
+    URL ever reaches them (outbox attachments). Follows the setting the way
+    ``FileSystemStorage`` follows ``MEDIA_ROOT``.
+    """
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == "PRIVATE_MEDIA_ROOT":
+            self.__dict__.pop("base_location", None)
+            self.__dict__.pop("location", None)
@@ -0,0 +1,41 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from user.image_variants import variant_srcset, variant_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def variant(field_file, width=640, ext="webp"):
+    """``{% variant show.poster 320 %}`` -> URL of the closest resized copy."""
+    return variant_url(field_file, width, ext)
+
+
+@register.simple_tag
+def responsive_image(field_file, alt="", sizes="100vw", width=640, **attrs):
+    """
+    Render a ``<picture>`` with WebP and JPEG srcsets for ``field_file``.
+    Until its variants exist this is just an ``<img>`` of the original.
+
+        {% responsive_image show.thumbnail alt=show.name sizes="300px" class="card-img-top" %}
+    """
+    if not field_file:
+        return ""
+    extra = format_html_join("", ' {}="{}"', attrs.items())
+    webp_srcset = variant_srcset(field_file, "webp")
+    if not webp_srcset:
+        return format_html(
+            '<img src="{}" alt="{}" loading="lazy"{}>', field_file.url, alt, extra
+        )
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy"{}></picture>',
+        webp_srcset,
+        sizes,
+        variant_url(field_file, width, "jpg"),
+        variant_srcset(field_file, "jpg"),
+        sizes,
+        alt,
+        extra,
+    )
@@ -1 +1,1177 @@
-# Create your tests here.
+import datetime
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.session import SessionStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.http import Http404
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from accounts.models import CustomUser, UserAdminAuditLog
+
+from .booking import (
+    PaymentClosed,
+    SeatConflict,
+    accept_offer,
+    cancel_tickets,
+    confirm_payment,
+    expire_unpaid_bookings,
+    place_booking,
+)
+from .image_variants import generate_variants, variant_names
+from .mail_outbox import drain_outbox, queue_email
+from .media_gc import collect_garbage
+from .media_serving import serve_media
+from .models import (
+    Booking,
+    MediaFile,
+    OutboundEmail,
+    QRScanLog,
+    Seat,
+    Show,
+    Ticket,
+    UserProfile,
+)
+from . import waiting_room
+from .qr_utils import generate_ticket_pdf
+from .season_import import import_season, load_schedule
+from .seat_map import free_seat_numbers, get_seat_version
+from .show_qr import ensure_show_qr
+from .static_assets import StaticFilesMiddleware
+from .storage import DedupFileSystemStorage
+from .waitlist import join_waitlist
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # pragma: no cover - optional test dependency
+    Controller = None
+
+
+class _RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class MailOutboxTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.handler = _RecordingHandler()
+        self.port = _free_port()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+        self.settings_override = override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.port,
+            EMAIL_USE_SSL=False,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            DEFAULT_FROM_EMAIL="tickets@example.com",
+            EMAIL_OUTBOX_AUTO_DRAIN=False,
+            MEDIA_ROOT=self.media_root,
+            PRIVATE_MEDIA_ROOT=os.path.join(self.media_root, "private"),
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.controller.stop()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_batch_is_sent_over_one_connection(self):
+        for i in range(5):
+            queue_email(f"OTP {i}", "Your OTP is: 123456", [f"user{i}@example.com"])
+        queue_email(
+            "Tickets",
+            "Attached",
+            ["buyer@example.com"],
+            attachment=("tickets.pdf", b"%PDF-1.4", "application/pdf"),
+        )
+
+        stats = drain_outbox(max_per_second=0)
+
+        self.assertEqual(stats["sent"], 6)
+        self.assertEqual(len(self.handler.messages), 6)
+        self.assertEqual(self.handler.sessions, 1)
+        self.assertFalse(OutboundEmail.objects.exclude(status="sent").exists())
+        # Attachments are only kept until delivery
+        self.assertFalse(OutboundEmail.objects.exclude(attachment="").exists())
+
+    def test_failed_delivery_is_rescheduled(self):
+        outbound = queue_email("OTP", "Your OTP is: 123456", ["user@example.com"])
+
+        with override_settings(EMAIL_PORT=_free_port(), EMAIL_TIMEOUT=2):
+            stats = drain_outbox(max_per_second=0)
+
+        outbound.refresh_from_db()
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(outbound.status, "pending")
+        self.assertEqual(outbound.attempts, 1)
+        self.assertGreater(outbound.next_attempt_at, outbound.created_at)
+
+        # Not due yet, so a second drain leaves it alone
+        self.assertEqual(drain_outbox(max_per_second=0).get("claimed", 0), 0)
+
+    def test_attachments_are_private_and_dropped_when_dead(self):
+        outbound = queue_email(
+            "Tickets",
+            "Attached",
+            ["buyer@example.com"],
+            attachment=("tickets.pdf", b"%PDF-1.4", "application/pdf"),
+        )
+        path = outbound.attachment.path
+        self.assertTrue(path.startswith(settings.PRIVATE_MEDIA_ROOT))
+
+        with mock.patch("user.mail_outbox.MAX_ATTEMPTS", 1):
+            with override_settings(EMAIL_PORT=_free_port(), EMAIL_TIMEOUT=2):
+                drain_outbox(max_per_second=0)
+
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.status, outbound.attachment.name), ("failed", ""))
+        self.assertFalse(os.path.exists(path))
+
+
+# ------------------ Query budgets ------------------ #
+# Maximum queries per page, measured against QueryBudgetTests' seed data.
+# Every list on these pages holds several rows, so an N+1 blows the budget.
+# If a change legitimately needs more, raise the number in the same commit.
+QUERY_BUDGETS = [
+    # (user, url name, kwargs, max queries)
+    (None, "home", {}, 3),  # + cache version
+    (None, "show_detail", {"slug": "show-0"}, 3),  # + cache version
+    ("user", "book_ticket", {"show_id": "show"}, 2),  # + waiting-room window
+    ("user", "seat_map", {"show_id": "show"}, 3),  # + cache version
+    ("user", "user_dashboard", {}, 2),
+    ("user", "profile_settings", {}, 1),
+    ("admin", "admin_dashboard", {}, 4),
+    ("admin", "admin_view_users", {}, 1),
+    ("admin", "admin_create_booking", {}, 2),
+    ("admin", "admin_view_bookings", {}, 1),
+    ("admin", "admin_all_shows", {}, 1),
+    ("admin", "admin_show_media", {"show_id": "show"}, 3),
+    ("admin", "admin_qr_analytics", {}, 1),
+    ("admin", "admin_upload_media", {}, 1),
+    ("admin", "admin_scan_tickets", {"show_id": "show"}, 1),
+    ("admin", "admin_manual_booking", {"show_id": "show"}, 4),
+    ("admin", "admin_user_list", {}, 1),
+    ("admin", "get_visitor_data", {}, 1),
+    ("admin", "get_qr_marketing_data", {}, 1),
+    ("admin", "admin_export_data", {"dataset": "bookings"}, 1),
+]
+TICKET_PDF_BUDGET = 2
+
+
+class QueryBudgetTests(TestCase):
+    SHOWS = 3
+    USERS = 6
+    MEDIA_PER_SHOW = 4
+
+    @classmethod
+    def setUpClass(cls):
+        # Views render show QR codes (ensure_show_qr) and image variants on
+        # first use; keep any such writes out of the real MEDIA_ROOT
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        today = datetime.date.today()
+        cls.admin = CustomUser.objects.create(
+            username="admin",
+            email="admin@example.com",
+            user_type="Admin",
+            is_staff=True,
+        )
+        cls.users = []
+        for i in range(cls.USERS):
+            user = CustomUser.objects.create(
+                username=f"user{i}", email=f"user{i}@example.com"
+            )
+            UserProfile.objects.create(user=user, phone_number="9999999999")
+            cls.users.append(user)
+
+        cls.shows = []
+        for i in range(cls.SHOWS):
+            show = Show.objects.create(
+                name=f"Show {i}",
+                date=today + datetime.timedelta(days=i + 1),
+                time=datetime.time(18, 30),
+                seat_price=250,
+            )
+            cls.shows.append(show)
+            MediaFile.objects.bulk_create(
+                MediaFile(show=show, file=f"show_media/still_{j}.png")
+                for j in range(cls.MEDIA_PER_SHOW)
+            )
+            for user in cls.users:
+                ticket = Ticket.objects.create(user=user, show=show, seat_number="C1")
+                Booking.objects.create(
+                    user=user,
+                    show=show,
+                    ticket=ticket,
+                    event_name=show.name,
+                    event_date=show.date,
+                    total_price=show.seat_price,
+                )
+                QRScanLog.objects.create(
+                    ticket=ticket, show=show, ip_address="8.8.8.8", district="Pune"
+                )
+
+    def _request(self, user, path):
+        request = RequestFactory().get(path)
+        request.user = user or AnonymousUser()
+        request.session = SessionStore()
+        request._messages = SessionStorage(request)
+        return request
+
+    def _count_queries(self, user, path):
+        cache.clear()  # measure a cold render, not the page cache
+        match = resolve(path)
+        request = self._request(user, path)
+        with CaptureQueriesContext(connection) as queries:
+            response = match.func(request, *match.args, **match.kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return response, queries
+
+    def test_views_stay_within_query_budget(self):
+        users = {None: None, "user": self.users[0], "admin": self.admin}
+        for who, name, kwargs, budget in QUERY_BUDGETS:
+            kwargs = {
+                key: self.shows[0].id if value == "show" else value
+                for key, value in kwargs.items()
+            }
+            path = reverse(name, kwargs=kwargs)
+            with self.subTest(view=name):
+                response, queries = self._count_queries(users[who], path)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(queries),
+                    budget,
+                    f"{name} ran {len(queries)} queries (budget {budget}):\n"
+                    + "\n".join(q["sql"] for q in queries.captured_queries),
+                )
+
+    def test_export_rejects_bad_filters_before_streaming(self):
+        path = reverse("admin_export_data", kwargs={"dataset": "bookings"})
+        view = resolve(path).func
+        for query in ("start_date=abc", "end_date=2024-02-30", "show=x", "show=-1"):
+            with self.subTest(query=query):
+                request = self._request(self.admin, f"{path}?{query}")
+                response = view(request, dataset="bookings")
+                self.assertEqual(response.status_code, 400)
+
+        query = f"start_date=2000-01-01&show={self.shows[0].id}"
+        request = self._request(self.admin, f"{path}?{query}")
+        response = view(request, dataset="bookings")
+        self.assertEqual(response.status_code, 200)
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 1 + self.USERS)
+
+    def test_ticket_pdf_query_budget(self):
+        tickets = list(Ticket.objects.filter(user=self.users[0]))
+        request = self._request(self.users[0], "/")
+        with CaptureQueriesContext(connection) as queries:
+            generate_ticket_pdf(tickets, request)
+        self.assertLessEqual(len(queries), TICKET_PDF_BUDGET)
+
+
+# ------------------ Bulk user admin ------------------ #
+class BulkUserAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(
+            username="admin", email="admin@example.com", user_type="Admin"
+        )
+        cls.users = [
+            CustomUser.objects.create(username=f"u{i}", email=f"u{i}@example.com")
+            for i in range(4)
+        ]
+        old = timezone.now() - datetime.timedelta(days=40)
+        CustomUser.objects.filter(id__in=[u.id for u in cls.users[:2]]).update(
+            date_joined=old
+        )
+
+    def _post(self, body):
+        path = reverse("admin_bulk_users")
+        request = RequestFactory().post(
+            path, json.dumps(body), content_type="application/json"
+        )
+        request.user = self.admin
+        response = resolve(path).func(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_role_changes_touch_only_real_changes(self):
+        roles = {str(u.id): "User" for u in self.users}  # already Users
+        roles[str(self.users[0].id)] = "Admin"
+        roles[str(self.users[1].id)] = "Owner"  # unknown role: ignored
+        roles[str(self.admin.id)] = "User"  # own role: ignored
+
+        with CaptureQueriesContext(connection) as queries:
+            status, data = self._post({"roles": roles})
+
+        self.assertEqual((status, data["updated"]), (200, 1))
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)  # one bulk_update statement
+        stored = dict(CustomUser.objects.values_list("username", "user_type"))
+        self.assertEqual(
+            stored,
+            {"admin": "Admin", "u0": "Admin", **{f"u{i}": "User" for i in range(1, 4)}},
+        )
+        log = UserAdminAuditLog.objects.get()
+        self.assertEqual(
+            (log.actor, log.action, log.affected_count), (self.admin, "role_update", 1)
+        )
+        self.assertEqual(
+            log.details["changes"], {str(self.users[0].id): ["User", "Admin"]}
+        )
+        # Replaying the same request changes nothing and logs nothing
+        self.assertEqual(self._post({"roles": roles})[1]["updated"], 0)
+        self.assertEqual(UserAdminAuditLog.objects.count(), 1)
+
+    def test_deactivate_unverified_is_logged_and_bounded(self):
+        status, dry = self._post(
+            {"action": "deactivate_unverified", "older_than_days": 30, "dry_run": True}
+        )
+        self.assertEqual((status, dry["deactivated"]), (200, 2))
+        self.assertFalse(UserAdminAuditLog.objects.exists())
+
+        status, data = self._post(
+            {"action": "deactivate_unverified", "older_than_days": 30}
+        )
+
+        stale = sorted(u.id for u in self.users[:2])
+        self.assertEqual((status, data["user_ids"]), (200, stale))
+        self.assertEqual(
+            set(
+                CustomUser.objects.filter(is_active=False).values_list("id", flat=True)
+            ),
+            set(stale),
+        )
+        log = UserAdminAuditLog.objects.get()
+        self.assertEqual((log.action, log.affected_count), ("deactivate_unverified", 2))
+        self.assertEqual(log.details, {"older_than_days": 30, "user_ids": stale})
+
+    def test_bad_bodies_are_rejected(self):
+        bodies = [
+            [1, 2],
+            "roles",
+            {"action": "deactivate_unverified", "older_than_days": 0},
+            {"action": "deactivate_unverified", "older_than_days": -5},
+            {"action": "deactivate_unverified", "older_than_days": "soon"},
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(self._post(body)[0], 400)
+        self.assertFalse(CustomUser.objects.filter(is_active=False).exists())
+
+
+# ------------------ Booking conflicts ------------------ #
+class BookingConflictTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        media_override = override_settings(
+            MEDIA_ROOT=cls.media_root,
+            PRIVATE_MEDIA_ROOT=os.path.join(cls.media_root, "private"),
+            EMAIL_OUTBOX_AUTO_DRAIN=False,
+        )
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="buyer", email="b@example.com")
+        cls.show = Show.objects.create(
+            name="Rush",
+            date=datetime.date.today() + datetime.timedelta(days=3),
+            time=datetime.time(19, 0),
+            seat_price=250,
+        )
+
+    def _book(self, seat_numbers, mode=""):
+        path = reverse("book_ticket", args=[self.show.id])
+        request = RequestFactory().post(
+            path,
+            {"selected_seats": ",".join(seat_numbers), "mode": mode},
+            HTTP_ACCEPT="application/json",
+        )
+        request.user = self.user
+        request.session = SessionStore()
+        request._messages = SessionStorage(request)
+        return resolve(path).func(request, show_id=self.show.id)
+
+    def test_only_house_seats_are_stored_for_a_new_show(self):
+        stored = Seat.objects.filter(show=self.show)
+        self.assertEqual(stored.count(), 52)
+        self.assertEqual(set(stored.values_list("kind", flat=True)), {"house"})
+        self.assertEqual(self.show.seat_capacity, 20 * 26 + 15 * 22)
+
+    def test_tickets_are_sent_only_once_payment_is_confirmed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._book(["G1", "G2"])
+        booking = Booking.objects.get(id=json.loads(response.content)["booking_id"])
+        tickets = Ticket.objects.filter(booking=booking)
+        self.assertEqual(booking.payment_status, "Confirmed")
+        self.assertEqual(
+            set(tickets.values_list("payment_status", flat=True)), {"pending"}
+        )
+        self.assertFalse(OutboundEmail.objects.exists())
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            confirm_payment(booking, RequestFactory().post("/"), "UTR123")
+            self.assertFalse(OutboundEmail.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        booking.refresh_from_db()
+        self.assertEqual(
+            (booking.payment_status, booking.transaction_id), ("Paid", "UTR123")
+        )
+        self.assertEqual(OutboundEmail.objects.get().to, "b@example.com")
+        self.assertTrue(all(t.qr_code for t in tickets))
+        self.assertEqual(
+            set(tickets.values_list("payment_status", flat=True)), {"confirmed"}
+        )
+        # Paying again sends nothing more
+        confirm_payment(booking, RequestFactory().post("/"))
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    def test_seat_version_is_shared_and_moves_with_the_booking(self):
+        before = get_seat_version(self.show.id)
+        self._book(["H1"])
+        cache.clear()  # another worker: nothing in its local cache
+        after = get_seat_version(self.show.id)
+
+        self.assertGreater(after, before)
+        Seat.objects.create(show=self.show, seat_number="H3")
+        self._book(["H2", "H3"])  # conflict: rolled back with its bump
+        self.assertEqual(get_seat_version(self.show.id), after)
+
+    def test_conflict_names_taken_seats_and_books_nothing(self):
+        Seat.objects.create(show=self.show, seat_number="F11")
+
+        response = self._book(["F10", "F11", "F12"])
+
+        self.assertEqual(response.status_code, 409)
+        data = json.loads(response.content)
+        self.assertEqual(data["conflicts"], [{"seat_number": "F11"}])
+        self.assertIn(data["alternatives"][0]["seat_number"], {"F9", "F13"})
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(
+            Seat.objects.filter(show=self.show, seat_number__in=["F10", "F12"]).exists()
+        )
+
+    def test_partial_mode_books_free_seats_and_nearest_alternative(self):
+        Seat.objects.create(show=self.show, seat_number="F11")
+
+        response = self._book(["F10", "F11", "F12"], mode="partial")
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(len(data["seats"]), 3)
+        self.assertTrue({"F10", "F12"} <= set(data["seats"]))
+        self.assertIn(data["substitutes"][0]["seat_number"], {"F9", "F13"})
+        booking = Booking.objects.get(id=data["booking_id"])
+        self.assertEqual(booking.number_of_tickets, 3)
+        self.assertEqual(Ticket.objects.filter(show=self.show).count(), 3)
+
+    def test_api_replays_idempotency_key_and_prices_on_server(self):
+        path = reverse("api_create_booking", args=[self.show.id])
+        body = json.dumps({"seats": ["G1", "g2"], "total_price": 1})
+
+        def post():
+            request = RequestFactory().post(
+                path,
+                body,
+                content_type="application/json",
+                headers={"Idempotency-Key": "abc"},
+            )
+            request.user = self.user
+            request._dont_enforce_csrf_checks = True
+            return resolve(path).func(request, show_id=self.show.id)
+
+        first, second = post(), post()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(json.loads(first.content), json.loads(second.content))
+        self.assertEqual(json.loads(first.content)["total_price"], "500.00")
+        self.assertEqual(json.loads(first.content)["seats"], ["G1", "G2"])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_cancel_releases_linked_seats_and_reprices(self):
+        response = self._book(["H1", "H2", "H3"])
+        booking = Booking.objects.get(id=json.loads(response.content)["booking_id"])
+        tickets = list(booking.tickets.select_related("seat").order_by("id"))
+        self.assertEqual([t.seat.seat_number for t in tickets], ["H1", "H2", "H3"])
+
+        cancelled = cancel_tickets(booking, [tickets[0].id, tickets[1].id])
+
+        booking.refresh_from_db()
+        self.assertEqual(cancelled, 2)
+        self.assertEqual(booking.number_of_tickets, 1)
+        self.assertEqual(booking.total_price, 250)
+        self.assertEqual(booking.ticket_id, tickets[2].id)
+        self.assertEqual(
+            set(
+                Seat.objects.filter(show=self.show, kind="sold").values_list(
+                    "seat_number", flat=True
+                )
+            ),
+            {"H3"},
+        )
+
+    def test_expiry_releases_unpaid_seats_and_voids_tickets(self):
+        def book(seats):
+            return Booking.objects.get(
+                id=json.loads(self._book(seats).content)["booking_id"]
+            )
+
+        initiated = book(["J1", "J2"])
+        paid = book(["J3"])
+        unpaid = book(["J4"])
+        sent = book(["J5"])
+        Booking.objects.filter(id=initiated.id).update(payment_status="Initiated")
+        confirm_payment(paid, RequestFactory().post("/"))
+        # Booked before payment was required: its tickets were already emailed
+        sent.tickets.update(payment_status="confirmed")
+        Booking.objects.update(created_at=timezone.now() - datetime.timedelta(hours=1))
+
+        stats = expire_unpaid_bookings(window_minutes=30, batch_size=1)
+
+        self.assertEqual((stats["bookings"], stats["seats"]), (2, 3))
+        statuses = dict(Booking.objects.values_list("id", "payment_status"))
+        self.assertEqual(
+            [statuses[b.id] for b in (initiated, paid, unpaid, sent)],
+            ["Expired", "Paid", "Expired", "Confirmed"],
+        )
+        self.assertEqual(
+            set(
+                Ticket.objects.filter(booking__in=[initiated, unpaid]).values_list(
+                    "payment_status", "seat"
+                )
+            ),
+            {("void", None)},
+        )
+        self.assertEqual(
+            set(
+                Seat.objects.filter(show=self.show, kind="sold").values_list(
+                    "seat_number", flat=True
+                )
+            ),
+            {"J3", "J5"},
+        )
+        self.assertEqual(self._book(["J1"]).status_code, 200)
+        with self.assertRaises(PaymentClosed):
+            confirm_payment(unpaid, RequestFactory().post("/"))
+
+    def test_released_seats_are_offered_to_the_waitlist_in_order(self):
+        response = self._book(["K1", "K2"])
+        booking = Booking.objects.get(id=json.loads(response.content)["booking_id"])
+        fans = [
+            CustomUser.objects.create(username=f"wait{i}", email=f"w{i}@example.com")
+            for i in range(3)
+        ]
+        too_big = join_waitlist(self.show, fans[0], party_size=3)
+        pair = join_waitlist(self.show, fans[1], party_size=2)
+        single = join_waitlist(self.show, fans[2], party_size=1)
+
+        cancel_tickets(booking, booking.tickets.values_list("id", flat=True))
+
+        too_big.refresh_from_db()
+        pair.refresh_from_db()
+        single.refresh_from_db()
+        self.assertEqual(too_big.status, "waiting")
+        self.assertEqual((pair.status, pair.offered_seats), ("offered", ["K1", "K2"]))
+        self.assertEqual(single.status, "waiting")
+        self.assertEqual(
+            set(
+                Seat.objects.filter(show=self.show, kind="held").values_list(
+                    "seat_number", flat=True
+                )
+            ),
+            {"K1", "K2"},
+        )
+        self.assertEqual(self._book(["K1"]).status_code, 409)
+
+        offer_booking = accept_offer(pair, RequestFactory().post("/"))
+
+        pair.refresh_from_db()
+        self.assertEqual((pair.status, pair.booking_id), ("booked", offer_booking.id))
+        self.assertEqual(
+            sorted(offer_booking.tickets.values_list("seat_number", flat=True)),
+            ["K1", "K2"],
+        )
+        # Awaiting payment like any booking: tickets are not valid yet
+        self.assertEqual(offer_booking.payment_status, "Confirmed")
+        self.assertEqual(
+            set(offer_booking.tickets.values_list("payment_status", flat=True)),
+            {"pending"},
+        )
+
+
+class BookingContentionTests(TransactionTestCase):
+    """Many threads fight over a handful of seats; each may sell only once."""
+
+    THREADS = 12
+    ATTEMPTS_PER_THREAD = 6
+    HOT_SEATS = 8
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, EMAIL_OUTBOX_AUTO_DRAIN=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_no_seat_is_sold_twice(self):
+        show = Show.objects.create(
+            name="Contended",
+            date=datetime.date.today() + datetime.timedelta(days=3),
+            time=datetime.time(19, 0),
+            seat_price=250,
+        )
+        users = [
+            CustomUser.objects.create(username=f"fan{i}", email=f"fan{i}@example.com")
+            for i in range(self.THREADS)
+        ]
+        hot = free_seat_numbers(show)[: self.HOT_SEATS]
+        request = RequestFactory().post("/")
+        gate = threading.Barrier(self.THREADS)
+        outcomes = []
+
+        def attempt(user, seat_numbers):
+            # SQLite lets one writer in at a time and fails the others
+            # straight away; retry those like a client would
+            for _ in range(200):
+                try:
+                    place_booking(show, user, seat_numbers, request)
+                    return "booked"
+                except SeatConflict:
+                    return "conflict"
+                except OperationalError:
+                    time.sleep(0.005)
+            return "busy"
+
+        def fan(user, rng):
+            gate.wait()
+            try:
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    outcomes.append(attempt(user, rng.sample(hot, 2)))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=fan, args=(user, random.Random(i)))
+            for i, user in enumerate(users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIn("booked", outcomes)
+        sold = (
+            Ticket.objects.filter(show=show)
+            .values("seat_number")
+            .annotate(n=Count("id"))
+        )
+        self.assertFalse([row for row in sold if row["n"] > 1])
+        self.assertEqual(Seat.objects.filter(show=show, kind="sold").count(), len(sold))
+        self.assertEqual(
+            sum(
+                Booking.objects.filter(show=show).values_list(
+                    "number_of_tickets", flat=True
+                )
+            ),
+            len(sold),
+        )
+
+
+# ------------------ Waiting room ------------------ #
+class WaitingRoomTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.show = Show.objects.create(
+            name="On Sale",
+            date=datetime.date.today() + datetime.timedelta(days=10),
+            time=datetime.time(19, 0),
+            seat_price=250,
+            on_sale_at=timezone.now(),
+            waiting_room_minutes=30,
+        )
+        cls.fans = [
+            CustomUser.objects.create(username=f"q{i}", email=f"q{i}@example.com")
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        burst = mock.patch.object(waiting_room, "ADMIT_BURST", 1)
+        burst.start()
+        self.addCleanup(burst.stop)
+        # The checked-in settings leave SECRET_KEY blank; tokens need one
+        secret = mock.patch.dict(settings.__dict__, {"SECRET_KEY": "queue-tests"})
+        secret.start()
+        self.addCleanup(secret.stop)
+
+    def _call(self, name, user, method="get", cookies=None):
+        path = reverse(name, args=[self.show.id])
+        request = getattr(RequestFactory(), method)(path)
+        request.user = user
+        request.COOKIES.update(cookies or {})
+        request._dont_enforce_csrf_checks = True
+        return resolve(path).func(request, show_id=self.show.id)
+
+    def test_only_admitted_positions_reach_the_booking_page(self):
+        cookie = waiting_room.cookie_name(self.show.id)
+        first = self._call("book_ticket", self.fans[0])
+        token = first.cookies[cookie].value
+        admitted = self._call("book_ticket", self.fans[0], cookies={cookie: token})
+        cache.clear()  # as if another worker: positions come from the database
+        queued = self._call("book_ticket", self.fans[1])
+
+        self.assertContains(admitted, "Loading seats")
+        self.assertContains(queued, "in the queue")
+        second_token = queued.cookies[cookie].value
+        status = json.loads(
+            self._call(
+                "waiting_room_status", self.fans[1], cookies={cookie: second_token}
+            ).content
+        )
+        self.assertEqual((status["position"], status["ahead"]), (2, 1))
+
+        # The token is bound to its holder and can't jump the queue elsewhere
+        stolen = self._call(
+            "api_create_booking", self.fans[1], "post", cookies={cookie: token}
+        )
+        self.assertEqual(stolen.status_code, 429)
+        anonymous = self._call("api_create_booking", AnonymousUser(), "post")
+        self.assertEqual(anonymous.status_code, 401)
+
+
+class SeasonImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    SCHEDULE = (
+        "name,date,time,seat_price,include_balcony\n"
+        "Hamlet,2031-01-10,19:00,300,yes\n"
+        "Hamlet,2031-01-11,19:00,300,no\n"
+        "Macbeth,2031-01-12,18:30,,\n"
+    )
+
+    def test_import_resolves_slugs_and_stores_house_seats(self):
+        Show.objects.create(
+            name="Hamlet", date=datetime.date(2030, 1, 1), time=datetime.time(19, 0)
+        )
+
+        report = import_season(load_schedule(self.SCHEDULE), workers=1)
+
+        self.assertEqual(report["errors"], [])
+        self.assertEqual(
+            [slug for _, slug, _ in report["shows"]],
+            ["hamlet-1", "hamlet-2", "macbeth"],
+        )
+        imported = Show.objects.filter(slug__in=["hamlet-1", "hamlet-2", "macbeth"])
+        self.assertEqual(
+            [(s.include_balcony, bool(s.qr_code)) for s in imported.order_by("date")],
+            [(True, True), (False, True), (True, True)],
+        )
+        self.assertEqual(
+            Seat.objects.filter(show__in=imported, kind="house").count(), 3 * 52
+        )
+
+    def test_dry_run_and_bad_rows_write_nothing(self):
+        dry = import_season(load_schedule(self.SCHEDULE), dry_run=True, workers=1)
+        bad = import_season(
+            load_schedule("name,date,time\nX,someday,19:00\n"), workers=1
+        )
+
+        self.assertEqual(len(dry["shows"]), 3)
+        self.assertIn("render_qr", dry["timings"])
+        self.assertEqual(bad["errors"][0][0], 1)
+        self.assertFalse(Show.objects.exists())
+
+
+class ShowQrTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.show = Show.objects.create(
+            name="QR", date=datetime.date(2031, 2, 1), time=datetime.time(19, 0)
+        )
+
+    def test_rendered_once_and_again_only_when_url_changes(self):
+        self.assertFalse(self.show.qr_code)  # save() no longer renders
+
+        with mock.patch("user.show_qr.qr_png", return_value=b"png") as render:
+            first = ensure_show_qr(self.show)
+            self.show.save()
+            again = ensure_show_qr(Show.objects.get(id=self.show.id))
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(first, again)
+
+            with override_settings(PUBLIC_BASE_URL="https://tickets.example.com"):
+                moved = ensure_show_qr(Show.objects.get(id=self.show.id))
+            self.assertEqual(render.call_count, 2)
+            render.assert_called_with(
+                f"https://tickets.example.com/qr/scan/{self.show.id}/"
+            )
+
+        self.assertNotEqual(moved, first)
+        self.assertEqual(Show.objects.get(id=self.show.id).qr_code.name, moved)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, first)))
+
+    def test_view_serves_png_and_revalidates(self):
+        path = reverse("show_qr_code", args=[self.show.id])
+        view = resolve(path).func
+
+        response = view(RequestFactory().get(path), show_id=self.show.id)
+        not_modified = view(
+            RequestFactory().get(path, HTTP_IF_NONE_MATCH=response["ETag"]),
+            show_id=self.show.id,
+        )
+
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"\x89PNG"))
+        self.assertEqual(not_modified.status_code, 304)
+
+
+class DedupStorageTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.storage = DedupFileSystemStorage(location=self.root)
+
+    def test_identical_uploads_share_one_copy_until_the_last_is_deleted(self):
+        first = self.storage.save("thumbnails/film.png", ContentFile(b"film" * 100))
+        again = self.storage.save("thumbnails/film.png", ContentFile(b"film" * 100))
+        other = self.storage.save("show_media/film.png", ContentFile(b"other"))
+
+        self.assertNotEqual(first, again)  # names behave as before
+        self.assertTrue(
+            os.path.samefile(self.storage.path(first), self.storage.path(again))
+        )
+        self.assertEqual(os.stat(self.storage.path(first)).st_nlink, 3)
+        self.assertEqual(os.stat(self.storage.path(other)).st_nlink, 2)
+
+        self.storage.delete(first)
+        self.assertEqual(self.storage.open(again).read(), b"film" * 100)
+        self.storage.delete(again)
+
+        blobs = [
+            f for _, _, files in os.walk(self.storage.path("blobs")) for f in files
+        ]
+        self.assertEqual(len(blobs), 1)  # only the other file's content is left
+
+
+class MediaGarbageCollectorTests(TestCase):
+    def setUp(self):
+        # Files outlive the rolled-back rows, so each test gets its own root
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def test_only_unreferenced_files_are_swept(self):
+        show = Show.objects.create(
+            name="GC", date=datetime.date(2031, 3, 1), time=datetime.time(19, 0)
+        )
+        show.poster.save("poster.txt", ContentFile(b"kept"))
+        gone = Show.objects.create(
+            name="Gone", date=datetime.date(2031, 3, 2), time=datetime.time(19, 0)
+        )
+        gone.poster.save("poster.txt", ContentFile(b"orphan"))
+        Show.objects.filter(id=gone.id).delete()  # rows go, the file stays
+
+        dry = collect_garbage(dry_run=True, min_age_minutes=0)
+        swept = collect_garbage(min_age_minutes=0)
+
+        # The orphaned name plus its content blob
+        self.assertEqual((dry["orphans"], swept["orphans"]), (2, 2))
+        self.assertTrue(os.path.exists(show.poster.path))
+        self.assertFalse(os.path.exists(gone.poster.path))
+        self.assertEqual(collect_garbage(min_age_minutes=0)["orphans"], 0)
+
+    def test_quarantine_frees_nothing_until_purged(self):
+        show = Show.objects.create(
+            name="Q", date=datetime.date(2031, 3, 3), time=datetime.time(19, 0)
+        )
+        show.poster.save("moved.txt", ContentFile(b"quarantined"))
+        Show.objects.filter(id=show.id).delete()
+
+        report = collect_garbage(quarantine=True, min_age_minutes=0)
+
+        # The name moves aside; its blob is still linked from the quarantine
+        self.assertEqual(report["orphans"], 1)
+        self.assertEqual((report["bytes"], report["quarantined"]), (0, 11))
+        self.assertFalse(os.path.exists(show.poster.path))
+
+        shutil.rmtree(os.path.join(self.media_root, ".quarantine"))
+        purged = collect_garbage(min_age_minutes=0)
+        self.assertEqual((purged["orphans"], purged["bytes"]), (1, 11))
+
+
+class ImageVariantTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(cache.clear)
+
+    def _image(self, name, color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (400, 200), color).save(buffer, name.rsplit(".", 1)[1])
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_same_stem_keeps_separate_variants(self):
+        png = self._image("show_posters/film.png", "red")
+        jpg = self._image("show_posters/film.jpeg", "blue")
+
+        written = generate_variants(png) + generate_variants(jpg)
+
+        self.assertEqual(len(written), len(set(written)))
+        self.assertEqual(set(written), set(variant_names(png) + variant_names(jpg)))
+
+    def test_nothing_is_decoded_when_variants_exist(self):
+        name = self._image("show_posters/film.png", "red")
+        generate_variants(name)
+
+        with mock.patch("user.image_variants._open_rgb") as open_rgb:
+            self.assertEqual(generate_variants(name), [])
+        open_rgb.assert_not_called()
+
+
+class StaticFilesMiddlewareTests(unittest.TestCase):
+    def test_misses_are_not_remembered(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        with override_settings(STATIC_ROOT=root, DEBUG=False):
+            middleware = StaticFilesMiddleware(lambda request: None)
+        with open(os.path.join(root, "app.css"), "w") as f:
+            f.write("body {}")
+
+        for i in range(100):
+            self.assertIsNone(middleware.find(f"missing-{i}.css"))
+        self.assertIsNotNone(middleware.find("app.css"))
+        self.assertEqual(list(middleware._assets), ["app.css"])
+
+
+class MediaServingTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        os.makedirs(os.path.join(self.root, "show_media"))
+        with open(os.path.join(self.root, "show_media", "trailer.mp4"), "wb") as f:
+            f.write(bytes(range(100)))
+
+    def _get(self, **headers):
+        path = "/media/show_media/trailer.mp4"
+        return serve_media(RequestFactory().get(path, **headers), path[7:])
+
+    def test_ranges_and_revalidation(self):
+        full = self._get()
+        middle = self._get(HTTP_RANGE="bytes=10-19")
+        tail = self._get(HTTP_RANGE="bytes=-5")
+        too_far = self._get(HTTP_RANGE="bytes=100-")
+        stale = self._get(HTTP_RANGE="bytes=10-19", HTTP_IF_RANGE='"old"')
+        cached = self._get(HTTP_IF_NONE_MATCH=full["ETag"])
+
+        self.assertEqual((full.status_code, full["Accept-Ranges"]), (200, "bytes"))
+        self.assertEqual(b"".join(full.streaming_content), bytes(range(100)))
+        self.assertEqual(middle.status_code, 206)
+        self.assertEqual(middle["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(middle["Content-Length"], "10")
+        self.assertEqual(b"".join(middle.streaming_content), bytes(range(10, 20)))
+        self.assertEqual(b"".join(tail.streaming_content), bytes(range(95, 100)))
+        self.assertEqual(too_far.status_code, 416)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(cached.status_code, 304)
+        for private in ("../settings.py", "tickets/1_1_all.pdf", "outbox/a.pdf"):
+            with self.assertRaises(Http404):
+                serve_media(RequestFactory().get("/media/" + private), private)
+
+    def test_compressed_files_keep_their_encoding(self):
+        with open(os.path.join(self.root, "show_media", "notes.txt.gz"), "wb") as f:
+            f.write(b"\x1f\x8b" + bytes(20))
+
+        path = "show_media/notes.txt.gz"
+        response = serve_media(RequestFactory().get("/media/" + path), path)
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_proxy_offload(self):
+        with mock.patch("user.media_serving.MEDIA_ACCEL_MODE", "x-accel-redirect"):
+            response = self._get()
+
+        self.assertEqual(
+            response["X-Accel-Redirect"], "/protected-media/show_media/trailer.mp4"
+        )
+        self.assertEqual(response.content, b"")
+
+
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create(
+            username="uploader", email="up@example.com", user_type="Admin"
+        )
+        cls.show = Show.objects.create(
+            name="Trailer", date=datetime.date(2031, 4, 1), time=datetime.time(19, 0)
+        )
+
+    def _call(self, name, args, method="get", data=None, **headers):
+        path = reverse(name, args=args)
+        if method == "get":
+            request = RequestFactory().get(path, **headers)
+        else:
+            request = getattr(RequestFactory(), method)(
+                path, data=data, content_type="application/octet-stream", **headers
+            )
+        request.user = self.admin
+        response = resolve(path).func(request, *args)
+        return response.status_code, json.loads(response.content)
+
+    def test_resumable_upload_is_verified_and_attached(self):
+        payload = bytes(range(256)) * 40
+        status, started = self._call(
+            "api_start_upload",
+            [self.show.id],
+            "post",
+            json.dumps(
+                {
+                    "filename": "trailer.mp4",
+                    "size": len(payload),
+                    "sha256": hashlib.sha256(payload).hexdigest(),
+                }
+            ),
+        )
+        self.assertEqual(status, 201)
+        upload_id = started["id"]
+
+        self._call(
+            "api_upload", [upload_id], "patch", payload[:4000], HTTP_UPLOAD_OFFSET="0"
+        )
+        # A resent chunk is told where to resume; a corrupted one is refused
+        stale, resume = self._call(
+            "api_upload", [upload_id], "patch", payload[:4000], HTTP_UPLOAD_OFFSET="0"
+        )
+        corrupt, _ = self._call(
+            "api_upload",
+            [upload_id],
+            "patch",
+            payload[4000:],
+            HTTP_UPLOAD_OFFSET="4000",
+            HTTP_UPLOAD_CHECKSUM="sha256 AAAA",
+        )
+        _, progress = self._call("api_upload", [upload_id])
+        self._call(
+            "api_upload",
+            [upload_id],
+            "patch",
+            payload[4000:],
+            HTTP_UPLOAD_OFFSET="4000",
+        )
+        status, done = self._call("api_finish_upload", [upload_id], "post")
+
+        self.assertEqual((stale, resume["offset"]), (409, 4000))
+        self.assertEqual(corrupt, 400)
+        self.assertEqual(progress["offset"], 4000)
+        self.assertEqual(status, 201)
+        media = MediaFile.objects.get(id=done["media_id"])
+        self.assertEqual(media.show, self.show)
+        self.assertEqual(media.file.read(), payload)
+        self.assertFalse(os.listdir(os.path.join(self.media_root, ".uploads")))
@@ -1,5 +1,3 @@
-from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import include, path
 
 from . import views
@@ -15,9 +13,39 @@ urlpatterns = [
     path("show/<slug:slug>/", views.show_detail_view, name="show_detail"),
     path("admin/manage-users/", views.admin_user_list, name="admin_user_list"),
     path("manage-users/", views.admin_user_list, name="admin_user_list"),
+    path("manage-users/bulk/", views.admin_bulk_users, name="admin_bulk_users"),
     path("admin/media/upload/<int:show_id>/", views.upload_media, name="upload_media"),
     path("qr/<int:ticket_id>/", views.verify_qr_view, name="verify_qr"),
+    path("show/<int:show_id>/qr.png", views.show_qr_code, name="show_qr_code"),
     path("book/<int:show_id>/", views.create_booking, name="book_ticket"),
+    path("book/<int:show_id>/seats/", views.seat_map_view, name="seat_map"),
+    path(
+        "book/<int:show_id>/queue/",
+        views.waiting_room_status,
+        name="waiting_room_status",
+    ),
+    path(
+        "book/<int:show_id>/waitlist/",
+        views.join_waitlist_view,
+        name="join_waitlist",
+    ),
+    path("waitlist/<int:entry_id>/", views.waitlist_entry_view, name="waitlist_entry"),
+    path(
+        "api/v1/shows/<int:show_id>/bookings/",
+        views.api_create_booking,
+        name="api_create_booking",
+    ),
+    path(
+        "api/v1/shows/<int:show_id>/uploads/",
+        views.api_start_upload,
+        name="api_start_upload",
+    ),
+    path("api/v1/uploads/<uuid:upload_id>/", views.api_upload, name="api_upload"),
+    path(
+        "api/v1/uploads/<uuid:upload_id>/complete/",
+        views.api_finish_upload,
+        name="api_finish_upload",
+    ),
     path(
         "dashboard/visitor-analytics/",
         views.admin_visitor_analytics,
@@ -26,10 +54,16 @@ urlpatterns = [
     path(
         "dashboard/get_visitor_data/", views.get_visitor_data, name="get_visitor_data"
     ),
+    path(
+        "admin/bookings/<int:booking_id>/edit/",
+        views.edit_booking,
+        name="edit_booking",
+    ),
     path(
         "download-ticket/<int:ticket_id>/",
         views.download_ticket,
         name="download_ticket",
     ),
     path("profile/settings/", views.profile_settings, name="profile_settings"),
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+    path("metrics", views.metrics_view, name="metrics"),
+]
@@ -1,65 +1,96 @@
+import hashlib
 import json
 import os
-from collections import defaultdict
 from datetime import date
+from functools import lru_cache, wraps
 
 import requests
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, update_session_auth_hash
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
-from django.core.mail import EmailMessage
-from django.db import transaction
+from django.db import IntegrityError, OperationalError, transaction
 from django.db.models import Count
-from django.http import (FileResponse, Http404, HttpResponseForbidden,
-                         JsonResponse)
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseForbidden, JsonResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.templatetags.static import static
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.cache import never_cache
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_POST
 
 from accounts.forms import MediaUploadForm
 from accounts.models import CustomUser
+from accounts.user_admin import apply_role_changes, deactivate_unverified
 from user.models import VisitorLog
 
+from .booking import (PaymentClosed, SeatConflict, accept_offer,
+                      booking_pdf_path, cancel_tickets, confirm_payment,
+                      parse_seat_numbers, place_booking)
+from .chunked_upload import (OffsetMismatch, UploadRejected, finish_upload,
+                             start_upload, upload_progress, write_chunk)
 from .forms import EmailUpdateForm, SignUpForm, UserProfileForm
 from .location_utils import get_location_from_ip
+from .mail_outbox import outbox_depth
+from .metrics import ticket_scanned
+from .metrics import render as render_metrics
+from .page_cache import (SHOWS_SCOPE, cached_page, conditional_response,
+                         get_version, set_validators, show_scope)
+from .pagination import filter_users, keyset_page_for_request
 from .models import *
-from .models import QRScanLog, Show, Ticket
-from .qr_utils import generate_ticket_pdf, generate_ticket_qr
+from .models import (BookingRequest, MediaUpload, QRScanLog, Show, Ticket,
+                     WaitlistEntry)
+from .qr_utils import generate_ticket_pdf
+from .seat_map import seat_map_json
+from .show_qr import ensure_show_qr, show_qr_url, url_digest
+from .waiting_room import (get_window, is_active, queue_status, read_position,
+                           waiting_room_gate)
+from .waitlist import (MAX_PARTY_SIZE, OfferClosed, join_waitlist,
+                       leave_waitlist, queue_position)
 
 # ------------------ Static Pages ------------------ #
 
 
+@lru_cache(maxsize=1)
+def get_portfolio_items():
+    return [
+        {
+            "image": static(f"assets/img/masonry-portfolio/masonry-portfolio-{i}.jpg"),
+            "title": f"Title {i}",
+            "description": "Lorem ipsum, dolor sit",
+            "filter": f'filter-{["product", "branding", "app"][i % 3]}',
+        }
+        for i in range(2, 10)
+    ]
+
+
 def home(request):
     today = date.today()
-    shows = Show.objects.filter(date__gte=today).order_by("date")
 
-    # 🌐 Capture IP & Location
+    # 🌐 Capture IP & Location (geo lookups are cached per IP)
     ip = request.META.get("REMOTE_ADDR", "")
     try:
-        geo = requests.get(f"http://ip-api.com/json/{ip}").json()
-        district = geo.get("city") or geo.get("regionName") or "Unknown"
+        location = get_location_from_ip(ip)
+        district = location["city"] or location["region"] or "Unknown"
         VisitorLog.objects.create(ip_address=ip, district=district)
     except:
         pass
 
-    portfolio_items = [
-        {
-            "image": static(f"assets/img/masonry-portfolio/masonry-portfolio-{i}.jpg"),
-            "title": f"Title {i}",
-            "description": "Lorem ipsum, dolor sit",
-            "filter": f'filter-{["product", "branding", "app"][i % 3]}',
-        }
-        for i in range(2, 10)
-    ]
+    def render_home():
+        shows = Show.objects.filter(date__gte=today).order_by("date")
+        return render(
+            request,
+            "home.html",
+            {"shows": shows, "today": today, "portfolio_items": get_portfolio_items()},
+        )
 
-    return render(
-        request,
-        "home.html",
-        {"shows": shows, "today": today, "portfolio_items": portfolio_items},
+    # The page only changes when a show is edited (or the date rolls over)
+    return cached_page(
+        request, f"home:{today}", get_version(SHOWS_SCOPE), render_home
     )
 
 
@@ -102,125 +133,180 @@ def login_view(request):
 
 # ------------------ Profile & Booking ------------------ #
 
+# Shown when the database lock could not be had in time (nothing was booked)
+BUSY_MESSAGE = "Booking is very busy right now. Please try again in a moment."
+
+def _wants_json(request):
+    return request.headers.get("x-requested-with") == "XMLHttpRequest" or (
+        "application/json" in request.headers.get("accept", "")
+    )
+
 
 @never_cache
 @login_required
+@waiting_room_gate
 def create_booking(request, show_id):
     show = get_object_or_404(Show, id=show_id)
     if show.date < timezone.now().date():
         return HttpResponseForbidden("❌ Booking for past shows is not allowed.")
 
-    available_seats = Seat.objects.filter(show=show)
-    ground_rows = defaultdict(list)
-    balcony_rows = defaultdict(list)
-    for seat in available_seats:
-        row_label = "".join(filter(str.isalpha, seat.seat_number))
-        if len(row_label) >= 2 and row_label.startswith("B"):
-            balcony_rows[row_label].append(seat)
-        else:
-            ground_rows[row_label].append(seat)
-    for row_dict in [ground_rows, balcony_rows]:
-        for row, seats in row_dict.items():
-            row_dict[row] = sorted(
-                seats, key=lambda s: int("".join(filter(str.isdigit, s.seat_number)))
-            )
-
-    recommended_seats = []
-    if request.method != "POST":
-        stall_rows = [chr(i) for i in range(ord("C"), ord("T") + 1)]
-        for row in stall_rows:
-            seats = ground_rows.get(row, [])
-            center_start = 10
-            for offset in range(13):
-                left = center_start - offset
-                right = center_start + offset
-                if any(
-                    s.seat_number == f"{row}{left}" and not s.is_booked for s in seats
-                ):
-                    recommended_seats.append(
-                        next(s for s in seats if s.seat_number == f"{row}{left}")
-                    )
-                if any(
-                    s.seat_number == f"{row}{right}" and not s.is_booked for s in seats
-                ):
-                    recommended_seats.append(
-                        next(s for s in seats if s.seat_number == f"{row}{right}")
-                    )
-                if len(recommended_seats) >= 5:
-                    break
-            if len(recommended_seats) >= 5:
-                break
-
     if request.method == "POST":
-        selected_seat_ids = request.POST.get("selected_seats", "").split(",")
-        selected_seat_ids = [sid for sid in selected_seat_ids if sid.strip().isdigit()]
-        if selected_seat_ids:
-            with transaction.atomic():
-                seats_to_book = Seat.objects.select_for_update().filter(
-                    id__in=selected_seat_ids, show=show
-                )
-                if seats_to_book.count() != len(selected_seat_ids) or any(
-                    seat.is_booked for seat in seats_to_book
-                ):
-                    messages.error(
-                        request,
-                        "⚠️ One or more selected seats are already booked. Please try again.",
-                    )
-                    return redirect("book_ticket", show_id=show.id)
-
-                Seat.objects.filter(id__in=selected_seat_ids).update(is_booked=True)
-                total_price = len(selected_seat_ids) * show.seat_price
-                booking = Booking.objects.create(
-                    user=request.user,
-                    show=show,
-                    event_name=show.name,
-                    event_date=show.date,
-                    number_of_tickets=len(selected_seat_ids),
-                    total_price=total_price,
-                    payment_status="Confirmed",
+        wants_json = _wants_json(request)
+        seat_numbers, _ = parse_seat_numbers(
+            request.POST.get("selected_seats", ""), show
+        )
+        if not seat_numbers:
+            if wants_json:
+                return JsonResponse(
+                    {"ok": False, "message": "No seats selected."}, status=400
                 )
+            return redirect("book_ticket", show_id=show.id)
 
-                ticket_list = []
-                for seat in seats_to_book:
-                    ticket = Ticket.objects.create(
-                        user=request.user,
-                        show=show,
-                        seat_number=seat.seat_number,
-                        payment_status="confirmed",
-                    )
-                    generate_ticket_qr(ticket, request)
-                    ticket_list.append(ticket)
-
-                # ✅ Link first ticket to the booking for download visibility
-                if ticket_list:
-                    booking.ticket = ticket_list[0]
-                    booking.save()
-
-                # ✅ Generate and email the combined ticket PDF
-                pdf_buffer = generate_ticket_pdf(ticket_list, request)
-                email = EmailMessage(
-                    subject="🎫 Raven Entertainment Ticket Confirmation",
-                    body="Attached is your ticket PDF. Thank You for Booking 🎭",
-                    to=[request.user.email],
+        partial = request.POST.get("mode") == "partial"
+        try:
+            booking, seat_numbers, substitutes = place_booking(
+                show, request.user, seat_numbers, request, partial=partial
+            )
+        except OperationalError:
+            # Lock wait timed out: nothing was booked, the buyer can retry
+            if wants_json:
+                return JsonResponse(
+                    {"ok": False, "message": BUSY_MESSAGE},
+                    status=503,
+                    headers={"Retry-After": "2"},
+                )
+            messages.error(request, f"⚠️ {BUSY_MESSAGE}")
+            return redirect("book_ticket", show_id=show.id)
+        except SeatConflict as conflict:
+            if wants_json:
+                return JsonResponse(
+                    {
+                        "ok": False,
+                        "message": str(conflict),
+                        "conflicts": conflict.conflicts,
+                        "alternatives": conflict.alternatives,
+                    },
+                    status=409,
                 )
-                email.attach("tickets.pdf", pdf_buffer.getvalue(), "application/pdf")
-                email.send()
+            taken = ", ".join(c["seat_number"] for c in conflict.conflicts)
+            messages.error(
+                request,
+                f"⚠️ Already booked: {taken}. Please pick other seats.",
+            )
+            return redirect("book_ticket", show_id=show.id)
+
+        payment_url = reverse("payments", args=[booking.id])
+        if wants_json:
+            return JsonResponse(
+                {
+                    "ok": True,
+                    "booking_id": booking.id,
+                    "seats": seat_numbers,
+                    "substitutes": substitutes,
+                    "redirect": payment_url,
+                }
+            )
+        return redirect(payment_url)
+
+    # The seat map itself is drawn client-side from seat_map_view's JSON
+    return render(request, "user/create_booking.html", {"show": show})
+
+
+@never_cache
+def waiting_room_status(request, show_id):
+    """Queue position feed polled by the waiting page; no database access."""
+    window = get_window(show_id)
+    if not is_active(window):
+        return JsonResponse({"queued": False, "admitted": True})
+    position = read_position(request, show_id, window)
+    if position is None:
+        return JsonResponse({"queued": False, "admitted": False}, status=404)
+    return JsonResponse({"queued": True, **queue_status(window, position)})
+
+
+def _waitlist_json(entry):
+    return {
+        "ok": True,
+        "entry_id": entry.id,
+        "status": entry.status,
+        "position": queue_position(entry),
+        "party_size": entry.party_size,
+        "section": entry.section,
+        "offered_seats": entry.offered_seats,
+        "offer_expires_at": entry.offer_expires_at,
+    }
+
+
+@never_cache
+@login_required
+@require_POST
+def join_waitlist_view(request, show_id):
+    """
+    Join (or update) the show's waitlist with a party size and, optionally,
+    a section. Released seats are offered by email instead of the buyer
+    reloading the seat map.
+    """
+    show = get_object_or_404(Show, id=show_id)
+    try:
+        party_size = int(request.POST.get("party_size", 1))
+    except ValueError:
+        party_size = 0
+    section = request.POST.get("section", "")
+    sections = dict(WaitlistEntry.SECTION_CHOICES)
+    if not 1 <= party_size <= MAX_PARTY_SIZE or section not in sections:
+        message = f"Party size must be 1–{MAX_PARTY_SIZE} and the section valid."
+        if _wants_json(request):
+            return JsonResponse({"ok": False, "message": message}, status=400)
+        messages.error(request, f"❌ {message}")
+        return redirect("book_ticket", show_id=show.id)
+
+    entry = join_waitlist(show, request.user, party_size, section)
+    if _wants_json(request):
+        return JsonResponse(_waitlist_json(entry), status=201)
+    return redirect("waitlist_entry", entry_id=entry.id)
 
-                return redirect("payments", booking_id=booking.id)
 
+@never_cache
+@login_required
+def waitlist_entry_view(request, entry_id):
+    entry = get_object_or_404(
+        WaitlistEntry.objects.select_related("show"), id=entry_id, user=request.user
+    )
+    if request.method == "POST":
+        if request.POST.get("action") == "leave":
+            leave_waitlist(entry)
+            messages.success(request, "👋 You have left the waitlist.")
+            return redirect("waitlist_entry", entry_id=entry.id)
+        try:
+            booking = accept_offer(entry, request)
+        except OfferClosed:
+            messages.error(request, "⌛ This offer is no longer available.")
+            return redirect("waitlist_entry", entry_id=entry.id)
+        return redirect("payments", booking_id=booking.id)
+
+    if _wants_json(request):
+        return JsonResponse(_waitlist_json(entry))
     return render(
         request,
-        "user/create_booking.html",
-        {
-            "available_seats": available_seats,
-            "ground_rows": dict(ground_rows),
-            "balcony_rows": dict(balcony_rows),
-            "recommended_seats": recommended_seats,
-            "show": show,
-        },
+        "user/waitlist_entry.html",
+        {"entry": entry, "position": queue_position(entry)},
     )
 
 
+@gzip_page
+def seat_map_view(request, show_id):
+    show = get_object_or_404(Show, id=show_id)
+    payload, version = seat_map_json(show)
+
+    key = f"seatmap:{show.id}"
+    not_modified = conditional_response(request, key, version)
+    if not_modified is not None:
+        return not_modified
+
+    response = HttpResponse(payload, content_type="application/json")
+    return set_validators(response, key, version)
+
+
 @login_required
 def payment_view(request, booking_id):
     booking = get_object_or_404(Booking, id=booking_id, user=request.user)
@@ -257,47 +343,145 @@ def payment_gateway(request, booking_id):
 # ------------------ API Endpoints ------------------ #
 
 
-@csrf_exempt
-def book_seats(request):
-    if request.method == "POST":
-        try:
-            data = json.loads(request.body)
-            Seat.objects.filter(id__in=data.get("seats", [])).update(is_booked=True)
-            return JsonResponse({"success": True})
-        except Exception as e:
-            return JsonResponse({"success": False, "error": str(e)})
-    return JsonResponse({"success": False})
+IDEMPOTENCY_HEADER = "Idempotency-Key"
 
 
-@csrf_exempt
-def process_payment(request):
-    if request.method == "POST":
-        try:
-            data = json.loads(request.body)
-            if not data.get("upi_id"):
-                return JsonResponse({"success": False, "message": "UPI ID missing"})
-
-            booking = Booking.objects.create(
-                user=request.user,
-                event_name=data.get("event_name", "Default Show"),
-                number_of_tickets=int(data.get("number_of_tickets", 1)),
-                total_price=float(
-                    data.get(
-                        "total_price",
-                    )
-                ),
-                payment_status="Paid",
-                upi_id=data["upi_id"],
+def _api_error(message, status, **extra):
+    return JsonResponse({"ok": False, "message": message, **extra}, status=status)
+
+
+def _api_login_required(view):
+    """401 for anonymous API callers, before any other check runs."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _api_error("Authentication required.", 401)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _replay_booking_request(user, key, fingerprint):
+    """The stored response for a key this user has already used, if any."""
+    record = BookingRequest.objects.filter(user=user, key=key).first()
+    if record is None:
+        return None
+    if record.fingerprint != fingerprint:
+        return _api_error(
+            f"{IDEMPOTENCY_HEADER} was already used for a different request.", 422
+        )
+    response = JsonResponse(record.response, status=201)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+@never_cache
+@require_POST
+@_api_login_required
+@waiting_room_gate
+def api_create_booking(request, show_id):
+    """
+    ``POST /api/v1/shows/<show_id>/bookings/`` with ``{"seats": ["F10",
+    "F11"]}`` (and optionally ``"mode": "partial"``, see ``place_booking``).
+
+    Seats are claimed by inserting them under a unique constraint, priced from
+    ``Show.seat_price`` on the server, and a repeated ``Idempotency-Key``
+    returns the original booking instead of booking twice. Conflicts come
+    back as 409 with the taken seats and the nearest free alternatives.
+    """
+    show = get_object_or_404(Show, id=show_id)
+    if show.date < timezone.now().date():
+        return _api_error("Booking for past shows is not allowed.", 403)
+
+    try:
+        data = json.loads(request.body or b"{}")
+        if not isinstance(data["seats"], list):
+            raise TypeError
+        seat_numbers, unknown = parse_seat_numbers(data["seats"], show)
+    except (ValueError, KeyError, TypeError):
+        return _api_error(
+            'Expected a JSON body like {"seats": ["F10", "F11"]}.', 400
+        )
+    if unknown:
+        return _api_error("No such seats in this show.", 400, unknown=unknown)
+    if not seat_numbers:
+        return _api_error("No seats selected.", 400)
+    partial = data.get("mode") == "partial"
+
+    key = request.headers.get(IDEMPOTENCY_HEADER, "").strip()[:64]
+    fingerprint = hashlib.sha256(
+        json.dumps([show.id, seat_numbers, partial]).encode()
+    ).hexdigest()
+    if key:
+        replay = _replay_booking_request(request.user, key, fingerprint)
+        if replay is not None:
+            return replay
+
+    try:
+        # Only successful bookings are remembered: after a conflict the
+        # same key can be retried
+        with transaction.atomic():
+            record = None
+            if key:
+                record = BookingRequest.objects.create(
+                    user=request.user, key=key, fingerprint=fingerprint
+                )
+            booking, seat_numbers, substitutes = place_booking(
+                show, request.user, seat_numbers, request, partial=partial
             )
-            return JsonResponse({"success": True, "booking_id": booking.id})
-        except Exception as e:
-            return JsonResponse({"success": False, "message": str(e)})
-    return JsonResponse({"success": False, "message": "Invalid request"})
+            body = {
+                "ok": True,
+                "booking_id": booking.id,
+                "show": show.id,
+                "seats": seat_numbers,
+                "substitutes": substitutes,
+                "unit_price": str(show.seat_price),
+                "total_price": str(booking.total_price),
+                "currency": "INR",
+                "payment_url": reverse("payments", args=[booking.id]),
+            }
+            if record is not None:
+                record.booking = booking
+                record.response = body
+                record.save(update_fields=["booking", "response"])
+    except IntegrityError:
+        # A concurrent request with the same key won the race; return its result
+        replay = _replay_booking_request(request.user, key, fingerprint)
+        if replay is None:
+            return _api_error("A request with this key is still in progress.", 409)
+        return replay
+    except OperationalError:
+        response = _api_error(BUSY_MESSAGE, 503)
+        response["Retry-After"] = "2"
+        return response
+    except SeatConflict as conflict:
+        return _api_error(
+            str(conflict),
+            409,
+            conflicts=conflict.conflicts,
+            alternatives=conflict.alternatives,
+        )
+    return JsonResponse(body, status=201)
 
 
 def show_detail_view(request, slug):
     show = get_object_or_404(Show, slug=slug)
-    return render(request, "user/show_detail.html", {"show": show})
+    version = get_version(show_scope(show.id))
+
+    # The navbar differs for signed-in users, so they get their own validator
+    key = f"show:{show.id}:{request.user.is_authenticated}"
+    not_modified = conditional_response(request, key, version)
+    if not_modified is not None:
+        return not_modified
+
+    response = render(
+        request,
+        "user/show_detail.html",
+        {"show": show, "show_version": version},
+    )
+    response.headers.setdefault("Vary", "Cookie")
+    return set_validators(response, key, version, private=True)
 
 
 def home_view(request):
@@ -320,29 +504,41 @@ def edit_booking(request, booking_id):
     if request.user.user_type != "Admin":
         return HttpResponseForbidden("You are not authorized to access this page.")
 
-    booking = get_object_or_404(Booking, id=booking_id)
-    all_related_seats = Seat.objects.filter(show=booking.show, booking=booking)
-
-    if request.method == "POST":
-        selected_ids = request.POST.getlist("cancel_seats")
-        # Set selected seats to booked=True, others to False
-        for seat in all_related_seats:
-            seat.is_booked = str(seat.id) in selected_ids
-            seat.save()
+    booking = get_object_or_404(
+        Booking.objects.select_related("show", "user"), id=booking_id
+    )
+    tickets = booking.tickets.select_related("seat").order_by("id")
 
-        booking.number_of_tickets = all_related_seats.filter(is_booked=True).count()
-        booking.total_price = booking.number_of_tickets * booking.show.seat_price
-        booking.save()
+    if request.method == "POST" and request.POST.get("action") == "confirm_payment":
+        try:
+            confirm_payment(
+                booking,
+                request,
+                transaction_id=request.POST.get("transaction_id", "").strip(),
+            )
+        except PaymentClosed as e:
+            messages.error(request, f"❌ Payment not recorded: {e}")
+        else:
+            messages.success(request, "✅ Payment confirmed; tickets are on their way.")
+        return redirect("edit_booking", booking_id=booking.id)
 
-        messages.success(request, "Seats updated successfully.")
-        return redirect("admin_dashboard")
+    if request.method == "POST":
+        selected_ids = [
+            int(tid) for tid in request.POST.getlist("cancel_seats") if tid.isdigit()
+        ]
+        cancelled = cancel_tickets(booking, selected_ids)
+        if cancelled:
+            messages.success(request, f"✅ {cancelled} seat(s) cancelled and released.")
+        else:
+            messages.info(request, "No seats were selected.")
+        return redirect("edit_booking", booking_id=booking.id)
 
     return render(
         request,
-        "edit_booking.html",
+        "accounts/edit_booking.html",
         {
             "booking": booking,
-            "seats": all_related_seats,
+            "tickets": tickets,
         },
     )
 
@@ -355,14 +551,77 @@ def admin_user_list(request):
     users = CustomUser.objects.exclude(id=request.user.id)
 
     if request.method == "POST":
-        for user in users:
-            role = request.POST.get(f"user_type_{user.id}")
-            if role in ["User", "Admin"]:
-                user.user_type = role
-                user.save()
+        submitted = {
+            key.removeprefix("user_type_"): value
+            for key, value in request.POST.items()
+            if key.startswith("user_type_")
+        }
+        changed = apply_role_changes(request.user, submitted)
+        messages.success(request, f"✅ Updated {changed} user role(s).")
         return redirect("admin_user_list")
 
-    return render(request, "user/admin_manage_users.html", {"users": users})
+    users = keyset_page_for_request(
+        request, filter_users(request, users), keys=("date_joined", "id")
+    )
+    return render(
+        request,
+        "user/admin_manage_users.html",
+        {"users": users, "q": request.GET.get("q", "")},
+    )
+
+
+@require_POST
+@login_required
+def admin_bulk_users(request):
+    """
+    JSON bulk user administration:
+
+    {"roles": {"<user_id>": "User" | "Admin", ...}}
+    {"action": "deactivate_unverified", "older_than_days": 30, "dry_run": true}
+    """
+    if request.user.user_type != "Admin":
+        return JsonResponse({"success": False, "error": "Not authorized"}, status=403)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"success": False, "error": "Invalid JSON"}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse(
+            {"success": False, "error": "Body must be a JSON object"}, status=400
+        )
+
+    if "roles" in data:
+        if not isinstance(data["roles"], dict):
+            return JsonResponse(
+                {"success": False, "error": "roles must be an object"}, status=400
+            )
+        changed = apply_role_changes(request.user, data["roles"])
+        return JsonResponse({"success": True, "updated": changed})
+
+    if data.get("action") == "deactivate_unverified":
+        try:
+            days = int(data.get("older_than_days", 30))
+        except (TypeError, ValueError):
+            days = 0
+        # 0 or less would reach every unverified account
+        if days < 1:
+            return JsonResponse(
+                {"success": False, "error": "older_than_days must be at least 1"},
+                status=400,
+            )
+        dry_run = bool(data.get("dry_run", False))
+        ids = deactivate_unverified(request.user, days, dry_run=dry_run)
+        return JsonResponse(
+            {
+                "success": True,
+                "dry_run": dry_run,
+                "deactivated": len(ids),
+                "user_ids": ids,
+            }
+        )
+
+    return JsonResponse({"success": False, "error": "Unknown action"}, status=400)
 
 
 @require_POST
@@ -384,9 +643,108 @@ def upload_media(request, show_id):
     return redirect("admin_dashboard")
 
 
+# ------------------ Chunked Media Uploads ------------------ #
+def _admin_api_denied(request):
+    if not (request.user.is_authenticated and request.user.user_type == "Admin"):
+        return _api_error("Admin access required.", 403)
+    return None
+
+
+@never_cache
+@require_POST
+def api_start_upload(request, show_id):
+    """
+    ``POST /api/v1/shows/<show_id>/uploads/`` with ``{"filename":
+    "trailer.mp4", "size": 734003200}`` (optionally ``"sha256"``, the hex
+    digest of the whole file, and ``"description"``). Chunks then go to
+    ``upload_url``; see ``api_upload``.
+    """
+    denied = _admin_api_denied(request)
+    if denied:
+        return denied
+    show = get_object_or_404(Show, id=show_id)
+    try:
+        data = json.loads(request.body or b"{}")
+        upload = start_upload(
+            show,
+            request.user,
+            str(data["filename"]),
+            int(data["size"]),
+            sha256=str(data.get("sha256") or ""),
+            description=str(data.get("description") or "")[:100],
+        )
+    except (ValueError, KeyError, TypeError):
+        return _api_error(
+            'Expected a JSON body like {"filename": "trailer.mp4", "size": 1024}.', 400
+        )
+    except UploadRejected as e:
+        return _api_error(str(e), 400)
+    body = {"ok": True, **upload_progress(upload)}
+    body["upload_url"] = reverse("api_upload", args=[upload.id])
+    body["complete_url"] = reverse("api_finish_upload", args=[upload.id])
+    return JsonResponse(body, status=201)
+
+
+@never_cache
+def api_upload(request, upload_id):
+    """
+    ``GET`` an upload's progress, including the offset to resume from.
+    ``PATCH`` appends one chunk: the raw request body, with an
+    ``Upload-Offset`` header and optionally ``Upload-Checksum: sha256
+    <base64>``. A chunk at the wrong offset gets a 409 with the right one.
+    """
+    denied = _admin_api_denied(request)
+    if denied:
+        return denied
+    upload = get_object_or_404(MediaUpload, id=upload_id)
+    if request.method == "GET":
+        return JsonResponse({"ok": True, **upload_progress(upload)})
+    if request.method != "PATCH":
+        return _api_error("Use GET or PATCH.", 405)
+
+    try:
+        offset = int(request.headers["Upload-Offset"])
+        length = int(request.headers["Content-Length"])
+    except (KeyError, ValueError):
+        return _api_error("Upload-Offset and Content-Length are required.", 400)
+    checksum_header = request.headers.get("Upload-Checksum", "")
+    algorithm, _, checksum = checksum_header.partition(" ")
+    if algorithm and algorithm != "sha256":
+        return _api_error("Only sha256 chunk checksums are supported.", 400)
+
+    try:
+        # The body is streamed into the part file, never read into memory
+        upload = write_chunk(upload, offset, request, length, checksum or None)
+    except OffsetMismatch as e:
+        return _api_error(str(e), 409, offset=e.offset)
+    except UploadRejected as e:
+        return _api_error(str(e), 400)
+    return JsonResponse({"ok": True, **upload_progress(upload)})
+
+
+@never_cache
+@require_POST
+def api_finish_upload(request, upload_id):
+    denied = _admin_api_denied(request)
+    if denied:
+        return denied
+    upload = get_object_or_404(MediaUpload, id=upload_id)
+    try:
+        media = finish_upload(upload)
+    except UploadRejected as e:
+        return _api_error(str(e), 422)
+    return JsonResponse(
+        {"ok": True, "media_id": media.id, "url": media.file.url}, status=201
+    )
+
+
 def verify_qr_view(request, ticket_id):
     ticket = get_object_or_404(Ticket, id=ticket_id)
+    if ticket.payment_status != "confirmed":
+        ticket_scanned("invalid")
+        return render(request, "user/qr_validated.html", {"valid": False})
     already_scanned = ticket.is_scanned
+    ticket_scanned("duplicate" if already_scanned else "valid")
 
     if not already_scanned:
         ticket.is_scanned = True
@@ -414,6 +772,20 @@ def verify_qr_view(request, ticket_id):
     return render(request, "user/qr_validated.html", context)
 
 
+def show_qr_code(request, show_id):
+    # ✅ Rendered once per show and base URL; the name changes with the URL
+    show = get_object_or_404(Show.objects.only("id", "qr_code"), id=show_id)
+    etag = f'"{url_digest(show_qr_url(show.id))}"'
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    ensure_show_qr(show)
+    response = FileResponse(show.qr_code.open("rb"), content_type="image/png")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+    return response
+
+
 @user_passes_test(lambda u: u.is_authenticated and u.user_type == "Admin")
 def get_visitor_data(request):
     data = (
@@ -429,41 +801,50 @@ def admin_visitor_analytics(request):
     return render(request, "accounts/partials/visitor_analytics.html")
 
 
+@login_required
 def download_ticket(request, ticket_id):
-    # Step 1: Get the ticket and its related booking
-    ticket = Ticket.objects.filter(id=ticket_id, user=request.user).first()
+    ticket = (
+        Ticket.objects.filter(
+            id=ticket_id, user=request.user, payment_status="confirmed"
+        ).first()
+    )
     if not ticket:
         raise Http404("Ticket not found.")
 
-    # Step 2: Find matching booking (to fetch all related tickets)
-    booking = (
-        Booking.objects.filter(user=request.user, show=ticket.show)
-        .order_by("-booking_date")
-        .first()
-    )
-    if not booking:
-        raise Http404("Booking not found.")
-
-    # Step 3: Get all tickets for that user + show + date
-    all_tickets = Ticket.objects.filter(
-        user=request.user,
-        show=ticket.show,
-        booking_date__date=booking.booking_date.date(),
-    )
-
-    if not all_tickets.exists():
-        raise Http404("No matching tickets found.")
+    booking = ticket.booking
+    if booking is None:
+        # Offline sale: no booking groups it with other tickets
+        pdf_buffer = generate_ticket_pdf([ticket], request)
+        return FileResponse(
+            pdf_buffer, content_type="application/pdf", filename="ticket.pdf"
+        )
 
-    # Step 4: Generate PDF if missing
-    pdf_path = f"media/tickets/{request.user.id}_{booking.id}_all.pdf"
+    # ✅ Cached per booking; cancel_tickets() drops it when the seats change
+    pdf_path = booking_pdf_path(booking)
     if not os.path.exists(pdf_path):
-        pdf_buffer = generate_ticket_pdf(list(all_tickets), request)
+        all_tickets = list(booking.tickets.order_by("id"))
+        pdf_buffer = generate_ticket_pdf(all_tickets, request)
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
         with open(pdf_path, "wb") as f:
             f.write(pdf_buffer.getvalue())
 
     return FileResponse(open(pdf_path, "rb"), content_type="application/pdf")
 
 
+# ------------------ Metrics ------------------ #
+
+
+def metrics_view(request):
+    """Prometheus scrape target; local scrapers or admins only."""
+    allowed = request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+    if not allowed and not (
+        request.user.is_authenticated and request.user.user_type == "Admin"
+    ):
+        return HttpResponseForbidden("Forbidden")
+    body = render_metrics(extra={"raven_email_outbox_depth": outbox_depth()})
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @login_required
 def profile_settings(request):
     user = request.user
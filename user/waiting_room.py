@@ -0,0 +1,199 @@
+import functools
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from .models import Show, WaitingRoomCounter
+
+# Buyers let through at the moment the sale opens, then per minute after
+ADMIT_BURST = getattr(settings, "WAITING_ROOM_BURST", 50)
+ADMIT_PER_MINUTE = getattr(settings, "WAITING_ROOM_ADMIT_PER_MINUTE", 60)
+# How long an admitted buyer may keep booking before re-queueing
+ADMISSION_SECONDS = getattr(settings, "WAITING_ROOM_ADMISSION_SECONDS", 10 * 60)
+POLL_SECONDS = getattr(settings, "WAITING_ROOM_POLL_SECONDS", 5)
+WINDOW_CACHE_SECONDS = 30
+
+SALT = "raven.waiting-room"
+
+
+def cookie_name(show_id):
+    return f"raven_queue_{show_id}"
+
+
+# ------------------ On-sale windows ------------------ #
+def _window_key(show_id):
+    return f"waitroom:window:{show_id}"
+
+
+def get_window(show_id):
+    """
+    ``(opens, closes)`` epoch seconds while the show has a waiting room
+    configured, else ``None``. Cached, so the per-request check costs one
+    cache read and no query.
+    """
+    window = cache.get(_window_key(show_id))
+    if window is None:
+        row = (
+            Show.objects.filter(id=show_id)
+            .values_list("on_sale_at", "waiting_room_minutes")
+            .first()
+        )
+        window = ()  # cached "no waiting room"
+        if row and row[0] and row[1]:
+            opens = row[0]
+            window = (
+                opens.timestamp(),
+                (opens + timedelta(minutes=row[1])).timestamp(),
+            )
+        cache.set(_window_key(show_id), window, WINDOW_CACHE_SECONDS)
+    return window or None
+
+
+def forget_window(show_id):
+    cache.delete(_window_key(show_id))
+
+
+def is_active(window, now=None):
+    """Queueing applies from the moment tokens are handed out until close."""
+    return window is not None and (now or time.time()) < window[1]
+
+
+# ------------------ Admission ------------------ #
+def admitted_through(window, now=None):
+    """Queue positions up to this one have been let in."""
+    elapsed = (now or time.time()) - window[0]
+    if elapsed < 0:
+        return 0
+    return ADMIT_BURST + int(elapsed * ADMIT_PER_MINUTE / 60)
+
+
+def admitted_at(window, position):
+    """Epoch seconds at which ``position`` is (or was) let in."""
+    return window[0] + max(0, position - ADMIT_BURST) * 60 / ADMIT_PER_MINUTE
+
+
+def _next_position(show_id, window):
+    # A row per window, incremented in place: every worker draws from the
+    # same sequence, so the admission rate holds however many there are
+    key = f"{show_id}:{int(window[0])}"
+    counter = WaitingRoomCounter.objects.filter(key=key)
+    with transaction.atomic():
+        if not counter.update(issued=F("issued") + 1):
+            WaitingRoomCounter.objects.bulk_create(
+                [WaitingRoomCounter(key=key)], ignore_conflicts=True
+            )
+            counter.update(issued=F("issued") + 1)
+        return counter.values_list("issued", flat=True).get()
+
+
+def issue_token(show_id, user_id, window):
+    position = _next_position(show_id, window)
+    token = signing.dumps(
+        {"s": show_id, "u": user_id, "o": int(window[0]), "p": position}, salt=SALT
+    )
+    return token, position
+
+
+def read_position(request, show_id, window):
+    """The queue position in the request's token, or ``None`` if it's not ours."""
+    token = request.COOKIES.get(cookie_name(show_id))
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return None
+    if (data.get("s"), data.get("u"), data.get("o")) != (
+        show_id,
+        request.user.id,
+        int(window[0]),
+    ):
+        return None
+    return data.get("p")
+
+
+def queue_status(window, position, now=None):
+    now = now or time.time()
+    through = admitted_through(window, now)
+    let_in = admitted_at(window, position)
+    return {
+        "position": position,
+        "admitted_through": through,
+        "ahead": max(0, position - through),
+        "admitted": position <= through,
+        "expired": position <= through and now > let_in + ADMISSION_SECONDS,
+        "eta_seconds": max(0, int(let_in - now)),
+        "poll_seconds": POLL_SECONDS,
+    }
+
+
+def _set_cookie(response, show_id, token, window):
+    response.set_cookie(
+        cookie_name(show_id),
+        token,
+        max_age=int(window[1] - time.time()) + ADMISSION_SECONDS,
+        httponly=True,
+        samesite="Lax",
+        secure=not settings.DEBUG,
+    )
+
+
+# ------------------ Gate ------------------ #
+def waiting_room_gate(view):
+    """
+    Hold a booking view behind the show's waiting room during its on-sale
+    window. Visitors get a signed queue token (cookie) and see the waiting
+    page until their position is admitted; API and POST callers get a 429
+    with their queue status instead. Outside the window this is one cache
+    read.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, show_id, *args, **kwargs):
+        window = get_window(show_id)
+        if not is_active(window):
+            return view(request, show_id, *args, **kwargs)
+
+        position = read_position(request, show_id, window)
+        status = None
+        if position is not None:
+            status = queue_status(window, position)
+            if status["admitted"] and not status["expired"]:
+                return view(request, show_id, *args, **kwargs)
+
+        if request.method != "GET":
+            response = JsonResponse(
+                {
+                    "ok": False,
+                    "message": "Booking is queued; wait for your turn.",
+                    "queue": status,
+                },
+                status=429,
+            )
+            response["Retry-After"] = POLL_SECONDS
+            return response
+
+        token = None
+        if status is None or status["expired"]:
+            token, position = issue_token(show_id, request.user.id, window)
+            status = queue_status(window, position)
+        response = render(
+            request,
+            "user/waiting_room.html",
+            {
+                "show": Show.objects.only("name", "date", "time").get(id=show_id),
+                "queue": status,
+            },
+        )
+        if token:
+            _set_cookie(response, show_id, token, window)
+        return response
+
+    return wrapper
@@ -0,0 +1,176 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .mail_outbox import queue_email
+from .models import Seat, WaitlistEntry
+from .seat_layout import section_of, seat_numbers
+from .seat_map import broadcast_seats, bump_seat_version, claim_seats
+
+# How long an offer holds its seats before they go to the next in line
+OFFER_MINUTES = getattr(settings, "WAITLIST_OFFER_MINUTES", 15)
+MAX_PARTY_SIZE = getattr(settings, "WAITLIST_MAX_PARTY_SIZE", 10)
+# Absolute links in emails sent from workers that have no request
+PUBLIC_BASE_URL = getattr(settings, "PUBLIC_BASE_URL", "")
+
+ACTIVE_STATUSES = ("waiting", "offered")
+
+
+class OfferClosed(Exception):
+    """The offer was already accepted, withdrawn or has expired."""
+
+
+def join_waitlist(show, user, party_size, section=""):
+    """The user's active entry for ``show``, created or updated."""
+    entry = WaitlistEntry.objects.filter(
+        show=show, user=user, status__in=ACTIVE_STATUSES
+    ).first()
+    if entry is None:
+        return WaitlistEntry.objects.create(
+            show=show, user=user, party_size=party_size, section=section
+        )
+    if entry.status == "waiting":
+        # Changing the request keeps the place in the queue
+        entry.party_size = party_size
+        entry.section = section
+        entry.save(update_fields=["party_size", "section"])
+    return entry
+
+
+def queue_position(entry):
+    """1-based place among the show's waiting entries, or None."""
+    if entry.status != "waiting":
+        return None
+    return (
+        WaitlistEntry.objects.filter(
+            show_id=entry.show_id, status="waiting", created_at__lte=entry.created_at
+        )
+        .exclude(created_at=entry.created_at, id__gt=entry.id)
+        .count()
+    )
+
+
+# ------------------ Matching ------------------ #
+def offer_released_seats(show, released):
+    """
+    Offer just-released seats (labels) to the show's waitlist, FIFO.
+
+    One pass: the freed seats are split by section in layout order, then
+    each waiting entry, oldest first, takes the first ``party_size`` seats
+    of a section it accepts. An entry that doesn't fit stays in line and
+    smaller parties behind it may still be served. Offered seats are
+    stored as ``held`` so nobody else can buy them while the offer stands.
+
+    Call inside the transaction that released the seats. Returns the
+    entries that got offers.
+    """
+    if not released:
+        return []
+    entries = list(
+        WaitlistEntry.objects.select_for_update()
+        .filter(show=show, status="waiting")
+        .order_by("created_at", "id")
+    )
+    if not entries:
+        return []
+
+    order = {n: i for i, n in enumerate(seat_numbers(show.include_balcony))}
+    pools = {"STALL": [], "BALCONY": []}
+    for seat_number in sorted(set(released) & order.keys(), key=order.get):
+        pools[section_of(seat_number)].append(seat_number)
+
+    offers = []
+    expires = timezone.now() + timedelta(minutes=OFFER_MINUTES)
+    for entry in entries:
+        for section in [entry.section] if entry.section else ["STALL", "BALCONY"]:
+            pool = pools[section]
+            if len(pool) < entry.party_size:
+                continue
+            picked = pool[: entry.party_size]
+            if claim_seats(show, picked, kind="held") is None:
+                # Bought by someone else since it was released
+                continue
+            del pool[: entry.party_size]
+            entry.status = "offered"
+            entry.offered_seats = picked
+            entry.offer_expires_at = expires
+            entry.save(update_fields=["status", "offered_seats", "offer_expires_at"])
+            offers.append(entry)
+            break
+        if not any(pools.values()):
+            break
+
+    if offers:
+        bump_seat_version(show.id)
+        broadcast_seats(
+            show.id, [n for entry in offers for n in entry.offered_seats], "book"
+        )
+        for entry in offers:
+            _notify_offer(entry)
+    return offers
+
+
+def _notify_offer(entry):
+    link = PUBLIC_BASE_URL.rstrip("/") + reverse("waitlist_entry", args=[entry.id])
+    queue_email(
+        f"🎟️ Seats available for {entry.show.name}",
+        f"Seats {', '.join(entry.offered_seats)} are being held for you until "
+        f"{timezone.localtime(entry.offer_expires_at):%d %b %Y %I:%M %p}.\n\n"
+        f"Book them here: {link}\n\n"
+        "After that they are offered to the next person on the waitlist.",
+        [entry.user.email],
+    )
+
+
+# ------------------ Releasing offers ------------------ #
+def release_offer(entry, status):
+    """
+    Close an offer (``status`` "expired" or "left") and pass its seats on
+    to the rest of the waitlist. Call inside a transaction.
+    """
+    seats = list(entry.offered_seats)
+    entry.status = status
+    entry.offered_seats = []
+    entry.offer_expires_at = None
+    entry.save(update_fields=["status", "offered_seats", "offer_expires_at"])
+    Seat.objects.filter(
+        show_id=entry.show_id, seat_number__in=seats, kind="held"
+    ).delete()
+    bump_seat_version(entry.show_id)
+    broadcast_seats(entry.show_id, seats, "unbook")
+    offer_released_seats(entry.show, seats)
+
+
+def expire_offers(now=None):
+    """Expire every overdue offer; returns how many were expired."""
+    now = now or timezone.now()
+    expired = 0
+    overdue = WaitlistEntry.objects.filter(status="offered", offer_expires_at__lt=now)
+    for entry_id in overdue.order_by("offer_expires_at", "id").values_list(
+        "id", flat=True
+    ):
+        with transaction.atomic():
+            # Re-read under lock: the offer may just have been accepted
+            entry = (
+                overdue.select_for_update()
+                .select_related("show")
+                .filter(id=entry_id)
+                .first()
+            )
+            if entry is not None:
+                release_offer(entry, "expired")
+                expired += 1
+    return expired
+
+
+def leave_waitlist(entry):
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update().get(id=entry.id)
+        if entry.status == "offered":
+            release_offer(entry, "left")
+        elif entry.status == "waiting":
+            entry.status = "left"
+            entry.save(update_fields=["status"])